@@ -15,6 +15,7 @@ from __future__ import division
 
 import sys
 import os
+import time
 import warnings
 
 from copy import copy
@@ -26,10 +27,27 @@ from ase.parallel import paropen
 from ase.io.trajectory import Trajectory
 
 from define_rot_mode import get_rot_dict
-from define_trans_mode import get_trans_dict
+from define_trans_mode import get_trans_dict, get_surface_trans_dict
 from anh_rot import RotAnalysis
 from anh_vib import VibAnalysis
 from anh_trans import TransAnalysis
+from anh_trans2d import Trans2DAnalysis
+from an_export import export_modes
+from an_estimate import HarmonicCalculator, ScaledCalculator, get_cost_range
+
+# The keys of a mode object that hold the results of its sampling
+SAMPLED_KEYS = ['displacements', 'displacement_energies',
+                'displacement_forces', 'ZPE', 'Z_mode',
+                'energy_levels', 'n_calls', 'calc_time',
+                'geometry_jump', 'scf_iterations',
+                'energy_spectrum', 'spectrum_window', 'fit',
+                'ZPE_hist', 'Z_mode_hist', 'hist_n_points',
+                'ZPE_err', 'Z_mode_err', 'entropic_energy_err',
+                'fit_dof', 'n_imported']
+
+# The keys of a mode object that hold the relaxations of its points
+RELAXED_KEYS = ['relaxed_displacements', 'relaxed_offsets', 'relax_steps',
+                'relax_force_calls']
 
 
 class AnharmonicModes:
@@ -48,6 +66,7 @@ class AnharmonicModes:
         log=sys.stdout,
         pre_names='an_mode_',
         verbosity=1,
+        cheap_calculator=None,
     ):
         """Initialization
 
@@ -58,14 +77,20 @@ class AnharmonicModes:
             log (optional[str]): name of log file.
             verbosity (optional[int]): Change how much extra information
                 is printed.
+            cheap_calculator (optional[obj]): Cheap calculator, e.g. EMT
+                or a machine learning potential, that maps the potential
+                of each mode densely before the calculator of the atoms
+                is used (see map_cheap_potentials).
         """
         self.vib = vibrations_object
+        self.cheap_calculator = cheap_calculator
         self.pre_names = pre_names
         self.settings = settings
 
         if isinstance(log, str):
             log = paropen(log, 'a')
         self.log = log
+        self.verbosity = verbosity
 
         self.atoms = self.vib.atoms
         self.an_modes = []
@@ -138,6 +163,9 @@ class AnharmonicModes:
                 position relative to atom #1 to a simular relative
                 position to atom #2. #1 and #2 refers to the indices
                 of atoms 1 and 2.
+            relax_axis (optional[list]): The translating atoms are
+                relaxed along this direction at every point of the
+                path, e.g. [0, 0, 1].
 
         Returns:
             A dictionary that defines the anharmonic vibrational mode
@@ -157,6 +185,11 @@ class AnharmonicModes:
         # If there should be an optimization along a direction
         an_mode.update({'relax_axis': relax_axis})
 
+        # The curvature along the axis seeds the relaxations
+        if relax_axis is not None:
+            an_mode.update({
+                'relax_hessian': get_axis_hessian(self.vib.H, relax_axis)})
+
         # Calculate the mode that should be removed from the harmonic
         # analysis, and remove this mode from the normal mode spectrum.
         self.reduced_h_modes = np.delete(
@@ -172,6 +205,66 @@ class AnharmonicModes:
 
         return an_mode
 
+    def define_surface_translation(
+            self,
+            from_atom_to_atoms,
+            symnumber=1,
+            relax_axis=None,
+            mode_settings={}):
+        """Define a two dimensional translational mode on a surface
+
+        Args:
+            from_atom_to_atoms (list: [#1:int, #2:int, #3:int]): The
+                vibrational branch moves in the surface cell spanned by
+                the vectors from atom #1 to atom #2 and from atom #1 to
+                atom #3.
+            symnumber (int): Order of the rotational symmetry of the
+                surface about the site of the groundstate, e.g. 3 for a
+                top site of fcc(111).
+            relax_axis (optional[list]): The translating atoms are
+                relaxed along this direction at every point of the
+                cell, e.g. [0, 0, 1].
+            mode_settings (optional[dict]): settings to overwrite the main
+                settings for this mode in mode analysis.
+
+        The potential of a surface translation cannot be mapped by a
+        cheap calculator, so a ValueError is raised if one is given.
+
+        Returns:
+            A dictionary that defines the anharmonic translational mode
+        """
+        if self.cheap_calculator is not None:
+            raise ValueError('A surface translation cannot be used with '
+                             'a cheap_calculator')
+
+        an_mode = get_surface_trans_dict(
+            from_atom_to_atoms, self.vib, symnumber=symnumber)
+
+        an_mode.update({'mode_settings': mode_settings})
+
+        # If there should be an optimization along a direction
+        an_mode.update({'relax_axis': relax_axis})
+
+        if relax_axis is not None:
+            an_mode.update({
+                'relax_hessian': get_axis_hessian(self.vib.H, relax_axis)})
+
+        # Remove the two harmonic modes most similar to the translations
+        # along the two cell vectors
+        for key in ['mode_tangent_mass_weighted',
+                    'mode_tangent_mass_weighted_2']:
+            self.reduced_h_modes = np.delete(
+                self.reduced_h_modes,
+                calculate_highest_mode_overlap(
+                    an_mode[key], self.reduced_h_modes),
+                axis=0)
+
+        self.an_modes.append(an_mode)
+
+        self.check_defined_mode_overlap()
+
+        return an_mode
+
     def define_vibration(
             self,
             mode_number=None,
@@ -268,16 +361,392 @@ class AnharmonicModes:
                     filename='rot_mode_'+str(i)+'.traj')
 
     def run(self):
-        """Run the analysis"""
-        for i, _ in enumerate(self.an_modes):
-            AMA = self.get_analysis_object(i)
+        """Run the analysis
+
+        The calculations are distributed between the modes according to
+        settings['scheduler']:
+            'sequential': (default) each mode is converged before the
+                next mode is started.
+            'cost_aware': all modes are started and the next calculation
+                is given to the mode whose thermodynamic contribution is
+                least converged per unit of calculation time.
+
+        The whole run can be limited by settings['max_total_calls'] and
+        settings['max_total_seconds']. Every mode still gets its
+        initial sampling and one fit when the budget is used.
+        """
+        self.map_cheap_potentials()
+
+        self.run_start_time = time.time()
+
+        AMAs = [self.get_analysis_object(i)
+                for i in range(len(self.an_modes))]
+
+        if self.settings.get('scheduler', 'sequential') == 'cost_aware':
+            self.run_cost_aware(AMAs)
+        else:
+            for AMA in AMAs:
+                if AMA.start():
+                    while not (AMA.step() or self.is_budget_exhausted(AMAs)):
+                        pass
+                    AMA.finish()
 
-            # adding ZPE, Z_mode, and energy_levels to mode object
-            self.an_modes[i] = AMA.run()
+        # adding ZPE, Z_mode, and energy_levels to mode object
+        self.an_modes = [AMA.an_mode for AMA in AMAs]
 
         # Calculate the thermodynamical quantities:
         self.calculate_anharmonic_thermo()
 
+    def run_with_session(self, calc=None, port=None, unixsocket=None,
+                         launch_client=None, timeout=None):
+        """Run the analysis with one long-lived calculator session.
+
+        A ase.calculators.socketio.SocketIOCalculator is attached to the
+        atoms during the run, so the calculator process is started once
+        and only receives new positions for all displacements of all
+        modes. The startup and the initialization of the wavefunctions
+        are then paid once per run instead of once per point. The
+        original calculator of the atoms is restored afterwards.
+
+        Args:
+            calc (optional[obj]): File based calculator with socket
+                support (e.g. Espresso, Aims, Siesta) that is launched
+                as the client.
+            port (optional[int]): Port to listen for the client.
+            unixsocket (optional[str]): Name of unix socket to listen on
+                instead of a port.
+            launch_client (optional[function]): Launches the client
+                instead of calc, e.g.
+                ase.calculators.socketio.PySocketIOClient(EMT).
+            timeout (optional[float]): Timeout of the connection.
+
+        If neither calc nor launch_client is given, the client must be
+        started by the user.
+        """
+        from ase.calculators.socketio import SocketIOCalculator
+
+        original_calc = self.atoms.get_calculator()
+
+        with SocketIOCalculator(calc=calc, port=port, unixsocket=unixsocket,
+                                timeout=timeout,
+                                launch_client=launch_client) as session:
+            self.atoms.set_calculator(session)
+            try:
+                self.run()
+            finally:
+                self.atoms.set_calculator(original_calc)
+
+    def run_async(self, port=None, unixsocket=None, launch_client=None,
+                  n_clients=1):
+        """Run the analysis with the energies calculated by a pool of
+        i-PI calculator clients, e.g. ase.calculators.socketio.SocketClient.
+
+        The displacements of all modes are dispatched concurrently to the
+        idle clients with asyncio. The clients are connected once and only
+        receive new positions, so a calculator process and its
+        wavefunctions are reused for the whole run.
+
+        Args:
+            port (optional[int]): Port to listen for the clients.
+            unixsocket (optional[str]): Name of unix socket to listen on
+                instead of a port.
+            launch_client (optional[function]): Launches a client process
+                as the launch_client of SocketIOCalculator, e.g.
+                ase.calculators.socketio.PySocketIOClient(EMT). If not
+                given the clients must be started by the user.
+            n_clients (optional[int]): Number of clients to launch.
+        """
+        import asyncio
+        from an_async import AsyncSocketServer, drive_modes
+
+        for i, an_mode in enumerate(self.an_modes):
+            if an_mode.get('relax_axis'):
+                raise ValueError(
+                    'Mode %i is relaxed along its relax_axis, which '
+                    'run_async cannot do; use run instead' % i)
+
+        self.map_cheap_potentials()
+
+        self.run_start_time = time.time()
+
+        AMAs = [self.get_analysis_object(i)
+                for i in range(len(self.an_modes))]
+
+        async def run_modes():
+            server = AsyncSocketServer(
+                port=port, unixsocket=unixsocket,
+                log=self.log if self.verbosity > 1 else None)
+            await server.start()
+            try:
+                if launch_client is not None:
+                    server.launch_clients(launch_client, self.atoms,
+                                          n_clients)
+                await drive_modes(
+                    AMAs, server, self.atoms.get_cell(),
+                    lambda: self.is_budget_exhausted(AMAs))
+            finally:
+                await server.close()
+
+        asyncio.run(run_modes())
+
+        # adding ZPE, Z_mode, and energy_levels to mode object
+        self.an_modes = [AMA.an_mode for AMA in AMAs]
+
+        # Calculate the thermodynamical quantities:
+        self.calculate_anharmonic_thermo()
+
+    def map_cheap_potentials(self):
+        """Map the potential of every mode with the cheap calculator.
+
+        Each mode is first sampled to convergence with the cheap
+        calculator, which fixes its range, and the cheap energies are
+        then calculated on an even grid of settings['cheap_npoints']
+        points over that range. The grid is stored in
+        an_mode['baseline_displacements'] and
+        an_mode['baseline_energies'], and the calculator of the atoms
+        only has to fit the difference to this baseline.
+
+        Does nothing if no cheap calculator is given.
+        """
+        if self.cheap_calculator is None:
+            return
+
+        calc = self.atoms.get_calculator()
+        self.atoms.set_calculator(self.cheap_calculator)
+        try:
+            for i, an_mode in enumerate(self.an_modes):
+                if an_mode.get('baseline_energies'):
+                    continue
+
+                cheap_mode = dict((key, value)
+                                  for key, value in an_mode.items()
+                                  if key not in SAMPLED_KEYS)
+
+                AMA = self.get_analysis_object(
+                    i, an_mode=cheap_mode,
+                    an_filename=self.pre_names+'cheap_'+str(i))
+                # The batch evaluator and the database belong to the
+                # main calculator
+                AMA.settings.pop('batch_evaluator', None)
+                AMA.settings.pop('database', None)
+                # The cheap points are not valid for the backups of the
+                # main calculator
+                AMA.settings['calculator_label'] = 'cheap'
+                AMA.run()
+
+                displacements, energies = AMA.map_potential(
+                    self.settings.get('cheap_npoints', 40))
+
+                an_mode['baseline_displacements'] = list(displacements)
+                an_mode['baseline_energies'] = list(energies)
+
+                if self.verbosity > 1:
+                    self.log.write(
+                        'Mapped mode %i with %i cheap calculations \n'
+                        % (i, AMA.an_mode.get('n_calls', 0) + len(energies)))
+        finally:
+            self.atoms.set_calculator(calc)
+
+    def run_cost_aware(self, AMAs):
+        """Iterate the modes by always stepping the mode with the largest
+        estimated error of its free energy contribution per second of
+        calculation. A mode with an error below
+        settings['free_energy_tol'] (eV) is considered converged, so
+        modes with negligible thermodynamic contributions only get a
+        loose treatment.
+
+        Args:
+            AMAs (list): The analysis objects of the modes
+        """
+        free_energy_tol = self.settings.get('free_energy_tol')
+
+        active = []
+        for AMA in AMAs:
+            if AMA.start():
+                if AMA.step():
+                    AMA.finish()
+                else:
+                    active.append(AMA)
+
+        while len(active) > 0:
+            if self.is_budget_exhausted(AMAs):
+                break
+
+            errors = np.array([AMA.get_free_energy_error()
+                               for AMA in active])
+
+            if free_energy_tol is not None:
+                for AMA in [AMA for AMA, error in zip(active, errors)
+                            if error < free_energy_tol]:
+                    AMA.finish()
+                    active.remove(AMA)
+                errors = errors[errors >= free_energy_tol]
+
+                if len(active) == 0:
+                    break
+
+            priorities = errors / np.array([AMA.get_cost_per_call()
+                                            for AMA in active])
+            AMA = active[int(np.argmax(priorities))]
+
+            if self.verbosity > 1:
+                self.log.write(
+                    'Stepping mode %i (error %.2e eV) \n'
+                    % (AMAs.index(AMA), np.max(errors)))
+
+            if AMA.step():
+                AMA.finish()
+                active.remove(AMA)
+
+        for AMA in active:
+            AMA.finish()
+
+    def is_budget_exhausted(self, AMAs):
+        """Check the budget of the whole run:
+        settings['max_total_calls'] calculator calls and
+        settings['max_total_seconds'] seconds of wall time.
+
+        Args:
+            AMAs (list): The analysis objects of the modes
+
+        Returns:
+            True if the budget is used
+        """
+        max_total_calls = self.settings.get('max_total_calls')
+        max_total_seconds = self.settings.get('max_total_seconds')
+
+        if max_total_calls is not None:
+            total_calls = sum([getattr(AMA, 'n_calls_session', 0)
+                               for AMA in AMAs])
+            if total_calls >= max_total_calls:
+                return True
+
+        if max_total_seconds is not None:
+            if time.time() - self.run_start_time >= max_total_seconds:
+                return True
+
+        return False
+
+    def estimate_cost(self, surrogate='harmonic', scales=(0.5, 2.),
+                      max_calls=200):
+        """Estimate the calculations of the run before it is started, by
+        sampling each mode with a surrogate of the potential energy in
+        place of the calculator of the atoms. Nothing is backed up or
+        written to the trajectory.
+
+        The sampling follows the settings of the run, e.g. the
+        temperature, max_disp, n_initial, the convergence criterion and
+        the budgets in calls, and the hnu of the modes. The range of the
+        estimate is given by the surrogate made softer and stiffer by
+        multiplying its energies by the scales. The harmonic surrogate
+        is crude for rotations and translations over barriers, and for
+        the relaxations along a relax_axis, for which a scan with the
+        cheap calculator is better.
+
+        Args:
+            surrogate (optional[str]): 'harmonic' for the harmonic
+                potential of the Hessian of the vibrations object, or
+                'cheap' for the cheap calculator.
+            scales (optional[list]): The factors of the energies giving
+                the range of the estimate.
+            max_calls (optional[int]): Calls after which the sampling of
+                a mode with the surrogate is stopped, e.g. for a mode
+                that does not converge on the surrogate.
+
+        Returns:
+            Dictionary with the estimated 'n_calls' and 'relax_steps' of
+                the run and their ranges 'n_calls_range' and
+                'relax_steps_range' as (lowest, highest), and the same
+                for each mode in 'modes'. 'capped' tells if the sampling
+                of a mode was stopped by max_calls.
+        """
+        if surrogate == 'harmonic':
+            calc = HarmonicCalculator(
+                self.atoms.get_positions(), self.vib.indices, self.vib.H)
+            energy = 0.
+        elif surrogate == 'cheap':
+            assert self.cheap_calculator is not None, 'No cheap calculator'
+            calc = self.cheap_calculator
+            groundstate = self.atoms.copy()
+            groundstate.set_calculator(calc)
+            energy = groundstate.get_potential_energy()
+        else:
+            raise ValueError('unknown surrogate')
+
+        original_calc = self.atoms.get_calculator()
+        positions = self.atoms.get_positions()
+        try:
+            modes = []
+            for i in range(len(self.an_modes)):
+                counts = [self.count_mode_calls(i, calc, max_calls)] + [
+                    self.count_mode_calls(
+                        i, ScaledCalculator(calc, scale, energy), max_calls)
+                    for scale in scales]
+
+                n_calls, n_calls_range = get_cost_range(
+                    [n for n, _, _ in counts])
+                relax_steps, relax_steps_range = get_cost_range(
+                    [steps for _, steps, _ in counts])
+                modes.append({
+                    'type': self.an_modes[i]['type'],
+                    'n_calls': n_calls,
+                    'n_calls_range': n_calls_range,
+                    'relax_steps': relax_steps,
+                    'relax_steps_range': relax_steps_range,
+                    'capped': any(capped for _, _, capped in counts)})
+        finally:
+            self.atoms.set_calculator(original_calc)
+            self.atoms.set_positions(positions)
+
+        estimate = {'modes': modes}
+        max_total_calls = self.settings.get('max_total_calls')
+        for key in ['n_calls', 'relax_steps']:
+            total = sum(mode[key] for mode in modes)
+            lowest = sum(mode[key + '_range'][0] for mode in modes)
+            highest = sum(mode[key + '_range'][1] for mode in modes)
+            if key == 'n_calls' and max_total_calls is not None:
+                total, lowest, highest = [
+                    min(n, max_total_calls)
+                    for n in [total, lowest, highest]]
+            estimate[key] = total
+            estimate[key + '_range'] = (lowest, highest)
+
+        return estimate
+
+    def count_mode_calls(self, i, calc, max_calls):
+        """Sample mode i from scratch with calc attached to the atoms,
+        without backups, trajectory or database, see estimate_cost.
+
+        Returns:
+            n_calls (int), relax_steps (int) and if the sampling was
+                stopped by max_calls (bool)
+        """
+        an_mode = dict(
+            (key, value) for key, value in self.an_modes[i].items()
+            if key not in SAMPLED_KEYS + RELAXED_KEYS + ['mode_hash'])
+
+        mode_settings = dict(an_mode.get('mode_settings', {}))
+        max_calls = min(mode_settings.get(
+            'max_calls', self.settings.get('max_calls', max_calls)),
+            max_calls)
+        mode_settings['max_calls'] = max_calls
+        an_mode['mode_settings'] = mode_settings
+
+        # Only the budgets in calls apply to the surrogate
+        settings = dict(
+            (key, value) for key, value in self.settings.items()
+            if key not in ['database', 'batch_evaluator', 'max_seconds'])
+        settings.update({'trajectory': 'off', 'import_trajectory': False})
+
+        AMA = self.get_analysis_object(
+            i, an_mode=an_mode, an_filename='', settings=settings)
+        self.atoms.set_calculator(calc)
+        AMA.run()
+
+        n_calls = AMA.an_mode.get('n_calls', 0)
+        return n_calls, AMA.an_mode.get('relax_steps', 0), (
+            n_calls >= max_calls)
+
     def inspect_anmodes(self):
         """Run the analysis"""
         for i, an_mode in enumerate(self.an_modes):
@@ -285,31 +754,66 @@ class AnharmonicModes:
 
             AMA.make_inspection_traj()
 
-    def get_analysis_object(self, i):
+    def get_analysis_object(self, i, an_mode=None, an_filename=None,
+                            settings=None):
         """Return the mode object for index i.
+
+        The mode_settings of the mode overwrite the main settings, e.g.
+        to give a mode its own budget with 'max_calls'.
+
+        Args:
+            i (int): Index of the mode
+            an_mode (optional[dict]): The mode object to analyse instead
+                of self.an_modes[i]
+            an_filename (optional[str]): Name of the backup files instead
+                of pre_names followed by i
+            settings (optional[dict]): The main settings to use instead
+                of self.settings
         """
-        an_mode = self.an_modes[i]
+        if an_mode is None:
+            an_mode = self.an_modes[i]
+
+        if an_filename is None:
+            an_filename = self.pre_names+str(i)
+
+        if settings is None:
+            settings = self.settings
+
+        settings = dict(settings)
+        # The calculations of all modes go to one trajectory, see
+        # BaseAnalysis.get_trajectory_policy. Runs at the same time in
+        # one directory need their own pre_names or trajectory_file.
+        settings.setdefault(
+            'trajectory_file', self.pre_names + 'calculations.traj')
+        settings.update(an_mode.get('mode_settings', {}))
 
         if an_mode['type'] == 'rotation':
                 AMA = RotAnalysis(
                     an_mode,
                     self.atoms,
-                    an_filename=self.pre_names+str(i),
-                    settings=self.settings)
+                    an_filename=an_filename,
+                    settings=settings)
 
         elif an_mode['type'] == 'vibration':
             AMA = VibAnalysis(
                 an_mode,
                 self.atoms,
-                an_filename=self.pre_names+str(i),
-                settings=self.settings)
+                an_filename=an_filename,
+                settings=settings)
 
         elif an_mode['type'] == 'translation':
             AMA = TransAnalysis(
                 an_mode,
                 self.atoms,
-                an_filename=self.pre_names+str(i),
-                settings=self.settings)
+                an_filename=an_filename,
+                settings=settings)
+
+        elif an_mode['type'] == 'translation_2d':
+            AMA = Trans2DAnalysis(
+                an_mode,
+                self.atoms,
+                an_filename=an_filename,
+                settings=settings)
         else:
             raise ValueError('unknown type')
 
@@ -379,7 +883,73 @@ class AnharmonicModes:
     def get_entropic_energy(self):
         return self.entropic_energy
 
-    def get_harmonic_thermo(self, hnu):
+    def thermo_at(self, temperature):
+        """Thermodynamic quantities at another temperature from the
+        spectra and fits stored in the mode objects, see
+        BaseAnalysis.get_stored_thermo. Nothing is calculated with the
+        calculator, so the modes have to be run first, in this run or in
+        an earlier run with backups.
+
+        Args:
+            temperature (float): The temperature in Kelvin
+
+        Returns:
+            Dictionary with the ZPE and entropic_energy of the system, and
+                the ZPE_modes, Z_modes and entropic_energy_modes of the
+                anharmonic modes followed by the harmonic modes.
+        """
+        settings = dict(self.settings)
+        settings['temperature'] = temperature
+
+        ZPE_modes = []
+        Z_modes = []
+        entropic_energy_modes = []
+        for i in range(len(self.an_modes)):
+            AMA = self.get_analysis_object(i, settings=settings)
+            if 'fit' not in AMA.an_mode:
+                AMA.restore_backup()
+
+            ZPE, Z_mode, energies = AMA.get_stored_thermo()
+
+            ZPE_modes.append(ZPE)
+            Z_modes.append(Z_mode)
+            entropic_energy_modes.append(AMA.get_entropic_energy(energies))
+
+        h_thermo = self.get_harmonic_thermo(
+            self.calculate_post_h_freqs(), kT=units.kB * temperature)
+
+        ZPE_modes += h_thermo['ZPE_hmodes']
+        Z_modes += h_thermo['Z_hmodes']
+        entropic_energy_modes += h_thermo['entropic_energy_hmodes']
+
+        return {
+            'temperature': temperature,
+            'ZPE': np.sum(ZPE_modes),
+            'entropic_energy': np.sum(entropic_energy_modes),
+            'ZPE_modes': ZPE_modes,
+            'Z_modes': Z_modes,
+            'entropic_energy_modes': entropic_energy_modes}
+
+    def export(self, directory, npoints=64):
+        """Add the samples, fitted potentials, energy levels and
+        thermodynamics of the modes to a columnar archive that can be
+        memory mapped, see an_export.ModeArchive. The modes of many
+        systems can be collected in one archive.
+
+        Args:
+            directory (str): The directory of the archive
+            npoints (optional[int]): Points of the grid of the fitted
+                potentials
+
+        Returns:
+            an_export.ModeArchive
+        """
+        return export_modes(directory, self, npoints=npoints)
+
+    def get_harmonic_thermo(self, hnu, kT=None):
+        if kT is None:
+            kT = self.kT
+
         ZPE_hmodes = []  # Zero point energy for mode
         Z_hmodes = []  # partition function for mode
         e_excitation_hmodes = []  # principle energy of mode
@@ -387,12 +957,12 @@ class AnharmonicModes:
 
         for e in hnu:
             if e.imag == 0 and e.real >= 0.010:
-                Z_mode = 1./(1. - np.exp(-e.real/(self.kT)))
+                Z_mode = 1./(1. - np.exp(-e.real/(kT)))
                 ZPE = 0.5 * e.real
                 e_min_exitation = e.real
-                x = e_min_exitation/self.kT
+                x = e_min_exitation/kT
                 entropic_energy_hmodes.append(
-                   self.kT*(x/(np.exp(x) - 1.) - np.log(1. - np.exp(-x))))
+                   kT*(x/(np.exp(x) - 1.) - np.log(1. - np.exp(-x))))
 
             else:
                 ZPE = 0.
@@ -507,6 +1077,44 @@ class AnharmonicModes:
         write('Zero-point energy: %.3f eV \n' % self.ZPE)
         write('Entropic energy: %.3f eV \n' % self.entropic_energy)
 
+    def evaluation_summary(self, log=None):
+        """Summary of the calculations done for each mode.
+
+        The jump is the distance between the geometries of consecutive
+        calculations, which is what a calculator reusing its previous
+        wavefunction has to bridge. The SCF iterations are only known for
+        calculators with get_number_of_iterations().
+
+        Args:
+            log : if specified, write output to a different location than
+                stdout. Can be an object with a write() method or the name of
+                a file to create.
+        """
+        if log is None:
+            log = self.log
+
+        if isinstance(log, str):
+            log = paropen(log, 'a')
+        write = log.write
+
+        write('Calculations \n')
+        write(40*'-'+'\n')
+        write('  #  calls   jump/call   SCF/call'+'\n')
+        write('  #           Angstrom          '+'\n')
+        write(40*'-'+'\n')
+        for i, an_mode in enumerate(self.an_modes):
+            n_calls = max(an_mode.get('n_calls', 0), 1)
+            if an_mode.get('scf_iterations') is not None:
+                scf = '%8.1f' % (an_mode['scf_iterations'] / n_calls)
+            else:
+                scf = '%8s' % '-'
+            write(
+                '%3d %6d %11.3f   %s \n' %
+                (i, an_mode.get('n_calls', 0),
+                    an_mode.get('geometry_jump', 0.) / n_calls,
+                    scf))
+        write(40*'-'+'\n')
+
     def get_ZPE_of_harmonic_subspace(self, freq=False):
         """Zero-point energy of harmonic subspace
         Args:
@@ -609,6 +1217,22 @@ def gramm(X):
     return np.array(V)
 
 
+def get_axis_hessian(H, axis):
+    """The Hessian projected on the motion of each atom along an axis.
+
+    Args:
+        H (numpy array): Hessian of n atoms (3n x 3n) in eV/Angstrom**2
+        axis (list): The direction the atoms move in
+
+    Returns:
+        Numpy array (n x n) in eV/Angstrom**2
+    """
+    axis = np.asarray(axis, dtype=float) / np.linalg.norm(axis)
+    n = len(H) // 3
+    return np.einsum('iajb,a,b->ij', np.reshape(H, (n, 3, n, 3)),
+                     axis, axis)
+
+
 def calculate_highest_mode_overlap(tangent, modes):
     """Finding best projection mode:
     Calculates the projection of each mode on the tangent for the
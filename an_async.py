@@ -0,0 +1,283 @@
+"""Asyncio driver for the anharmonic modes.
+
+The energies of the modes are calculated by a pool of calculator
+clients speaking the i-PI protocol, e.g.
+ase.calculators.socketio.SocketClient or any electronic structure code
+with i-PI support. The clients connect to one server, stay alive for
+the whole run and only receive new positions. The displacements asked
+for by all modes are dispatched concurrently to the idle clients, so
+the sampling of many modes overlaps without threads or forks.
+"""
+import asyncio
+import os
+import time
+
+import numpy as np
+
+import ase.units as units
+from ase.calculators.socketio import actualunixsocketname
+
+
+class IPIConnection:
+    """Server side of the i-PI protocol for one connected client
+    using asyncio streams.
+
+    Energies and forces are in eV and eV/Angstrom, the conversion to
+    atomic units is done here as in ase.calculators.socketio.
+    """
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    async def sendmsg(self, msg):
+        self.writer.write(msg.encode('ascii').ljust(12))
+        await self.writer.drain()
+
+    async def recvmsg(self):
+        msg = await self.reader.readexactly(12)
+        return msg.rstrip().decode('ascii')
+
+    async def send(self, a, dtype):
+        self.writer.write(np.asarray(a, dtype).tobytes())
+        await self.writer.drain()
+
+    async def recv(self, shape, dtype):
+        nbytes = np.dtype(dtype).itemsize * int(np.prod(shape))
+        buf = await self.reader.readexactly(nbytes)
+        return np.frombuffer(buf, dtype=dtype).reshape(shape)
+
+    async def status(self):
+        await self.sendmsg('STATUS')
+        return await self.recvmsg()
+
+    async def sendinit(self):
+        await self.sendmsg('INIT')
+        await self.send(0, np.int32)  # bead index
+        await self.send(1, np.int32)
+        await self.send(np.zeros(1), np.byte)
+
+    async def calculate(self, positions, cell):
+        """Calculate the energy and forces of the client at positions.
+
+        Args:
+            positions (numpy array): positions of all atoms
+            cell (numpy array): 3x3 unit cell
+
+        Returns:
+            energy (float): The potential energy
+            forces (numpy array): The forces on all atoms
+        """
+        msg = await self.status()
+        if msg == 'NEEDINIT':
+            await self.sendinit()
+            msg = await self.status()
+        assert msg == 'READY', msg
+
+        cell = np.asarray(cell, dtype=float)
+        icell = np.linalg.pinv(cell).transpose()
+
+        await self.sendmsg('POSDATA')
+        await self.send(cell.T / units.Bohr, np.float64)
+        await self.send(icell.T * units.Bohr, np.float64)
+        await self.send(len(positions), np.int32)
+        await self.send(np.asarray(positions) / units.Bohr, np.float64)
+
+        msg = await self.status()
+        assert msg == 'HAVEDATA', msg
+
+        await self.sendmsg('GETFORCE')
+        msg = await self.recvmsg()
+        assert msg == 'FORCEREADY', msg
+
+        e = (await self.recv(1, np.float64))[0]
+        natoms = int((await self.recv(1, np.int32))[0])
+        forces = await self.recv((natoms, 3), np.float64)
+        await self.recv((3, 3), np.float64)  # virial
+        nmorebytes = int((await self.recv(1, np.int32))[0])
+        if nmorebytes > 0:
+            await self.recv(nmorebytes, np.byte)
+
+        return e * units.Ha, forces * units.Ha / units.Bohr
+
+    async def end(self):
+        """Ask the client to exit and close the connection"""
+        try:
+            await self.sendmsg('EXIT')
+        except (ConnectionError, OSError):
+            pass
+        self.writer.close()
+
+
+class AsyncSocketServer:
+    """Server accepting any number of i-PI clients. Each calculation
+    is given to the next idle client, so the clients form a pool of
+    warm calculators.
+    """
+    default_port = 31415
+
+    def __init__(self, port=None, unixsocket=None, log=None):
+        """Initialization
+
+        Args:
+            port (optional[int]): Port to listen for INET connections.
+                Defaults to 31415 if unixsocket is not given either.
+            unixsocket (optional[str]): Name of the unix socket. The
+                socket file is /tmp/ipi_<unixsocket> as in ase.
+            log (optional[file]): Connections are logged here.
+        """
+        if unixsocket is None and port is None:
+            port = self.default_port
+        elif unixsocket is not None and port is not None:
+            raise ValueError('Specify only one of unixsocket and port')
+
+        self.port = port
+        self.unixsocket = unixsocket
+        self.log = log
+
+        self.server = None
+        self.connections = []
+        self.idle = None
+        self.procs = []
+
+    async def start(self):
+        """Start listening for clients"""
+        self.idle = asyncio.Queue()
+
+        if self.unixsocket is not None:
+            self.server = await asyncio.start_unix_server(
+                self.accept, path=actualunixsocketname(self.unixsocket))
+        else:
+            self.server = await asyncio.start_server(
+                self.accept, port=self.port, reuse_address=True)
+
+    async def accept(self, reader, writer):
+        connection = IPIConnection(reader, writer)
+        self.connections.append(connection)
+
+        if self.log is not None:
+            self.log.write('Accepted calculator client %i \n'
+                           % len(self.connections))
+
+        self.idle.put_nowait(connection)
+
+    def launch_clients(self, launch_client, atoms, n_clients):
+        """Launch client processes connecting to the server.
+
+        Args:
+            launch_client (function): Called as
+                launch_client(atoms, properties, port, unixsocket) and
+                returning the process, like the launch_client of
+                ase.calculators.socketio.SocketIOCalculator,
+                e.g. ase.calculators.socketio.PySocketIOClient.
+            atoms (ase object): The atoms to calculate
+            n_clients (int): Number of clients
+        """
+        for _ in range(n_clients):
+            self.procs.append(launch_client(
+                atoms, ['energy', 'forces'],
+                port=self.port, unixsocket=self.unixsocket))
+
+    async def calculate(self, positions, cell):
+        """Calculate the energy and forces with the next idle client.
+
+        Returns:
+            energy (float): The potential energy
+            forces (numpy array): The forces on all atoms
+            seconds (float): Wall time of the calculation
+        """
+        connection = await self.get_idle_connection()
+        try:
+            start_time = time.time()
+            energy, forces = await connection.calculate(positions, cell)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            self.connections.remove(connection)
+            raise
+        self.idle.put_nowait(connection)
+
+        return energy, forces, time.time() - start_time
+
+    async def get_idle_connection(self):
+        """Wait for an idle client. Fails if all launched clients
+        have stopped without connecting."""
+        while True:
+            try:
+                return await asyncio.wait_for(self.idle.get(), 1.0)
+            except asyncio.TimeoutError:
+                if (self.procs and not self.connections and
+                        all(p.poll() is not None for p in self.procs)):
+                    raise OSError('Calculator clients terminated '
+                                  'unexpectedly')
+
+    async def close(self):
+        """Stop all clients and the server"""
+        for connection in self.connections:
+            await connection.end()
+        self.connections = []
+
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+        if self.unixsocket is not None:
+            socketfile = actualunixsocketname(self.unixsocket)
+            if os.path.exists(socketfile):
+                os.unlink(socketfile)
+
+        for proc in self.procs:
+            proc.wait()
+        self.procs = []
+
+
+async def drive_mode(AMA, server, cell, is_budget_exhausted=None):
+    """Run the sampling of a mode through ask/tell with all pending
+    displacements calculated concurrently on the server. The clients
+    only calculate single points, so a translation with a relax_axis
+    raises a ValueError.
+
+    Args:
+        AMA (obj): The analysis object of the mode
+        server (AsyncSocketServer): The server with the clients
+        cell (numpy array): 3x3 unit cell of the atoms
+        is_budget_exhausted (optional[function]): Called without
+            arguments, stops the mode when it returns True.
+    """
+    if not AMA.can_calculate_batch():
+        raise ValueError('The points of the mode are relaxed along the '
+                         'relax_axis, which the clients cannot do')
+
+    points = AMA.ask()
+    while len(points) > 0:
+        # Dispatched in nearest neighbour order along the mode
+        order = AMA.get_evaluation_order(
+            [positions for _, positions in points])
+        ordered_results = await asyncio.gather(*[
+            server.calculate(points[i][1], cell) for i in order])
+
+        results = [None] * len(points)
+        for i, result in zip(order, ordered_results):
+            results[i] = result
+
+        energies, forces, seconds = zip(*results)
+        AMA.tell(list(energies), list(forces), seconds=list(seconds))
+
+        if (is_budget_exhausted is not None and is_budget_exhausted() and
+                getattr(AMA, 'fitobj', None) is not None):
+            AMA.finish()
+            return
+
+        points = AMA.ask()
+
+
+async def drive_modes(AMAs, server, cell, is_budget_exhausted=None):
+    """Run the sampling of all modes concurrently
+
+    Args:
+        AMAs (list): The analysis objects of the modes
+        server (AsyncSocketServer): The started server
+        cell (numpy array): 3x3 unit cell of the atoms
+        is_budget_exhausted (optional[function]): see drive_mode
+    """
+    await asyncio.gather(*[
+        drive_mode(AMA, server, cell, is_budget_exhausted)
+        for AMA in AMAs])
@@ -0,0 +1,259 @@
+import pickle
+import sqlite3
+import time
+
+import numpy as np
+
+from ase.parallel import world
+
+from an_journal import ModeJournal
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS modes (
+    id INTEGER PRIMARY KEY,
+    system TEXT NOT NULL,
+    mode_hash TEXT NOT NULL,
+    type TEXT,
+    snapshot BLOB,
+    updated REAL,
+    UNIQUE (system, mode_hash));
+CREATE INDEX IF NOT EXISTS modes_mode_hash ON modes (mode_hash);
+CREATE TABLE IF NOT EXISTS journal (
+    mode_id INTEGER NOT NULL,
+    seq INTEGER NOT NULL,
+    record BLOB,
+    PRIMARY KEY (mode_id, seq));
+CREATE TABLE IF NOT EXISTS points (
+    mode_id INTEGER NOT NULL,
+    idx INTEGER NOT NULL,
+    displacement BLOB,
+    energy REAL,
+    force BLOB,
+    positions BLOB,
+    PRIMARY KEY (mode_id, idx));
+CREATE TABLE IF NOT EXISTS results (
+    mode_id INTEGER NOT NULL,
+    temperature REAL NOT NULL,
+    ZPE REAL,
+    Z_mode REAL,
+    entropic_energy REAL,
+    energy_levels BLOB,
+    fit BLOB,
+    n_calls INTEGER,
+    updated REAL,
+    PRIMARY KEY (mode_id, temperature));
+CREATE INDEX IF NOT EXISTS results_temperature ON results (temperature);
+"""
+
+
+class ResultsDatabase:
+    """SQLite store of the anharmonic modes of a project.
+
+    The modes are identified by the fingerprint of the system and the
+    hash of the mode definition (see an_utils.get_system_fingerprint and
+    an_utils.get_mode_hash), so a mode defined again in another run
+    finds its sampled points. The tables are
+
+        modes    -- definition and snapshot of each mode object
+        journal  -- changes of the mode objects since their snapshot
+        points   -- displacement, energy, projected force and positions
+                    of every calculation
+        results  -- ZPE, Z_mode, entropic energy, energy levels and the
+                    fit of each mode for each temperature
+
+    Only the master rank writes in a parallel run.
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        self.connection = sqlite3.connect(filename, timeout=60)
+        if world.rank == 0:
+            with self.connection:
+                self.connection.executescript(SCHEMA)
+
+    def get_mode_id(self, system, mode_hash, mode_type=None):
+        """The id of a mode, which is added if it is not in the
+        database"""
+        row = self.connection.execute(
+            'SELECT id FROM modes WHERE system = ? AND mode_hash = ?',
+            (system, mode_hash)).fetchone()
+        if row is not None:
+            return row[0]
+
+        if world.rank == 0:
+            with self.connection:
+                self.connection.execute(
+                    'INSERT OR IGNORE INTO modes '
+                    '(system, mode_hash, type, updated) VALUES (?, ?, ?, ?)',
+                    (system, mode_hash, mode_type, time.time()))
+
+        return self.connection.execute(
+            'SELECT id FROM modes WHERE system = ? AND mode_hash = ?',
+            (system, mode_hash)).fetchone()[0]
+
+    def write_results(self, mode_id, temperature, ZPE, Z_mode,
+                      entropic_energy, energy_levels, fitobj=None,
+                      n_calls=None):
+        """Store the thermodynamics of a mode at a temperature"""
+        if world.rank != 0:
+            return
+        with self.connection:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO results VALUES '
+                '(?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (mode_id, float(temperature), float(ZPE), float(Z_mode),
+                 float(entropic_energy), dumps(list(energy_levels)),
+                 None if fitobj is None else dumps(fitobj),
+                 n_calls, time.time()))
+
+    def get_results(self, system=None, mode_hash=None, temperature=None,
+                    mode_type=None):
+        """The results matching the given system, mode hash, temperature
+        and mode type. None matches everything.
+
+        Returns:
+            List of dictionaries with the system, mode_hash, type,
+                temperature, ZPE, Z_mode, entropic_energy, energy_levels
+                and n_calls of each result
+        """
+        conditions = []
+        values = []
+        for column, value in [('m.system', system),
+                              ('m.mode_hash', mode_hash),
+                              ('r.temperature', temperature),
+                              ('m.type', mode_type)]:
+            if value is not None:
+                conditions.append('%s = ?' % column)
+                values.append(value)
+
+        query = (
+            'SELECT m.system, m.mode_hash, m.type, r.temperature, r.ZPE, '
+            'r.Z_mode, r.entropic_energy, r.energy_levels, r.n_calls '
+            'FROM results r JOIN modes m ON r.mode_id = m.id')
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+
+        keys = ['system', 'mode_hash', 'type', 'temperature', 'ZPE',
+                'Z_mode', 'entropic_energy', 'energy_levels', 'n_calls']
+        results = []
+        for row in self.connection.execute(query, values):
+            result = dict(zip(keys, row))
+            result['energy_levels'] = loads(result['energy_levels'])
+            results.append(result)
+
+        return results
+
+    def get_fit(self, mode_id, temperature):
+        """The stored fit of a mode at a temperature, or None"""
+        row = self.connection.execute(
+            'SELECT fit FROM results WHERE mode_id = ? AND temperature = ?',
+            (mode_id, float(temperature))).fetchone()
+        if row is None or row[0] is None:
+            return None
+        return loads(row[0])
+
+    def get_points(self, mode_id):
+        """The calculations of a mode in the order they were done.
+
+        Returns:
+            displacements (list), energies (numpy array), forces (list)
+                and positions (list)
+        """
+        rows = self.connection.execute(
+            'SELECT displacement, energy, force, positions FROM points '
+            'WHERE mode_id = ? ORDER BY idx', (mode_id,)).fetchall()
+        return ([loads(row[0]) for row in rows],
+                np.array([row[1] for row in rows]),
+                [loads(row[2]) for row in rows],
+                [loads(row[3]) for row in rows])
+
+    def close(self):
+        self.connection.close()
+
+
+class DatabaseJournal(ModeJournal):
+    """Journal of a mode object in a ResultsDatabase instead of files.
+
+    The records and snapshots are as for ModeJournal, and each record
+    is written in one transaction together with the new calculations
+    of the mode in the points table.
+    """
+    def __init__(self, database, system, mode_hash, mode_type=None,
+                 snapshot_every=50):
+        super(DatabaseJournal, self).__init__(
+            None, snapshot_every=snapshot_every)
+        self.database = database
+        self.mode_id = database.get_mode_id(system, mode_hash, mode_type)
+        self.positions = {}
+
+    def add_positions(self, index, positions):
+        """The positions of the calculation with the index, to be stored
+        with the next record"""
+        self.positions[index] = positions
+
+    def read_snapshot(self):
+        row = self.database.connection.execute(
+            'SELECT snapshot FROM modes WHERE id = ?',
+            (self.mode_id,)).fetchone()
+        if row is None or row[0] is None:
+            return None
+        return loads(row[0])
+
+    def read_records(self, truncate=True):
+        return [loads(row[0]) for row in self.database.connection.execute(
+            'SELECT record FROM journal WHERE mode_id = ? ORDER BY seq',
+            (self.mode_id,))]
+
+    def write_record(self, record):
+        if world.rank != 0:
+            return
+        connection = self.database.connection
+        with connection:
+            seq = connection.execute(
+                'SELECT COALESCE(MAX(seq), -1) + 1 FROM journal '
+                'WHERE mode_id = ?', (self.mode_id,)).fetchone()[0]
+            connection.execute(
+                'INSERT INTO journal VALUES (?, ?, ?)',
+                (self.mode_id, seq, dumps(record)))
+
+            self.write_points(record)
+
+    def write_points(self, record):
+        """Add the new calculations of a record to the points table"""
+        if 'displacement_energies' in record['append']:
+            start, energies = record['append']['displacement_energies']
+        elif 'displacement_energies' in record['set']:
+            start, energies = 0, record['set']['displacement_energies']
+        else:
+            return
+
+        an_mode = self.state
+
+        forces = an_mode.get('displacement_forces', [])
+        for i, energy in enumerate(energies, start):
+            self.database.connection.execute(
+                'INSERT OR REPLACE INTO points VALUES (?, ?, ?, ?, ?, ?)',
+                (self.mode_id, i, dumps(an_mode['displacements'][i]),
+                 float(energy),
+                 dumps(forces[i] if i < len(forces) else None),
+                 dumps(self.positions.pop(i, None))))
+
+    def write_snapshot(self, an_mode):
+        if world.rank != 0:
+            return
+        connection = self.database.connection
+        with connection:
+            connection.execute(
+                'UPDATE modes SET snapshot = ?, updated = ? WHERE id = ?',
+                (dumps(an_mode), time.time(), self.mode_id))
+            connection.execute(
+                'DELETE FROM journal WHERE mode_id = ?', (self.mode_id,))
+
+
+def dumps(obj):
+    return sqlite3.Binary(pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def loads(blob):
+    if blob is None:
+        return None
+    return pickle.loads(bytes(blob))
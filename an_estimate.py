@@ -0,0 +1,77 @@
+import numpy as np
+
+from ase.calculators.calculator import Calculator, all_changes
+
+
+class HarmonicCalculator(Calculator):
+    """The harmonic potential around a reference geometry, from the
+    Hessian of a vibrations object. Used as a surrogate of the potential
+    energy to estimate the cost of an analysis.
+
+    Args:
+        positions (numpy array): The reference positions of all atoms
+        indices (list): The atoms of the Hessian
+        hessian (numpy array): Hessian of the atoms (3n x 3n) in
+            eV/Angstrom**2
+        energy (optional[float]): The energy at the reference positions
+    """
+    implemented_properties = ['energy', 'forces']
+
+    def __init__(self, positions, indices, hessian, energy=0.):
+        Calculator.__init__(self)
+        self.reference_positions = np.array(positions)
+        self.indices = list(indices)
+        self.hessian = np.asarray(hessian)
+        self.reference_energy = energy
+
+    def calculate(self, atoms=None, properties=['energy'],
+                  system_changes=all_changes):
+        Calculator.calculate(self, atoms, properties, system_changes)
+
+        delta = (self.atoms.get_positions()
+                 - self.reference_positions)[self.indices].ravel()
+        gradient = np.dot(self.hessian, delta)
+
+        forces = np.zeros((len(self.atoms), 3))
+        forces[self.indices] = -gradient.reshape(-1, 3)
+
+        self.results = {
+            'energy': self.reference_energy + 0.5*np.dot(delta, gradient),
+            'forces': forces}
+
+
+class ScaledCalculator(Calculator):
+    """Another calculator with its energy relative to a reference energy,
+    and its forces, multiplied by a factor. This makes the potential
+    stiffer (scale > 1) or softer (scale < 1).
+
+    Args:
+        calc (obj): The calculator
+        scale (float): The factor
+        energy (optional[float]): The reference energy, which is kept
+    """
+    implemented_properties = ['energy', 'forces']
+
+    def __init__(self, calc, scale, energy=0.):
+        Calculator.__init__(self)
+        self.calc = calc
+        self.scale = scale
+        self.reference_energy = energy
+
+    def calculate(self, atoms=None, properties=['energy'],
+                  system_changes=all_changes):
+        Calculator.calculate(self, atoms, properties, system_changes)
+
+        atoms = self.atoms.copy()
+        atoms.set_calculator(self.calc)
+
+        self.results = {
+            'energy': self.reference_energy + self.scale*(
+                atoms.get_potential_energy() - self.reference_energy),
+            'forces': self.scale*atoms.get_forces()}
+
+
+def get_cost_range(values):
+    """The estimate, the first of the values, and the range of all the
+    values as (lowest, highest)"""
+    return values[0], (min(values), max(values))
@@ -0,0 +1,269 @@
+import os
+import shutil
+
+import numpy as np
+
+from an_utils import get_system_fingerprint
+
+# The columns of the index, one row per mode. The segment column is the
+# export that wrote the blocks of the mode, and the *_start and *_stop
+# columns are the rows of the mode in the blocks of that segment.
+INDEX_DTYPE = np.dtype([
+    ('system', 'U40'),
+    ('mode_hash', 'U40'),
+    ('type', 'U16'),
+    ('temperature', 'f8'),
+    ('groundstate_energy', 'f8'),
+    ('ZPE', 'f8'),
+    ('Z_mode', 'f8'),
+    ('entropic_energy', 'f8'),
+    ('n_calls', 'i8'),
+    ('segment', 'i8'),
+    ('sample_start', 'i8'),
+    ('sample_stop', 'i8'),
+    ('grid_start', 'i8'),
+    ('grid_stop', 'i8'),
+    ('level_start', 'i8'),
+    ('level_stop', 'i8')])
+
+# The blocks of a segment with the rows of its modes after each other,
+# and the index columns giving their range. Displacements and projected
+# forces have two columns, the second is NaN for modes with one
+# coordinate.
+BLOCKS = {
+    'sample_displacements': 'sample',
+    'sample_energies': 'sample',
+    'sample_forces': 'sample',
+    'grid_displacements': 'grid',
+    'grid_energies': 'grid',
+    'energy_levels': 'level'}
+
+
+class ModeArchive:
+    """Columnar archive of the samples, fitted potentials, spectra and
+    thermodynamics of many modes, e.g. of a whole campaign of systems.
+
+    The archive is a directory with the index table index.npy, one row
+    per mode (see INDEX_DTYPE), and a directory segment_<n> per export
+    with one .npy block per column of the samples, the potentials and the
+    energy levels of the modes it added (see BLOCKS). Every file is
+    memory mapped, so the rows of a single mode are NumPy views without
+    copies or unpickling, and the index has the columns of all modes.
+
+    Args:
+        directory (str): The directory of the archive
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        self.index = load_block(os.path.join(directory, 'index.npy'))
+        self.segments = {}
+
+    def __len__(self):
+        return len(self.index)
+
+    def get_segment(self, segment):
+        """The blocks of a segment by name, memory mapped when first
+        used"""
+        if segment not in self.segments:
+            segment_directory = get_segment_directory(self.directory,
+                                                      segment)
+            self.segments[segment] = dict(
+                (name, load_block(os.path.join(segment_directory,
+                                               name + '.npy')))
+                for name in BLOCKS)
+        return self.segments[segment]
+
+    def get_block(self, name, i):
+        """The rows of the block with the name of mode i (a view)"""
+        prefix = BLOCKS[name]
+        row = self.index[i]
+        return self.get_segment(int(row['segment']))[name][
+            row[prefix + '_start']:row[prefix + '_stop']]
+
+    def get_samples(self, i):
+        """The displacements, energies and projected forces of the
+        samples of mode i"""
+        return (self.get_block('sample_displacements', i),
+                self.get_block('sample_energies', i),
+                self.get_block('sample_forces', i))
+
+    def get_potential(self, i):
+        """The fitted potential of mode i on its grid, displacements and
+        energies"""
+        return (self.get_block('grid_displacements', i),
+                self.get_block('grid_energies', i))
+
+    def get_energy_levels(self, i):
+        """The energy levels of mode i"""
+        return self.get_block('energy_levels', i)
+
+    def select(self, **columns):
+        """The indices of the modes with the given values of the index
+        columns, e.g. select(type='vibration', temperature=300)"""
+        mask = np.ones(len(self.index), dtype=bool)
+        for column, value in columns.items():
+            mask &= self.index[column] == value
+        return np.nonzero(mask)[0]
+
+
+def load_block(filename):
+    """Memory map a .npy file"""
+    try:
+        return np.load(filename, mmap_mode='r')
+    except ValueError:
+        # An empty block cannot be memory mapped
+        return np.load(filename)
+
+
+def export_modes(directory, AM, npoints=64):
+    """Add the modes of an analysis to an archive (see ModeArchive). A
+    mode already in the archive with the same system, mode_hash and
+    temperature is replaced.
+
+    The modes are written as a new segment and only the index is
+    rewritten, so an export does not read or copy the blocks of the
+    modes already in the archive. The index is written last, through a
+    temporary file and a rename, so an interrupted export leaves the
+    archive as it was. Segments without modes left in the index are
+    removed after that. Exports to the same archive are not locked and
+    should not run at the same time.
+
+    Args:
+        directory (str): The directory of the archive, created if needed
+        AM (AnharmonicModes): The analysis, after run()
+        npoints (optional[int]): Points of the grid of the fitted
+            potentials, see BaseAnalysis.get_fit_grid
+
+    Returns:
+        The ModeArchive
+    """
+    temperature = AM.settings.get('temperature', 300)
+
+    index_filename = os.path.join(directory, 'index.npy')
+    index = np.zeros(0, dtype=INDEX_DTYPE)
+    if os.path.exists(index_filename):
+        index = np.load(index_filename)
+    segment = index['segment'].max() + 1 if len(index) else 0
+
+    modes = []
+    for i in range(len(AM.an_modes)):
+        mode = get_mode_columns(AM.get_analysis_object(i), npoints)
+        mode['row']['temperature'] = temperature
+        mode['row']['segment'] = segment
+        modes = [m for m in modes if not is_same_mode(m['row'], mode['row'])]
+        modes.append(mode)
+
+    rows = write_segment(get_segment_directory(directory, segment), modes)
+
+    keep = np.array([not any(is_same_mode(row, new) for new in rows)
+                     for row in index], dtype=bool)
+    index = np.concatenate([index[keep], rows])
+    write_index(index_filename, index)
+
+    remove_unused_segments(directory, index)
+
+    return ModeArchive(directory)
+
+
+def get_mode_columns(AMA, npoints):
+    """The index row and the rows of the blocks of an analysed mode"""
+    an_mode = AMA.an_mode
+    energies = np.array(an_mode['displacement_energies'], dtype=float)
+    n = len(energies)
+
+    displacements = np.full((n, 2), np.nan)
+    forces = np.full((n, 2), np.nan)
+    for j, displacement in enumerate(an_mode['displacements'][:n]):
+        displacement = np.atleast_1d(np.asarray(displacement, dtype=float))
+        displacements[j, :len(displacement)] = displacement
+    for j, force in enumerate(an_mode.get('displacement_forces', [])[:n]):
+        if force is None:
+            continue
+        force = np.atleast_1d(np.asarray(force, dtype=float))
+        forces[j, :len(force)] = force
+
+    grid_displacements = np.full((0, 2), np.nan)
+    grid_energies = np.zeros(0)
+    if an_mode.get('fit') is not None:
+        x, grid_energies = AMA.get_fit_grid(npoints)
+        grid_displacements = np.full((len(x), 2), np.nan)
+        grid_displacements[:, :np.ndim(x)] = np.reshape(x, (len(x), -1))
+
+    row = np.zeros((), dtype=INDEX_DTYPE)
+    row['system'] = get_system_fingerprint(AMA.get_reference_atoms())
+    row['mode_hash'] = an_mode.get('mode_hash', AMA.get_mode_hash())
+    row['type'] = an_mode['type']
+    row['groundstate_energy'] = np.min(energies)
+    row['ZPE'] = an_mode['ZPE']
+    row['Z_mode'] = an_mode['Z_mode']
+    row['entropic_energy'] = AMA.get_entropic_energy(
+        an_mode['energy_levels'])
+    row['n_calls'] = an_mode.get('n_calls', 0)
+
+    return {
+        'row': row,
+        'sample_displacements': displacements,
+        'sample_energies': energies,
+        'sample_forces': forces,
+        'grid_displacements': grid_displacements,
+        'grid_energies': np.asarray(grid_energies, dtype=float),
+        'energy_levels': np.array(an_mode['energy_levels'], dtype=float)}
+
+
+def is_same_mode(row, other):
+    return all(row[key] == other[key]
+               for key in ['system', 'mode_hash', 'temperature'])
+
+
+def get_segment_directory(directory, segment):
+    return os.path.join(directory, 'segment_%i' % segment)
+
+
+def write_segment(segment_directory, modes):
+    """Write the blocks of the modes to a segment directory.
+
+    Returns:
+        The index rows of the modes
+    """
+    if os.path.isdir(segment_directory):
+        # Left by an interrupted export
+        shutil.rmtree(segment_directory)
+    os.makedirs(segment_directory)
+
+    index = np.zeros(len(modes), dtype=INDEX_DTYPE)
+    stops = dict((prefix, 0) for prefix in BLOCKS.values())
+    for i, mode in enumerate(modes):
+        index[i] = mode['row']
+        for prefix, name in [('sample', 'sample_energies'),
+                             ('grid', 'grid_energies'),
+                             ('level', 'energy_levels')]:
+            index[prefix + '_start'][i] = stops[prefix]
+            stops[prefix] += len(mode[name])
+            index[prefix + '_stop'][i] = stops[prefix]
+
+    for name in BLOCKS:
+        width = (2,) if name.endswith(('displacements', 'forces')) else ()
+        np.save(os.path.join(segment_directory, name + '.npy'),
+                np.concatenate(
+                    [np.reshape(mode[name], (-1,) + width)
+                     for mode in modes] + [np.zeros((0,) + width)]))
+
+    return index
+
+
+def write_index(filename, index):
+    """Replace the index through a temporary file and a rename"""
+    with open(filename + '.tmp', 'wb') as f:
+        np.save(f, index)
+    os.replace(filename + '.tmp', filename)
+
+
+def remove_unused_segments(directory, index):
+    """Remove the segment directories without a mode in the index"""
+    used = set(get_segment_directory(directory, segment)
+               for segment in index['segment'])
+    for fn in os.listdir(directory):
+        segment_directory = os.path.join(directory, fn)
+        if (fn.startswith('segment_') and os.path.isdir(segment_directory)
+                and segment_directory not in used):
+            shutil.rmtree(segment_directory)
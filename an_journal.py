@@ -0,0 +1,269 @@
+import os
+import pickle
+
+import numpy as np
+
+from ase.parallel import paropen, world
+
+
+class ModeJournal:
+    """Crash safe backup of a mode object.
+
+    Every save appends one record to filename+'.journal' with the keys
+    of the mode object that changed since the last record. A list that
+    grew only gets its new items, stored with the index they start at,
+    so saving a point costs the same however many points the mode has.
+    The journal keeps the length and the last item of each list at the
+    last record to find the new items, and a list that got shorter or
+    no longer has that item there is stored whole. Other values are
+    stored whole when they are replaced. This makes the records
+    idempotent: replaying a record twice gives the same mode object.
+
+    After every snapshot_every records the whole mode object is written
+    to filename+'.pckl' through a temporary file and a rename, so the
+    snapshot is always complete, and the journal is started over. The
+    snapshot is a pickled mode object as the backups have always been.
+
+    The lists of the mode object are expected to only grow, as items
+    changed in place are not noticed, and the other values to be
+    replaced rather than changed in place.
+    """
+    def __init__(self, filename, snapshot_every=50):
+        self.filename = filename
+        self.snapshot_every = snapshot_every
+        self.state = {}
+        self.lengths = {}
+        self.n_records = 0
+
+    def get_snapshot_filename(self):
+        return self.filename + '.pckl'
+
+    def get_journal_filename(self):
+        return self.filename + '.journal'
+
+    def load(self, truncate=True):
+        """Read the snapshot and replay the journal on top of it.
+
+        A record that was only partly written, e.g. by a crash, ends the
+        journal and is cut off the file.
+
+        Args:
+            truncate (optional[bool]): Cut a partly written record off the
+                file. Only the run that owns the backup should do this, so
+                a backup that may be of another mode, which another run can
+                be writing to, is read without truncate.
+
+        Returns:
+            The mode object, or None if there is no backup
+        """
+        an_mode = self.read_snapshot()
+
+        records = self.read_records(truncate)
+        if len(records) > 0 and an_mode is None:
+            an_mode = {}
+        for record in records:
+            apply_record(an_mode, record)
+        self.n_records = len(records)
+
+        if an_mode is not None:
+            self.set_state(an_mode)
+
+        return an_mode
+
+    def read_snapshot(self):
+        """The mode object of the snapshot, or None if there is none"""
+        if not os.path.exists(self.get_snapshot_filename()):
+            return None
+        with open(self.get_snapshot_filename(), 'rb') as f:
+            return pickle.load(f)
+
+    def read_records(self, truncate=True):
+        """The complete records of the journal, see load"""
+        filename = self.get_journal_filename()
+        if not os.path.exists(filename):
+            return []
+
+        records = []
+        with open(filename, 'rb') as f:
+            end = 0
+            while True:
+                try:
+                    records.append(pickle.load(f))
+                    end = f.tell()
+                except EOFError:
+                    break
+                except Exception:
+                    # A torn record at the end of the file
+                    break
+
+        if truncate and end < os.path.getsize(filename) and world.rank == 0:
+            with open(filename, 'r+b') as f:
+                f.truncate(end)
+
+        return records
+
+    def record(self, an_mode):
+        """Append the changes of the mode object since the last record to
+        the journal, and write a snapshot every snapshot_every records.
+
+        Args:
+            an_mode (dict): The mode object
+        """
+        record = self.get_changes(an_mode)
+        if record is None:
+            return
+
+        self.write_record(record)
+
+        self.n_records += 1
+        if self.n_records >= self.snapshot_every:
+            self.snapshot(an_mode)
+
+    def snapshot(self, an_mode):
+        """Write the whole mode object atomically and start the journal
+        over. A crash before the journal is emptied is harmless, as the
+        records are replayed on an up to date snapshot.
+
+        Args:
+            an_mode (dict): The mode object
+        """
+        self.write_snapshot(an_mode)
+
+        self.n_records = 0
+        self.set_state(an_mode)
+
+    def write_record(self, record):
+        """Append a record to the journal file and flush it to disk"""
+        with paropen(self.get_journal_filename(), 'ab') as f:
+            pickle.dump(record, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def write_snapshot(self, an_mode):
+        """Replace the snapshot file by the mode object and empty the
+        journal file"""
+        tmp_filename = self.get_snapshot_filename() + '.tmp'
+        with paropen(tmp_filename, 'wb') as f:
+            pickle.dump(an_mode, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+
+        if world.rank == 0:
+            os.replace(tmp_filename, self.get_snapshot_filename())
+            open(self.get_journal_filename(), 'wb').close()
+
+    def set_state(self, an_mode):
+        """Take the mode object as the last record"""
+        self.state = {}
+        self.lengths = {}
+        self.update_state(an_mode, an_mode)
+
+    def update_state(self, an_mode, keys):
+        """Take the values of the keys of the mode object as the last
+        record. Lists are not copied, only their length and last item are
+        kept with them."""
+        for key in keys:
+            value = an_mode[key]
+            self.state[key] = value
+            if isinstance(value, list):
+                self.lengths[key] = (len(value), value[-1] if value else None)
+            else:
+                self.lengths.pop(key, None)
+
+    def get_changes(self, an_mode):
+        """The record of the changes of the mode object since the last
+        record, or None if nothing changed"""
+        record = {
+            'set': {},
+            'append': {},
+            'delete': [key for key in self.state if key not in an_mode]}
+
+        for key, value in an_mode.items():
+            if isinstance(value, list) and key in self.lengths:
+                n, last = self.lengths[key]
+                if len(value) >= n and (
+                        n == 0 or is_same_item(value[n-1], last)):
+                    if len(value) > n:
+                        record['append'][key] = (n, value[n:])
+                    continue
+            elif key in self.state and self.state[key] is value:
+                continue
+
+            record['set'][key] = value
+
+        if not (record['set'] or record['append'] or record['delete']):
+            return None
+
+        for key in record['delete']:
+            del self.state[key]
+            self.lengths.pop(key, None)
+        self.update_state(
+            an_mode, list(record['set']) + list(record['append']))
+
+        return record
+
+
+def get_index_filename(filename):
+    """The index of the backups next to the backup filename whose names
+    start in the same way, e.g. an_mode_backups.index for an_mode_0"""
+    directory, name = os.path.split(filename)
+    return os.path.join(directory,
+                        name.rstrip('0123456789') + 'backups.index')
+
+
+def read_backup_index(index_filename):
+    """The index of the backups in the file index_filename, see
+    get_index_filename.
+
+    Returns:
+        Dictionary from the hash of a mode to the name of its backup files,
+        without the .pckl and .journal extensions
+    """
+    if not os.path.exists(index_filename):
+        return {}
+    with open(index_filename, 'rb') as f:
+        return pickle.load(f)
+
+
+def add_to_backup_index(index_filename, mode_hash, filename):
+    """Add the backup files filename of the mode with the hash to the
+    index in the file index_filename. The index is replaced through a
+    temporary file and a rename, but it is not locked, so runs that add
+    to the same index at the same time can lose an entry. The backup of
+    that mode is then only found at the filename the mode gets in the
+    next run.
+    """
+    index = read_backup_index(index_filename)
+    if index.get(mode_hash) == filename:
+        return
+    index[mode_hash] = filename
+
+    tmp_filename = index_filename + '.tmp'
+    with paropen(tmp_filename, 'wb') as f:
+        pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    if world.rank == 0:
+        os.replace(tmp_filename, index_filename)
+
+
+def is_same_item(a, b):
+    """Check if two items of a list of the mode object are the same"""
+    if a is b:
+        return True
+    try:
+        return bool(np.all(a == b))
+    except ValueError:
+        # Arrays of different shapes
+        return False
+
+
+def apply_record(an_mode, record):
+    """Replay a record of the journal on the mode object"""
+    for key, value in record['set'].items():
+        an_mode[key] = value
+
+    for key, (start, items) in record['append'].items():
+        an_mode[key] = list(an_mode.get(key, []))[:start] + list(items)
+
+    for key in record['delete']:
+        an_mode.pop(key, None)
@@ -0,0 +1,95 @@
+import numpy as np
+
+
+class SampleStore:
+    """A cache of the samples of a mode with the calculated points sorted
+    by displacement.
+
+    It holds a copy of the displacements, energies and projected forces
+    of the mode object, which stay the record of the samples, and it is
+    only kept for the session, see BaseAnalysis.get_samples. Its use is
+    that the order of the calculated points by displacement is updated
+    as they are added, instead of sorting all of them at every step.
+    The displacements after the last energy are the pending ones.
+
+    Args:
+        ndim (optional[int]): Number of coordinates of a displacement
+    """
+    def __init__(self, ndim=1):
+        self.ndim = ndim
+        self._displacements = []
+        self._energies = []
+        self._forces = []
+        self._order = []
+
+    def __len__(self):
+        return len(self._energies)
+
+    @property
+    def n_points(self):
+        return len(self._displacements)
+
+    @property
+    def n_energies(self):
+        return len(self._energies)
+
+    @property
+    def displacements(self):
+        """All displacements, with the pending ones"""
+        return np.array(self._displacements, dtype=float)
+
+    @property
+    def sampled_displacements(self):
+        """The displacements with an energy"""
+        return self.displacements[:self.n_energies]
+
+    @property
+    def pending(self):
+        """The displacements without an energy yet"""
+        return self.displacements[self.n_energies:]
+
+    @property
+    def energies(self):
+        return np.array(self._energies, dtype=float)
+
+    @property
+    def forces(self):
+        """The projected forces of the energies, NaN where unknown"""
+        return np.array(self._forces, dtype=float)
+
+    @property
+    def order(self):
+        """The indices of the energies sorted by displacement for modes
+        along one coordinate, otherwise in the order they were added"""
+        return np.array(self._order, dtype=int)
+
+    def has_forces(self):
+        """Check if the projected forces of all energies are known"""
+        return not np.any(np.isnan(self.forces))
+
+    def get_sorted(self):
+        """The displacements with an energy and their energies sorted by
+        displacement, see order"""
+        order = self.order
+        return self.sampled_displacements[order], self.energies[order]
+
+    def add_displacement(self, displacement):
+        """Add a pending displacement"""
+        self._displacements.append(displacement)
+
+    def add_energy(self, energy, force=None):
+        """Add the energy, and the projected force if known, of the first
+        pending displacement"""
+        assert self.n_energies < self.n_points, 'No pending displacement'
+
+        i = self.n_energies
+        self._energies.append(energy)
+        self._forces.append(np.nan if force is None else force)
+
+        if self.ndim == 1:
+            # A new point goes after the equal ones
+            x = [self._displacements[k] for k in self._order]
+            j = np.searchsorted(x, self._displacements[i], side='right')
+            self._order.insert(j, i)
+        else:
+            self._order.append(i)
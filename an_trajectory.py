@@ -0,0 +1,69 @@
+import os
+
+from ase.io.trajectory import Trajectory
+from ase.calculators.singlepoint import SinglePointCalculator
+
+TRAJECTORY_POLICIES = ['off', 'energies', 'full']
+
+
+class CalculationTrajectory:
+    """Buffered trajectory of the calculations of a mode.
+
+    The images are kept in memory and only written by flush(), which
+    opens the file in append mode and closes it again, so no file is
+    kept open and the modes of a run can share one file. Each image has
+    the metadata of the calculation in atoms.info, e.g. the mode_hash
+    and the displacement, to tell the modes apart. There is no locking,
+    so two processes must not write to the same file.
+
+    Args:
+        filename (str): The trajectory file
+        atoms (ase object): The atoms of the calculations
+        policy (optional[str]): 'full' stores the energies and forces,
+            'energies' only the energies
+    """
+    def __init__(self, filename, atoms, policy='full'):
+        assert policy in TRAJECTORY_POLICIES[1:], policy
+        self.filename = filename
+        self.atoms = atoms.copy()
+        self.atoms.set_calculator(None)
+        self.policy = policy
+        self.images = []
+
+    def add(self, positions, energy, forces=None, info=None):
+        """Add the result of a calculation to the buffer.
+
+        Args:
+            positions (numpy array): The positions of all atoms
+            energy (float): The potential energy
+            forces (optional[numpy array]): The forces on all atoms
+            info (optional[dict]): Metadata of the calculation
+        """
+        atoms = self.atoms.copy()
+        atoms.set_positions(positions)
+        if self.policy != 'full':
+            forces = None
+        atoms.set_calculator(SinglePointCalculator(
+            atoms, energy=energy, forces=forces))
+        if info is not None:
+            atoms.info.update(info)
+        self.images.append(atoms)
+
+    def flush(self):
+        """Append the buffered images to the file"""
+        if len(self.images) == 0:
+            return
+
+        if os.path.exists(self.filename) and os.path.getsize(self.filename):
+            mode = 'a'
+        else:
+            mode = 'w'
+
+        traj = Trajectory(self.filename, mode)
+        try:
+            for atoms in self.images:
+                traj.write(atoms)
+        finally:
+            traj.close()
+
+        self.images = []
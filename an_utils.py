@@ -1,3 +1,5 @@
+import hashlib
+
 import numpy as np
 
 
@@ -50,3 +52,171 @@ def to_none_massweight_coor(movement_vector, atoms, indices=None):
     m = atoms.get_masses()[indices]
 
     return np.repeat(m**(-0.5), 3)*movement_vector
+
+
+def get_displaced_positions(positions, indices, shifts):
+    """Positions of all atoms for a batch of displacements of some of
+    the atoms.
+
+    Args:
+        positions (numpy array): positions of all atoms (n_atoms x 3)
+        indices (list): The atoms that are displaced
+        shifts (numpy array): The shift of the atoms for each point,
+            (n_points x len(indices) x 3) or broadcastable to it, e.g.
+            (n_points x 1 x 3) to move the atoms together.
+
+    Returns:
+        Numpy array (n_points x n_atoms x 3)
+    """
+    shifts = np.asarray(shifts, dtype=float)
+    batch = np.repeat(np.asarray(positions, dtype=float)[None],
+                      len(shifts), axis=0)
+    batch[:, indices] += shifts
+    return batch
+
+
+def relax_along_axis(atoms, indices, axis, hessian, fmax=0.05,
+                     maxstep=0.2, max_iterations=100):
+    """Relax the atoms with the given indices, each only moving along
+    the axis. This is a quasi Newton minimization in the subspace of the
+    constraint, with one coordinate per atom, so it needs no line search
+    and usually converges in a few force calls when the hessian is
+    seeded from e.g. the Vibrations object.
+
+    Args:
+        atoms (ase object): ase atoms object with a calculator
+        indices (list): The atoms that are relaxed
+        axis (list): The direction the atoms can move in
+        hessian (numpy array): Initial curvature (n_indices x n_indices)
+            along the axis in eV/Angstrom**2. Directions with a too small
+            or negative curvature are given 70 eV/Angstrom**2 as the
+            BFGS of ase.
+        fmax (optional[float]): Convergence criterion of the forces
+            along the axis in eV/Angstrom
+        maxstep (optional[float]): Largest step of an atom in Angstrom
+        max_iterations (optional[int]): Maximum number of steps
+
+    Returns:
+        hessian (numpy array): The updated curvature, to seed the next
+            relaxation
+        iterations (int): Number of steps taken
+        force_calls (int): Number of force calculations
+    """
+    axis = np.asarray(axis, dtype=float) / np.linalg.norm(axis)
+
+    omega2, V = np.linalg.eigh(hessian)
+    omega2[omega2 < 1.] = 70.
+    hessian = np.dot(V * omega2, V.T)
+
+    def get_gradient():
+        return -np.dot(atoms.get_forces()[indices], axis)
+
+    gradient = get_gradient()
+    force_calls = 1
+    iterations = 0
+
+    while (np.max(np.abs(gradient)) > fmax and
+           iterations < max_iterations):
+        step = -np.linalg.solve(hessian, gradient)
+        if np.max(np.abs(step)) > maxstep:
+            step *= maxstep / np.max(np.abs(step))
+
+        positions = atoms.get_positions()
+        positions[indices] += step[:, None] * axis[None, :]
+        atoms.set_positions(positions)
+
+        new_gradient = get_gradient()
+        force_calls += 1
+        iterations += 1
+
+        # BFGS update of the curvature when it stays positive
+        dgradient = new_gradient - gradient
+        if np.dot(dgradient, step) > 1e-10:
+            Hstep = np.dot(hessian, step)
+            hessian = (hessian
+                       + np.outer(dgradient, dgradient)
+                       / np.dot(dgradient, step)
+                       - np.outer(Hstep, Hstep) / np.dot(step, Hstep))
+
+        gradient = new_gradient
+
+    return hessian, iterations, force_calls
+
+
+# The keys of the mode object that define a mode, as opposed to the
+# sampled points and the results
+MODE_DEFINITION_KEYS = [
+    'type', 'indices', 'mode', 'mode_tangent', 'mode_tangent_2',
+    'base_pos', 'branch', 'rot_axis', 'symnumber', 'inertia',
+    'from_atom_to_atom', 'from_atom_to_atoms', 'mode_position_delta',
+    'transition_path_length', 'cell_vectors', 'mass', 'relax_axis']
+
+
+# The settings that change the energies of the sampled points. The
+# relaxation settings only matter for modes with a relax_axis.
+MODE_HASH_SETTINGS = ['calculator_label']
+RELAX_HASH_SETTINGS = ['fmax']
+
+
+def get_mode_hash(an_mode, atoms=None, settings=None):
+    """A hash of everything that defines the sampled points of a mode:
+    the definition of the mode, the reference geometry and the settings
+    the energies depend on. It is the same for modes defined in the same
+    way in different runs, whatever their order, and differs as soon as
+    a point of one mode is not valid for the other.
+
+    Args:
+        an_mode (dict): The mode object
+        atoms (optional[ase object]): The atoms at the reference
+            (groundstate) geometry
+        settings (optional[dict]): The settings of the analysis
+
+    Returns:
+        Hexadecimal hash (str)
+    """
+    items = [(key, an_mode.get(key)) for key in MODE_DEFINITION_KEYS]
+
+    if atoms is not None:
+        items.append(('reference', get_system_fingerprint(atoms)))
+
+    if settings is not None:
+        keys = list(MODE_HASH_SETTINGS)
+        if an_mode.get('relax_axis') is not None:
+            keys += RELAX_HASH_SETTINGS
+        items += [(key, settings.get(key)) for key in keys]
+
+    return hash_values(items)
+
+
+def get_system_fingerprint(atoms):
+    """A hash of the atomic numbers, positions, cell and periodic
+    boundary conditions of the atoms, with the positions rounded to
+    1e-3 Angstrom.
+
+    Args:
+        atoms (ase object): ase atoms object
+
+    Returns:
+        Hexadecimal hash (str)
+    """
+    return hash_values([
+        ('numbers', atoms.get_atomic_numbers()),
+        ('positions', np.round(atoms.get_positions(), 3)),
+        ('cell', np.array(atoms.get_cell())),
+        ('pbc', atoms.get_pbc())])
+
+
+def hash_values(items):
+    """A sha1 hash of (name, value) pairs. Numbers are rounded to six
+    decimals so the hash does not depend on the last digits."""
+    h = hashlib.sha1()
+    for name, value in items:
+        h.update(name.encode())
+        if value is None or isinstance(value, str):
+            h.update(repr(value).encode())
+        else:
+            # + 0. turns -0. into 0.
+            h.update(np.ascontiguousarray(
+                np.round(np.asarray(value, dtype=float), 6) + 0.).tobytes())
+            h.update(repr(np.shape(value)).encode())
+    return h.hexdigest()
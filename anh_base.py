@@ -1,14 +1,22 @@
 import abc
 import os
-import pickle
+import time
 import warnings
 import numpy as np
 
 import ase.units as units
-from ase.parallel import paropen
 from ase.io.trajectory import Trajectory
 
-from energy_spectrum_solver import energy_spectrum
+from energy_spectrum_solver import (
+    energy_spectrum, energy_spectra, thermal_density)
+from fit_gp import GPFit
+from fit_delta import DeltaFit
+from an_journal import (ModeJournal, get_index_filename, read_backup_index,
+                        add_to_backup_index)
+from an_database import ResultsDatabase, DatabaseJournal
+from an_trajectory import CalculationTrajectory
+from an_samples import SampleStore
+from an_utils import get_mode_hash, get_system_fingerprint
 
 
 class BaseAnalysis(object):
@@ -17,6 +25,9 @@ class BaseAnalysis(object):
     """
     __metaclass__ = abc.ABCMeta
 
+    # Number of coordinates of a displacement
+    sample_ndim = 1
+
     def initialize(self):
         """Initialize the analysis module."""
 
@@ -26,77 +37,1096 @@ class BaseAnalysis(object):
         # Define groundstate_positions -- free as already calculated
         self.groundstate_positions = self.atoms.get_positions()
 
-        # Making trajectory file for the mode:
-        if isinstance(self.an_filename, str):
-            filename = self.an_filename+".traj"
-            if os.path.exists(filename) and os.path.getsize(filename):
-                mode = 'a'
-            else:
-                mode = 'w'
-            self.traj = Trajectory(filename, mode, self.atoms)
+        # Buffered trajectory of the calculations of the mode
+        policy = self.get_trajectory_policy()
+        if isinstance(self.an_filename, str) and policy != 'off':
+            self.traj = CalculationTrajectory(
+                self.get_trajectory_filename(), self.atoms, policy=policy)
         else:
             self.traj = None
 
         self.E_max_kT = 5
 
+    def get_trajectory_policy(self):
+        """What is written to the trajectory, settings['trajectory']:
+            'full': (default) the positions, energies and forces of the
+                calculations
+            'energies': the positions and energies
+            'off': no trajectory, the default if the calculations are
+                stored in settings['database']
+        """
+        if self.settings.get('database'):
+            return self.settings.get('trajectory', 'off')
+        return self.settings.get('trajectory', 'full')
+
+    def get_trajectory_filename(self):
+        """The trajectory of the calculations, settings['trajectory_file']
+        if given, which AnharmonicModes shares between the modes of a
+        run, otherwise an_filename+'.traj'.
+
+        The file is appended to without locking, so runs at the same time
+        in one directory must each set their own trajectory_file (or
+        pre_names of AnharmonicModes)."""
+        return self.settings.get(
+            'trajectory_file', str(self.an_filename) + '.traj')
+
     def run(self):
         """Function to run full analysis following specifications with
-        defined modes.
+        defined modes. The points asked for are calculated with the
+        calculator attached to the atoms.
 
         Returns:
             The mode object
         """
+        points = self.ask()
+        while len(points) > 0:
+            self.tell(*self.calculate_points(points))
+            points = self.ask()
+
+        return self.an_mode
+
+    def ask(self):
+        """Get the next displacements that should be calculated.
+
+        This together with tell() lets an external driver run the
+        sampling of the mode, e.g. to interleave the calculations of
+        many modes. For translations with a relax_axis the driver is
+        responsible for the constrained relaxation, and the positions
+        returned are the unrelaxed starting points.
+
+        Returns:
+            List of (displacement, positions) tuples. The list is empty
+                when the mode has converged.
+        """
+        if getattr(self, 'sampler', None) is None:
+            self.sampler = self.sampling_generator()
+
+        while True:
+            if len(self.get_pending_displacements()) == 0:
+                try:
+                    next(self.sampler)
+                except StopIteration:
+                    return []
+
+            # Points from an earlier run need no calculation
+            self.tell_imported()
+
+            pending = self.get_pending_displacements()
+            if len(pending) > 0:
+                return list(zip(pending, self.get_positions_batch(pending)))
+
+    def tell(self, energies, forces=None, positions=None, seconds=None):
+        """Give the results for the displacements from the last ask().
+
+        Args:
+            energies (list): potential energies of the displacements
+            forces (optional[list]): forces on all atoms (n_atoms x 3) for
+                each displacement.
+            positions (optional[list]): positions the energies were
+                calculated at, if different from the positions given by
+                ask(), e.g. after a relaxation.
+            seconds (optional[list]): wall time of each calculation,
+                used for the sampling budgets.
+        """
+        pending = self.get_pending_displacements()
+        assert len(energies) == len(pending)
+
+        if positions is None:
+            positions = self.get_positions_batch(pending)
+
+        for i, displacement in enumerate(pending):
+            self.record_calculation(
+                displacement,
+                energies[i],
+                None if forces is None else forces[i],
+                positions[i],
+                0. if seconds is None else seconds[i])
+
+    def sampling_generator(self):
+        """Generator running the full sampling of the mode. It stops
+        each time there are pending displacements to be calculated,
+        which are handed out by ask() and answered by tell().
+        """
         # Checks if there is a backup and loads it to self.an_mode if so
         self.restore_backup()
 
+        if self.is_finished():
+            return
+
+        # Do initial sampling points -- depends on type of mode
+        for _ in self.initial_sampling():
+            yield
+
+        self.reset_history()
+
+        # Keep iterating until the convergence critia is fulfilled
+        while not self.iterate():
+            for _ in self.sample_new_point():
+                yield
+
+        self.finish()
+
+    def is_finished(self):
+        """Check if the mode holds a result that is converged with the
+        current settings, from the stored convergence history. A result
+        stored without its history is taken as converged."""
         if not (self.an_mode.get('ZPE') and
                 self.an_mode.get('Z_mode') and
                 self.an_mode.get('energy_levels')):
+            return False
+
+        if 'ZPE_hist' not in self.an_mode:
+            return True
+
+        self.reset_history()
+        return self.is_converged()
+
+    def get_samples(self):
+        """The samples of the mode object in a an_samples.SampleStore,
+        which keeps the calculated points sorted by displacement.
+
+        The store is kept for this session and brought up to date with
+        the points appended to the lists of the mode object since the last
+        call. Lists that were replaced, e.g. by restore_backup, or that no
+        longer end with the last cached point give a new store. Points
+        changed in place before the last one are not noticed, so the lists
+        should only be appended to.
+
+        Returns:
+            SampleStore
+        """
+        displacements = self.an_mode.get('displacements', [])
+        energies = self.an_mode.get('displacement_energies', [])
+        forces = self.an_mode.get('displacement_forces', [])
+
+        samples = getattr(self, 'samples', None)
+        if (samples is None
+                or self.sample_lists[0] is not displacements
+                or self.sample_lists[1] is not energies
+                or samples.n_points > len(displacements)
+                or samples.n_energies > len(energies)
+                or (samples.n_points and not np.array_equal(
+                    samples.displacements[-1],
+                    displacements[samples.n_points - 1]))):
+            samples = SampleStore(self.sample_ndim)
+            self.samples = samples
+            self.sample_lists = (displacements, energies)
+
+        for displacement in displacements[samples.n_points:]:
+            samples.add_displacement(displacement)
+
+        # The projected forces are only used if known for every energy
+        has_forces = len(forces) == len(energies)
+        for i in range(samples.n_energies, len(energies)):
+            samples.add_energy(energies[i], forces[i] if has_forces else None)
+
+        return samples
+
+    def add_displacement(self, displacement):
+        """Add a displacement to be calculated to the mode object"""
+        self.an_mode.setdefault('displacements', []).append(displacement)
+
+    def get_pending_displacements(self):
+        """The displacements that have been chosen for sampling but
+        do not have an energy yet."""
+        return self.an_mode.get('displacements', [])[
+            len(self.an_mode.get('displacement_energies', [])):]
+
+    def calculate_points(self, points):
+        """Calculate the points from ask() with the calculator attached
+        to the atoms.
+
+        The points are calculated in nearest neighbour order and the atoms
+        are only moved back to the groundstate after the last point, so a
+        calculator reusing its previous wavefunction starts close by.
+
+        If a batch evaluator is available (see get_batch_evaluator) all
+        points are instead calculated in one call.
+
+        Args:
+            points (list): (displacement, positions) tuples from ask()
+
+        Returns:
+            energies, forces, positions and seconds to give to tell()
+        """
+        evaluator = self.get_batch_evaluator()
+        if evaluator is not None and self.can_calculate_batch():
+            return self.calculate_points_batch(points, evaluator)
+
+        results = [None] * len(points)
+
+        for i in self.get_evaluation_order(
+                [positions for _, positions in points]):
+            previous_positions = self.get_calculator_positions()
+
+            start_time = time.time()
+            e, f, p = self.calculate_displacement(points[i][0], reset=False)
+            results[i] = (e, f, p, time.time() - start_time)
+
+            self.register_evaluation(previous_positions, p)
+
+        self.atoms.set_positions(self.groundstate_positions)
+
+        energies, forces, positions, seconds = [
+            list(result) for result in zip(*results)]
+
+        return energies, forces, positions, seconds
+
+    def get_batch_evaluator(self):
+        """The function calculating a batch of geometries in one call, or
+        None if there is none. This is settings['batch_evaluator'] if
+        set, otherwise the calculator attached to the atoms if it has a
+        calculate_batch(images) method, as many machine learning
+        potentials are much faster on batches of structures.
+
+        A batch evaluator takes the positions of all atoms for every
+        point (number of points x number of atoms x 3), while
+        calculate_batch takes a list of atoms objects. Both return the
+        energies and the forces (number of points x number of atoms x 3)
+        of the points. The forces can be None.
+
+        Returns:
+            The batch evaluator (callable) or None
+        """
+        evaluator = self.settings.get('batch_evaluator')
+        if evaluator is not None:
+            return evaluator
+
+        calc = self.atoms.get_calculator()
+        if not hasattr(calc, 'calculate_batch'):
+            return None
+
+        def evaluator(positions):
+            images = []
+            for p in positions:
+                atoms = self.atoms.copy()
+                atoms.set_positions(p)
+                images.append(atoms)
+            return calc.calculate_batch(images)
+
+        return evaluator
+
+    def can_calculate_batch(self):
+        """Check if the points of the mode can be calculated by a batch
+        evaluator, which is not the case if each point is relaxed"""
+        return True
+
+    def calculate_points_batch(self, points, evaluator):
+        """Calculate the points from ask() in one call of a batch
+        evaluator. The wall time of the call is shared evenly between
+        the points.
+
+        Args:
+            points (list): (displacement, positions) tuples from ask()
+            evaluator (callable): see get_batch_evaluator
+
+        Returns:
+            energies, forces, positions and seconds to give to tell()
+        """
+        positions = [np.array(p) for _, p in points]
+
+        start_time = time.time()
+        energies, forces = evaluator(np.array(positions))
+        seconds = (time.time() - start_time) / max(len(points), 1)
+
+        if forces is None or not self.fit_forces:
+            forces = [None] * len(points)
+
+        return ([float(e) for e in energies], list(forces), positions,
+                [seconds] * len(points))
+
+    def get_evaluation_order(self, positions_list):
+        """Order geometries as a nearest neighbour path starting at the
+        last geometry calculated by the calculator.
+
+        Args:
+            positions_list (list): positions of all atoms for each point
+
+        Returns:
+            List with the indices of the points in the order to calculate
+        """
+        current = self.get_calculator_positions()
+
+        remaining = list(range(len(positions_list)))
+        order = []
+        while len(remaining) > 0:
+            distances = [np.linalg.norm(positions_list[i] - current)
+                         for i in remaining]
+            i = remaining.pop(int(np.argmin(distances)))
+            order.append(i)
+            current = positions_list[i]
+
+        return order
+
+    def get_calculator_positions(self):
+        """The positions of the last calculation done by the calculator
+        attached to the atoms, or the groundstate positions if unknown."""
+        calc = self.atoms.get_calculator()
+        if getattr(calc, 'atoms', None) is not None:
+            if len(calc.atoms) == len(self.atoms):
+                return calc.atoms.get_positions()
+        return self.groundstate_positions
+
+    def register_evaluation(self, previous_positions, positions):
+        """Count the geometric jump from the previous calculation and the
+        SCF iterations of the calculator, if it reports them with
+        get_number_of_iterations(), in an_mode['geometry_jump'] (Angstrom)
+        and an_mode['scf_iterations'].
+
+        Args:
+            previous_positions (numpy array): positions of the calculation
+                before
+            positions (numpy array): positions of the calculation
+        """
+        self.an_mode['geometry_jump'] = (
+            self.an_mode.get('geometry_jump', 0.) +
+            float(np.linalg.norm(positions - previous_positions)))
+
+        get_iterations = getattr(
+            self.atoms.get_calculator(), 'get_number_of_iterations', None)
+        if get_iterations is not None:
+            n_iterations = get_iterations()
+            if n_iterations is not None:
+                self.an_mode['scf_iterations'] = (
+                    self.an_mode.get('scf_iterations', 0) + n_iterations)
+
+    def evaluate_pending(self, sampling):
+        """Run a sampling generator and calculate the displacements it
+        asks for with the calculator attached to the atoms.
+
+        Args:
+            sampling (generator): initial_sampling or sample_new_point
+        """
+        for _ in sampling:
+            self.tell_imported()
+
+            pending = self.get_pending_displacements()
+            if len(pending) == 0:
+                continue
+
+            points = list(zip(pending, self.get_positions_batch(pending)))
+            self.tell(*self.calculate_points(points))
+
+    def record_calculation(self, displacement, energy, forces, positions,
+                           seconds):
+        """Add the result of a calculation to the mode object, write it
+        to the trajectory and save the backup.
+
+        Args:
+            displacement (float): The displacement along the mode
+            energy (float): The potential energy
+            forces (numpy array or None): The forces on all atoms
+            positions (numpy array): The positions of the atoms
+            seconds (float): Wall time of the calculation
+        """
+        self.add_point(displacement, energy, forces)
+
+        # adding to trajectory, written at the next iteration:
+        if self.traj is not None:
+            self.traj.add(positions, energy, forces, info={
+                'mode': self.an_filename,
+                'mode_type': self.an_mode['type'],
+                'mode_hash': self.an_mode.get('mode_hash'),
+                'displacement': np.array(displacement, dtype=float).tolist()})
+
+        self.register_calculation(seconds)
+
+        self.backup_point(positions)
+
+    def add_point(self, displacement, energy, forces):
+        """Add the energy and the projected forces of the next pending
+        displacement to the mode object.
+
+        Args:
+            displacement (float): The displacement along the mode
+            energy (float): The potential energy
+            forces (numpy array or None): The forces on all atoms
+        """
+        if not self.an_mode.get('displacement_energies'):
+            self.an_mode['displacement_energies'] = list()
+        energies = self.an_mode['displacement_energies']
+
+        if forces is not None or self.an_mode.get('displacement_forces'):
+            if not self.an_mode.get('displacement_forces'):
+                self.an_mode['displacement_forces'] = list()
+            displacement_forces = self.an_mode['displacement_forces']
+
+            # The points without forces have None, so the forces stay
+            # aligned with the energies
+            displacement_forces.extend(
+                [None] * (len(energies) - len(displacement_forces)))
+            if forces is None:
+                displacement_forces.append(None)
+            else:
+                displacement_forces.append(
+                    self.project_forces(forces, displacement))
+
+        energies.append(energy)
+
+    def backup_point(self, positions):
+        """Save the backup after a point was added to the mode object.
+
+        Args:
+            positions (numpy array): The positions of the point
+        """
+        if self.has_backup():
+            if self.settings.get('database'):
+                self.get_journal().add_positions(
+                    len(self.an_mode['displacement_energies']) - 1,
+                    positions)
+            self.save_to_backup()
+
+    def import_trajectory(self, filename=None, tol=None):
+        """Read the calculations of an earlier run of the mode from a
+        trajectory, e.g. when its backup is lost.
+
+        The geometry of every image with an energy is projected on the
+        mode (see project_positions), and images that are not on the mode
+        within tol are left out, as are images of another mode_hash. The
+        imported points answer the displacements the sampling asks for
+        at the same geometry (see tell_imported), so repeating the
+        sampling of the earlier run needs no calculations.
+
+        Args:
+            filename (optional[str]): The trajectory, by default the
+                trajectory of the mode (see get_trajectory_filename) and
+                an_filename+'.traj'
+            tol (optional[float]): Largest distance in Angstrom of an atom
+                from the mode, settings['import_tol'] or 1e-3 by default
+
+        Returns:
+            The number of imported points (int)
+        """
+        if filename is None:
+            filenames = [self.get_trajectory_filename()]
+            if self.an_filename + '.traj' not in filenames:
+                filenames.append(self.an_filename + '.traj')
+        else:
+            filenames = [filename]
+        if tol is None:
+            tol = self.settings.get('import_tol', 1e-3)
+
+        mode_hash = self.an_mode.get('mode_hash')
+
+        self.imported = []
+        for filename in filenames:
+            if not (os.path.exists(filename) and os.path.getsize(filename)):
+                continue
+
+            traj = Trajectory(filename)
+            for atoms in traj:
+                if atoms.calc is None or 'energy' not in atoms.calc.results:
+                    continue
+
+                if atoms.info.get('mode_hash', mode_hash) != mode_hash:
+                    continue
+
+                positions = atoms.get_positions()
+                if positions.shape != self.groundstate_positions.shape:
+                    continue
+
+                displacement = self.project_positions(positions)
+                if self.get_projection_residual(
+                        positions, displacement) > tol:
+                    continue
+
+                self.imported.append((
+                    displacement, atoms.calc.results['energy'],
+                    atoms.calc.results.get('forces'), positions))
+            traj.close()
+
+        return len(self.imported)
+
+    def tell_imported(self):
+        """Give the pending displacements, in order, the results of the
+        imported points (see import_trajectory) at the same geometry.
+        The imported points are counted in an_mode['n_imported'] and not
+        as calculator calls. Points without forces are not used if the
+        forces are fitted."""
+        tol = self.settings.get('import_tol', 1e-3)
+
+        for displacement in self.get_pending_displacements():
+            match = None
+            for i, point in enumerate(getattr(self, 'imported', [])):
+                if point[2] is None and self.fit_forces:
+                    continue
+                if self.get_projection_residual(
+                        point[3], displacement) <= tol:
+                    match = i
+                    break
+
+            if match is None:
+                return
+
+            _, energy, forces, positions = self.imported.pop(match)
+
+            self.add_point(displacement, energy, forces)
+            self.an_mode['n_imported'] = (
+                self.an_mode.get('n_imported', 0) + 1)
+            self.backup_point(positions)
+
+    def get_projection_residual(self, positions, displacement):
+        """The largest distance in Angstrom of an atom from its position
+        on the mode at the displacement. The relaxation along the
+        relax_axis of a translation is not counted.
+
+        Args:
+            positions (numpy array): The positions of all atoms
+            displacement (float): The displacement along the mode
+        """
+        difference = (np.asarray(positions) -
+                      self.get_mode_positions(displacement))
+
+        axis = self.an_mode.get('relax_axis')
+        if axis is not None:
+            axis = np.asarray(axis, dtype=float) / np.linalg.norm(axis)
+            indices = self.an_mode['indices']
+            difference[indices] -= np.outer(
+                np.dot(difference[indices], axis), axis)
+
+        return np.max(np.linalg.norm(difference, axis=1))
+
+    @abc.abstractmethod
+    def project_positions(self, positions):
+        """The displacement along the mode closest to the positions.
+
+        Args:
+            positions (numpy array): The positions of all atoms
+
+        Returns:
+            The displacement
+        """
+        pass
+
+    @abc.abstractmethod
+    def get_positions_batch(self, displacements):
+        """The positions of all atoms at many displacements along the
+        mode in one vectorized call.
+
+        Args:
+            displacements (list): The displacements along the mode
+
+        Returns:
+            Numpy array (number of displacements x number of atoms x 3)
+        """
+        pass
+
+    def get_mode_positions(self, displacement):
+        """The positions of all atoms at a displacement along the mode,
+        see get_positions_batch"""
+        return self.get_positions_batch([displacement])[0]
+
+    def project_forces(self, forces, displacement):
+        """The force along the mode, -dE/d(displacement), from the forces
+        on all atoms. This is the projection of the forces on the change
+        of the positions with the displacement.
+
+        Args:
+            forces (numpy array): forces on all atoms
+            displacement (float): The displacement along the mode
+
+        Returns:
+            The projected force (float)
+        """
+        return float(np.sum(
+            np.asarray(forces) * self.get_mode_derivative(displacement)))
+
+    def get_mode_derivative(self, displacement, delta=1e-4):
+        """Derivative of the positions of all atoms with respect to the
+        displacement along the mode, by central differences of
+        get_mode_positions.
+
+        Args:
+            displacement (float): The displacement along the mode
+            delta (optional[float]): Step of the central differences
+
+        Returns:
+            Numpy array with the shape of the positions
+        """
+        if displacement is None:  # the groundstate
+            displacement = 0.
+
+        return (self.get_mode_positions(displacement + delta) -
+                self.get_mode_positions(displacement - delta)) / (2*delta)
+
+    def get_fit_object(self, fit_settings, fitclass, kernel, period=None):
+        """The fitting object for the potential of the mode.
+
+        With settings['fit_method'] = 'gaussian_process' a GPFit with the
+        given kernel is used, otherwise fitclass. The options gp_noise,
+        gp_force_noise and gp_nbasis of the settings are passed on to
+        the GPFit.
+
+        Args:
+            fit_settings (dict): The settings of the fit
+            fitclass (class): The regularized fit of the mode type
+            kernel (str): Kernel of the Gaussian process
+            period (optional[float]): Period of the periodic kernel
+
+        Returns:
+            The fitting object without data
+        """
+        if (self.settings.get('fit_method', 'regularization')
+                != 'gaussian_process'):
+            return fitclass(fit_settings)
+
+        # A copy, so the options of the mode are not passed on to the
+        # fits of other modes
+        fit_settings = dict(fit_settings, kernel=kernel, period=period)
+        for key in ['gp_noise', 'gp_force_noise', 'gp_nbasis']:
+            if key in self.settings:
+                fit_settings[key] = self.settings[key]
+
+        return GPFit(fit_settings)
+
+    def get_fit(self):
+        """Fit the sampled potential energies of the mode.
+
+        If the mode has a baseline potential mapped by a cheap calculator
+        (see map_potential) only the difference to the baseline is
+        fitted, and the fit is the baseline plus the fitted difference.
+
+        Returns:
+            The fitting object
+        """
+        samples = self.get_samples()
+        x = samples.sampled_displacements
+        y = samples.energies
+        yders = self.get_fit_derivatives()
+
+        baseline = self.get_baseline_fit()
+        if baseline is not None:
+            y = y - baseline.fval(x)
+            if len(yders) > 0:
+                delta = 1e-5
+                yders = yders - (
+                    baseline.fval(x + delta) - baseline.fval(x - delta)) / (
+                        2*delta)
+
+        fitobj = self.make_fit_object()
+        fitobj.set_data(x, y, yders)
+        fitobj.run()
+
+        if baseline is not None:
+            return DeltaFit(baseline, fitobj)
+
+        return fitobj
+
+    def has_baseline(self):
+        """Check if the mode has a baseline potential from a cheap
+        calculator"""
+        return len(self.an_mode.get('baseline_energies', [])) > 0
+
+    def get_baseline_fit(self):
+        """The fit of the baseline potential in
+        an_mode['baseline_displacements'] and an_mode['baseline_energies'],
+        or None if the mode has no baseline. The fit is only done once.
+        """
+        if not self.has_baseline():
+            return None
+
+        if getattr(self, 'baseline_fit', None) is None:
+            self.baseline_fit = self.make_fit_object()
+            self.baseline_fit.set_data(
+                np.array(self.an_mode['baseline_displacements']),
+                np.array(self.an_mode['baseline_energies']))
+            self.baseline_fit.run()
+
+        return self.baseline_fit
+
+    def map_potential(self, npoints):
+        """Calculate the energies on an even grid over the domain of the
+        sampled mode with the calculator attached to the atoms, e.g. to
+        use a cheap calculator as a baseline for an expensive one.
+
+        Args:
+            npoints (int): Number of points in the grid
+
+        Returns:
+            displacements (numpy array): The grid
+            energies (list): The potential energies at the grid
+        """
+        xmin, xmax, _ = self.get_hamiltonian_domain()
+        displacements = np.linspace(xmin, xmax, npoints)
+
+        energies = self.calculate_points(list(zip(
+            displacements, self.get_positions_batch(displacements))))[0]
+
+        return displacements, energies
+
+    def use_variance_acquisition(self):
+        """Check if the new points should be chosen by the variance
+        reduction of Z_mode. This is done for a mode with a baseline, so
+        the expensive calculations are placed where the difference to the
+        baseline is uncertain. Without a baseline the spacing rule of the
+        mode is used, as the variance reduction did not need fewer
+        calculations in tests/benchmark_acquisition.py."""
+        return self.has_baseline()
+
+    def get_fit_derivatives(self):
+        """The energy derivatives along the mode, which are fitted
+        together with the energies when settings['fit_forces'] is set.
+        This does not reduce the number of calculations needed for
+        convergence, so it is off by default.
+
+        Returns:
+            dE/d(displacement) for every sampled point (numpy array), or
+                an empty list if the forces are not fitted or not known
+                for all points.
+        """
+        samples = self.get_samples()
+
+        if not self.fit_forces or not samples.has_forces():
+            return []
+
+        return -samples.forces
+
+    def start(self):
+        """Restore the backup and do the initial sampling of the mode.
+
+        Returns:
+            True if the mode still needs to be iterated, False if the
+                backup already holds the converged mode.
+        """
+        # Checks if there is a backup and loads it to self.an_mode if so
+        self.restore_backup()
 
-            # Do initial sampling points -- depends on type of mode
-            self.initial_sampling()
+        if self.is_finished():
+            return False
 
-            # Keep iterating until the convergence critia is fulfilled
-            ZPE, Z_mode, energies = self.sample_until_convergence()
+        # Do initial sampling points -- depends on type of mode
+        self.evaluate_pending(self.initial_sampling())
 
-            # Update the mode definition with the calculated information
-            self.an_mode.update({
-                'ZPE': ZPE,
-                'Z_mode': Z_mode,
-                'energy_levels': energies})
+        self.reset_history()
 
-            if self.an_filename:
-                self.save_to_backup()
+        return True
+
+    def reset_history(self):
+        """Initialize the history to check convergence on from the
+        history stored in the mode object, so a restarted mode continues
+        where it stopped. an_mode['hist_n_points'] holds the number of
+        samples of each iteration."""
+        self.ZPE = []
+        self.entropy_E = []
+
+        self.ZPE_hist = self.an_mode.setdefault('ZPE_hist', [])
+        self.Z_mode_hist = self.an_mode.setdefault('Z_mode_hist', [])
+        self.hist_n_points = self.an_mode.setdefault('hist_n_points', [])
+
+        # The error bars of the last iteration
+        if 'fit_dof' in self.an_mode:
+            self.thermo_err = dict(
+                (key, self.an_mode[key]) for key in
+                ['ZPE_err', 'Z_mode_err', 'entropic_energy_err'])
+            self.fit_dof = self.an_mode['fit_dof']
+
+    def step(self):
+        """Do one iteration: sample a new point (except for the first
+        iteration of the session), fit the potential and calculate the
+        thermodynamics.
+
+        Returns:
+            converged (Bool): If the mode has been converged or not
+        """
+        if getattr(self, 'fitobj', None) is not None:
+            self.evaluate_pending(self.sample_new_point())
+
+        return self.iterate()
+
+    def iterate(self):
+        """Fit the potential with the current samples and calculate the
+        thermodynamics.
+
+        Returns:
+            converged (Bool): If the mode has been converged or not
+        """
+        if self.verbosity > 1:
+            self.log.write('Step %i \n' % len(self.ZPE_hist))
+
+        self.flush_trajectory()
+
+        fitobj = self.get_fit()
+
+        ZPE, Z_mode, energies = self.get_thermo(fitobj)
+
+        n_points = len(self.get_samples())
+        if self.hist_n_points[-1:] == [n_points]:
+            # The samples of the last iteration before a restart
+            del self.ZPE_hist[-1], self.Z_mode_hist[-1]
+            del self.hist_n_points[-1]
+
+        self.ZPE_hist.append(ZPE)
+        self.Z_mode_hist.append(Z_mode)
+        self.hist_n_points.append(n_points)
+        self.update_thermo_uncertainty(fitobj)
+        self.energies = energies
+        self.fitobj = fitobj
+
+        return self.is_converged()
+
+    def flush_trajectory(self):
+        """Write the buffered calculations to the trajectory"""
+        if self.traj is not None:
+            self.traj.flush()
+
+    def finish(self):
+        """Update the mode definition with the calculated information
+        from the last iteration.
+
+        Returns:
+            The mode object
+        """
+        self.flush_trajectory()
+
+        if self.settings.get('plot_mode'):
+            self.plot_potential_energy(fitobj=self.fitobj)
+
+        self.an_mode.update({
+            'ZPE': self.ZPE_hist[-1],
+            'Z_mode': self.Z_mode_hist[-1],
+            'energy_levels': self.energies,
+            'energy_spectrum': list(self.spectrum),
+            'spectrum_window': self.get_spectrum_window(),
+            'fit': self.fitobj})
+
+        if self.has_backup():
+            self.save_to_backup(snapshot=True)
+
+        if self.settings.get('database'):
+            journal = self.get_journal()
+            journal.database.write_results(
+                journal.mode_id, self.temperature, self.ZPE_hist[-1],
+                self.Z_mode_hist[-1], self.get_entropic_energy(self.energies),
+                self.energies, fitobj=self.fitobj,
+                n_calls=self.an_mode.get('n_calls'))
 
         return self.an_mode
 
+    def sample_until_convergence(self):
+        """ Function will choose new points along the mode
+        to calculate groundstate of and terminates if the thermodynamical
+        properties have converged for the mode.
+
+        Returns:
+            ZPE (float): The zero point energy for the mode.
+            Z_mode (float): The partition function for mode.
+            energies (list): Energy levels of the mode.
+        """
+        self.reset_history()
+
+        while not self.step():
+            pass
+
+        return self.ZPE_hist[-1], self.Z_mode_hist[-1], self.energies
+
+    def register_calculation(self, seconds):
+        """Count a calculation of the mode and the time it took,
+        including any relaxation. Used for the sampling budgets.
+
+        Args:
+            seconds (float): Wall time of the calculation
+        """
+        self.an_mode['n_calls'] = self.an_mode.get('n_calls', 0) + 1
+        self.an_mode['calc_time'] = (
+            self.an_mode.get('calc_time', 0.) + seconds)
+        self.n_calls_session = getattr(self, 'n_calls_session', 0) + 1
+
+    def is_budget_exhausted(self):
+        """Check the sampling budget of the mode:
+        settings['max_calls'] calculator calls and settings['max_seconds']
+        seconds spent in calculations.
+
+        Returns:
+            True if the budget is used
+        """
+        max_calls = self.settings.get('max_calls')
+        max_seconds = self.settings.get('max_seconds')
+
+        if max_calls is not None and (
+                self.an_mode.get('n_calls', 0) >= max_calls):
+            print('Exiting after %i calls: Budget of calls used'
+                  % self.an_mode['n_calls'])
+            return True
+
+        if max_seconds is not None and (
+                self.an_mode.get('calc_time', 0.) >= max_seconds):
+            print('Exiting after %.1f s: Budget of time used'
+                  % self.an_mode['calc_time'])
+            return True
+
+        return False
+
+    def get_free_energy_error(self):
+        """Estimate how unconverged the thermodynamic contribution of
+        the mode is, as an energy in eV. Uses the error bars of the
+        uncertainty convergence if present, otherwise the change of ZPE
+        and kT*ln(Z_mode) in the last iteration.
+
+        Returns:
+            error (float): infinite if it cannot be estimated yet
+        """
+        if self.settings.get('convergence', 'relative') == 'uncertainty':
+            if len(self.ZPE_hist) == 0:
+                return np.inf
+            return (self.thermo_err['ZPE_err']
+                    + self.thermo_err['entropic_energy_err'])
+
+        if len(self.ZPE_hist) < 2:
+            return np.inf
+
+        return (
+            np.abs(self.ZPE_hist[-1] - self.ZPE_hist[-2])
+            + self.kT * np.abs(
+                np.log(self.Z_mode_hist[-1] / self.Z_mode_hist[-2])))
+
+    def get_cost_per_call(self):
+        """Average wall time per calculation for the mode in seconds"""
+        n_calls = self.an_mode.get('n_calls', 0)
+        if n_calls == 0:
+            return 1.
+        return max(self.an_mode['calc_time'] / n_calls, 1e-6)
+
     def restore_backup(self):
         """Restore the mode object from a backup. If there is a backup
-        file then it will load this into the mode object.
+        (see an_journal.ModeJournal) with the hash of the mode (see
+        get_mode_hash) then it will load this into the mode object.
         """
         backup_loaded = 0
+        mode_hash = self.get_mode_hash()
+
         # Check if the filename is there
-        if self.an_filename and os.path.exists(self.an_filename+'.pckl'):
-            # Open backup file
-            backup = pickle.load(paropen(self.an_filename+'.pckl', 'rb'))
+        if self.has_backup():
+            backup = self.get_journal().load()
+
+            if backup is not None:
+                # check if the backup correspond to the defined mode
+                assert self.get_backup_hash(backup) == mode_hash
 
-            # check if the backup correspond to the defined mode
-            for test_key in ['type']:
-                assert backup[test_key] == self.an_mode[test_key]
+                self.an_mode = backup
 
-            if backup['type'] == 'rotation':
-                assert abs(backup['inertia'] - self.an_mode['inertia']) < 1e-6
+                backup_loaded = 1
 
-            self.an_mode = backup
+        self.an_mode['mode_hash'] = mode_hash
 
-            backup_loaded = 1
+        # Without a backup the calculations of an earlier run can still
+        # be in the trajectory
+        if (not backup_loaded and self.an_filename and
+                not self.an_mode.get('displacements') and
+                self.settings.get('import_trajectory', True)):
+            self.import_trajectory()
 
         return backup_loaded
 
-    def save_to_backup(self):
-        """Save current mode object to a pickle file. """
-        pickle.dump(self.an_mode,
-                    paropen(self.an_filename+'.pckl', 'wb'))
+    def has_backup(self):
+        """Check if the mode object is backed up, in the files starting
+        with an_filename or in settings['database']"""
+        return bool(self.an_filename or self.settings.get('database'))
+
+    def get_reference_atoms(self):
+        """A copy of the atoms at the groundstate positions"""
+        groundstate = self.atoms.copy()
+        groundstate.set_positions(self.groundstate_positions)
+        return groundstate
+
+    def get_mode_hash(self):
+        """The hash identifying the sampled points of the mode, from its
+        definition, the reference geometry and settings['calculator_label']
+        (see an_utils.get_mode_hash). The backup of a mode is looked up
+        by this hash, so the backup is found whatever the order the modes
+        are defined in, and a backup of a mode defined in another way is
+        never used. A cheap calculator should have another label than the
+        calculator of the atoms."""
+        return get_mode_hash(
+            self.an_mode, self.get_reference_atoms(), self.settings)
+
+    def get_backup_hash(self, backup):
+        """The hash of a backed up mode object. Backups from before the
+        hashes were stored are hashed with the current reference geometry
+        and settings, which only compares the definition of the mode."""
+        if 'mode_hash' in backup:
+            return backup['mode_hash']
+        return get_mode_hash(
+            backup, self.get_reference_atoms(), self.settings)
+
+    def get_journal(self):
+        """The journal backing up the mode object. This is a
+        an_database.DatabaseJournal of the mode in the SQLite database
+        settings['database'] if given, and otherwise a
+        an_journal.ModeJournal found by find_journal. A snapshot of the
+        whole mode object is written every
+        settings['journal_snapshot_every'] points."""
+        if getattr(self, 'journal', None) is not None:
+            return self.journal
+
+        snapshot_every = self.settings.get('journal_snapshot_every', 50)
+
+        if self.settings.get('database'):
+            self.journal = DatabaseJournal(
+                ResultsDatabase(self.settings['database']),
+                get_system_fingerprint(self.get_reference_atoms()),
+                self.get_mode_hash(),
+                mode_type=self.an_mode['type'],
+                snapshot_every=snapshot_every)
+        else:
+            self.journal = self.find_journal(snapshot_every)
+
+        return self.journal
+
+    def find_journal(self, snapshot_every=50):
+        """The journal of the backup files with the hash of the mode.
+
+        The backup is looked up by the hash in the index of the backups
+        next to an_filename (see an_journal.read_backup_index), and the
+        files an_filename and an_filename followed by the hash are tried
+        for backups missing from the index, so at most three backups are
+        read whatever the number of modes. Without a backup of the mode, a
+        new backup is started with an_filename, or with an_filename
+        followed by the hash if those files hold another mode, and added
+        to the index.
+
+        Returns:
+            an_journal.ModeJournal
+        """
+        mode_hash = self.get_mode_hash()
+        hash_filename = self.an_filename + '_' + mode_hash[:8]
+        new_filename = self.an_filename
+        index_filename = get_index_filename(self.an_filename)
+
+        filenames = [read_backup_index(index_filename).get(mode_hash),
+                     self.an_filename, hash_filename]
+        for i, filename in enumerate(filenames):
+            if filename is None or filename in filenames[:i]:
+                continue
+
+            # The files may be of another mode, so they are left as they
+            # are until the hash is checked
+            journal = ModeJournal(filename, snapshot_every=snapshot_every)
+            backup = journal.load(truncate=False)
+            if backup is None:
+                continue
+
+            if self.get_backup_hash(backup) == mode_hash:
+                add_to_backup_index(index_filename, mode_hash, filename)
+                return journal
+
+            if filename == self.an_filename:
+                # Keep the backup of the other mode
+                new_filename = hash_filename
+
+        add_to_backup_index(index_filename, mode_hash, new_filename)
+        return ModeJournal(new_filename, snapshot_every=snapshot_every)
+
+    def save_to_backup(self, snapshot=False):
+        """Save the changes of the mode object to the journal.
+
+        Args:
+            snapshot (optional[bool]): Write the whole mode object as a
+                compact snapshot instead
+        """
+        if snapshot:
+            self.get_journal().snapshot(self.an_mode)
+        else:
+            self.get_journal().record(self.an_mode)
 
     def get_thermo(self, fitobj):
         """Calculate thermodynamics of mode. Currently supporting
@@ -112,43 +1142,63 @@ class BaseAnalysis(object):
                 truncated to specific max energy.
         """
 
-        # Calculating the energy modes differently depending on the type
-        if self.an_mode['type'] == 'rotation':
-            Hcoeff = units._hbar**2/(units._amu * units._e
-                                     * self.an_mode['inertia']*1e-20)
-            xmin = 0.
-            xmax = xmin+2.*np.pi/self.an_mode['symnumber']
+        xmin, xmax, Hcoeff = self.get_hamiltonian_domain()
 
-            groundstate_energy = min(self.an_mode['displacement_energies'])
+        groundstate_energy = np.min(self.get_samples().energies)
 
-        elif self.an_mode['type'] == 'vibration':
-            Hcoeff = units._hbar**2 / (2.*units._amu * units._e * 1e-20)
+        # Calculating energy spectrum
+        energies = energy_spectrum(
+            xmin, xmax, fitobj.fval, Hcoeff,
+            mode=self.settings.get('energy_solver_mode', 'fast'))
 
-            xmin = np.min(self.an_mode['displacements'])
-            xmax = np.max(self.an_mode['displacements'])
+        # subtracting the groundstate energy
+        energies -= groundstate_energy
+        self.spectrum = energies
 
-            groundstate_energy = min(self.an_mode['displacement_energies'])
+        return self.get_spectrum_thermo(energies)
 
-        elif self.an_mode['type'] == 'translation':
+    def get_spectrum_window(self):
+        """The energy above the lowest level up to which the spectrum of
+        the last get_thermo holds all the levels."""
+        return self.spectrum[-1] - self.spectrum[0]
 
-            xmin = np.min(self.an_mode['displacements'])
-            xmax = np.max(self.an_mode['displacements'])
+    def get_stored_thermo(self):
+        """Calculate thermodynamics of the mode at self.temperature from
+        the spectrum and fit stored in the mode object by finish. The
+        calculator is never used: the stored spectrum is only solved
+        again from the stored fit if it does not reach E_max_kT*kT above
+        the lowest level.
 
-            Hcoeff = units._hbar**2/(2*units._amu * units._e * 1e-20)
+        Returns:
+            ZPE (float): The zero point energy for the mode.
+            Z_mode (float): The partition function for mode.
+            energies_truncated (list): Energy levels of modes
+                truncated to specific max energy.
+        """
+        if 'fit' not in self.an_mode:
+            raise ValueError(
+                'The mode has no stored fit, it has to be run first')
 
-            groundstate_energy = min(self.an_mode['displacement_energies'])
+        if self.an_mode['spectrum_window'] >= self.E_max_kT*self.kT:
+            return self.get_spectrum_thermo(
+                np.array(self.an_mode['energy_spectrum']))
 
-        else:
-            raise ValueError("No other types are currently supported")
+        return self.get_thermo(self.an_mode['fit'])
 
-        # Calculating energy spectrum
-        energies = energy_spectrum(
-            xmin, xmax, fitobj.fval, Hcoeff,
-            mode=self.settings.get('energy_solver_mode', 'fast'))
+    def get_spectrum_thermo(self, energies):
+        """Zero point energy and partition function from the energy
+        levels of the mode.
 
-        # subtracting the groundstate energy
-        energies -= groundstate_energy
+        Args:
+            energies (numpy array): Energy levels relative to the
+                groundstate energy.
 
+        Returns:
+            ZPE (float): The zero point energy for the mode.
+            Z_mode (float): The partition function for mode.
+            energies_truncated (list): Energy levels of modes
+                truncated to specific max energy.
+        """
         # The zero point energy is per definition the first accessible energy
         # level
         ZPE = energies[0]
@@ -166,6 +1216,224 @@ class BaseAnalysis(object):
 
         return ZPE, Z_mode, energies_truncated
 
+    def get_entropic_energy(self, energies):
+        """Entropic energy (T*S) of the mode from its energy levels, as
+        in AnharmonicModes.calculate_anharmonic_thermo.
+
+        Args:
+            energies (list): The truncated energy levels of the mode.
+
+        Returns:
+            The entropic energy (float)
+        """
+        excitations = np.array(energies) - energies[0]
+        boltzmann = np.exp(-excitations/self.kT)
+        Z_mode = np.sum(boltzmann)
+        return (self.kT * np.log(Z_mode)
+                + np.sum(boltzmann*excitations) / Z_mode)
+
+    def get_thermo_uncertainty(self, fitobj):
+        """Estimate the standard error of ZPE, Z_mode and the entropic
+        energy from a subset of the bootstrap ensemble of the fit.
+
+        The spectra of the ensemble members are solved in one batch,
+        see energy_spectrum_solver.energy_spectra. The number of members
+        is set by settings['n_bootstrap_thermo'].
+
+        Args:
+            fitobj (object): The fitting object with a bootstrap ensemble
+
+        Returns:
+            Dictionary with 'ZPE_err', 'Z_mode_err' and
+                'entropic_energy_err'
+        """
+        n_samples = len(fitobj.coeffs_samples)
+        members = np.linspace(
+            0, n_samples-1,
+            min(self.settings.get('n_bootstrap_thermo', 16),
+                n_samples)).astype(int)
+
+        spectra = self.get_ensemble_spectra(fitobj, members)
+
+        ZPEs = []
+        Z_modes = []
+        entropic_energies = []
+        for energies in spectra:
+            ZPE, Z_mode, energies_truncated = self.get_spectrum_thermo(
+                energies)
+            ZPEs.append(ZPE)
+            Z_modes.append(Z_mode)
+            entropic_energies.append(
+                self.get_entropic_energy(energies_truncated))
+
+        # Bootstrap fits that miss the samples defining part of the
+        # potential can be far off, so a robust estimate of the spread
+        # is used: 1.4826 * median absolute deviation.
+        def robust_std(values):
+            return 1.4826 * np.median(np.abs(values - np.median(values)))
+
+        return {
+            'ZPE_err': robust_std(ZPEs),
+            'Z_mode_err': robust_std(Z_modes),
+            'entropic_energy_err': robust_std(entropic_energies)}
+
+    def get_ensemble_spectra(self, fitobj, members):
+        """The energy spectra of members of the bootstrap ensemble of the
+        fit relative to the groundstate energy.
+
+        Args:
+            fitobj (object): The fitting object with a bootstrap ensemble
+            members (numpy array): Indices of the ensemble members
+
+        Returns:
+            Numpy array with a spectrum for each member
+        """
+        xmin, xmax, Hcoeff = self.get_hamiltonian_domain()
+
+        groundstate_energy = np.min(self.get_samples().energies)
+
+        def fval_samples(x):
+            return fitobj.fval_samples(x)[members]
+
+        spectra = energy_spectra(
+            xmin, xmax, fval_samples, Hcoeff,
+            mode=self.settings.get('energy_solver_mode', 'fast'))
+
+        return spectra - groundstate_energy
+
+    def update_thermo_uncertainty(self, fitobj):
+        """Store the error bars of the thermodynamics of the mode in
+        an_mode if the uncertainty based convergence is used."""
+        if self.settings.get('convergence', 'relative') != 'uncertainty':
+            return
+
+        self.thermo_err = self.get_thermo_uncertainty(fitobj)
+        self.an_mode.update(self.thermo_err)
+
+        # The ensemble can only be trusted if the fit is not a pure
+        # interpolation of the samples
+        self.fit_dof = fitobj.get_dof()
+        self.an_mode['fit_dof'] = self.fit_dof
+
+    def get_hamiltonian_domain(self):
+        """The domain and kinetic prefactor of the 1D schrodinger
+        equation for the mode.
+
+        Returns:
+            xmin (float): lower end of domain
+            xmax (float): upper end of domain
+            Hcoeff (float): coefficient to multiply the FD matrix with
+        """
+        # Calculating the energy modes differently depending on the type
+        if self.an_mode['type'] == 'rotation':
+            Hcoeff = units._hbar**2/(units._amu * units._e
+                                     * self.an_mode['inertia']*1e-20)
+            xmin = 0.
+            xmax = xmin+2.*np.pi/self.an_mode['symnumber']
+
+        elif self.an_mode['type'] == 'vibration':
+            Hcoeff = units._hbar**2 / (2.*units._amu * units._e * 1e-20)
+
+            xmin = np.min(self.get_domain_displacements())
+            xmax = np.max(self.get_domain_displacements())
+
+        elif self.an_mode['type'] == 'translation':
+
+            xmin = np.min(self.get_domain_displacements())
+            xmax = np.max(self.get_domain_displacements())
+
+            Hcoeff = units._hbar**2/(2*units._amu * units._e * 1e-20)
+
+        else:
+            raise ValueError("No other types are currently supported")
+
+        return xmin, xmax, Hcoeff
+
+    def get_fit_grid(self, npoints):
+        """The fit stored in the mode object by finish on an even grid
+        over the domain of the schrodinger equation.
+
+        Args:
+            npoints (int): Number of points of the grid
+
+        Returns:
+            displacements (numpy array), energies (numpy array)
+        """
+        xmin, xmax, _ = self.get_hamiltonian_domain()
+        displacements = np.linspace(xmin, xmax, npoints)
+        return displacements, np.asarray(
+            self.an_mode['fit'].fval(displacements))
+
+    def get_domain_displacements(self):
+        """The displacements spanning the domain of the mode, which are
+        the baseline grid for a mode with a baseline and otherwise the
+        sampled displacements."""
+        if self.has_baseline():
+            return self.an_mode['baseline_displacements']
+        return self.get_samples().displacements
+
+    def get_acquisition_candidates(self, n_between=3):
+        """Candidate displacements for the next sample. The candidates
+        are evenly spaced inside each interval between the sorted
+        sampled displacements.
+
+        Args:
+            n_between (int): Number of candidates in each interval
+
+        Returns:
+            candidates (numpy array): The candidate displacements
+        """
+        displacements = self.get_samples().get_sorted()[0]
+        fractions = np.arange(1, n_between+1) / (n_between+1.)
+
+        candidates = (
+            displacements[:-1, None]
+            + np.diff(displacements)[:, None] * fractions[None, :])
+
+        return candidates.ravel()
+
+    def get_variance_reduction_displacement(self, fitobj):
+        """Find the displacement that reduces the variance of the
+        partition function the most.
+
+        The bootstrap ensemble of the fit, or the posterior of a
+        Gaussian process fit, gives a set of plausible potentials. The
+        change in ln(Z_mode) of each ensemble member is estimated to
+        first order from the thermal density of the mean fit (see
+        energy_spectrum_solver.thermal_density), which also covers the
+        ZPE in the low temperature limit. Observing the
+        energy at a candidate displacement x reduces the variance of
+        ln(Z_mode) by
+            cov(ln(Z_mode), V(x))**2 / (var(V(x)) + noise**2)
+        and the candidate with the largest reduction is returned.
+
+        Args:
+            fitobj (object): The fitting object with a bootstrap ensemble
+
+        Returns:
+            The displacement to sample next (float)
+        """
+        xmin, xmax, Hcoeff = self.get_hamiltonian_domain()
+
+        x, rho = thermal_density(
+            xmin, xmax, fitobj.fval, Hcoeff, self.kT,
+            n=self.settings.get('acquisition_grid', 256))
+
+        # Covariance of ln(Z_mode) with the potential at the candidates
+        candidates = self.get_acquisition_candidates()
+        cov = -np.dot(rho, fitobj.fval_covariance(x, candidates)) / self.kT
+        var = np.diag(fitobj.fval_covariance(candidates, candidates))
+
+        noise = self.settings.get('acquisition_noise', 1e-3)  # eV
+        variance_reduction = cov**2 / (var + noise**2)
+
+        if self.verbosity > 1:
+            self.log.write(
+                'Max variance reduction of ln(Z_mode): %.3e \n'
+                % np.max(variance_reduction))
+
+        return candidates[np.argmax(variance_reduction)]
+
     def is_converged(self):
         """Check if the calculation has converged.
         Returns:
@@ -175,6 +1443,12 @@ class BaseAnalysis(object):
 
         iterations = len(self.ZPE_hist)
 
+        if iterations > 0 and self.is_budget_exhausted():
+            return True
+
+        if self.settings.get('convergence', 'relative') == 'uncertainty':
+            return self.is_converged_uncertainty()
+
         if iterations > 2:
             rel_Z_mode_change = np.abs(
                 (self.Z_mode_hist[-1]-self.Z_mode_hist[-2])
@@ -196,6 +1470,49 @@ class BaseAnalysis(object):
 
         return converged
 
+    def is_converged_uncertainty(self):
+        """Check if the standard errors of ZPE, Z_mode and the entropic
+        energy estimated from the fit ensemble are below the tolerances
+        settings['ZPE_tol'], settings['rel_Z_mode_tol'] and
+        settings['entropic_energy_tol']. This can stop after the
+        first iteration if the potential is already well determined.
+
+        Returns:
+            converged (Bool): If the mode has been converged or not
+        """
+        iterations = len(self.ZPE_hist)
+
+        # No error bars yet, e.g. for a history of the relative criterion
+        if iterations == 0 or getattr(self, 'thermo_err', None) is None:
+            return False
+
+        # Need more unique samples than fitting coefficients
+        if self.fit_dof < 1 and (
+                iterations <= self.settings.get('max_step_iterations', 15)):
+            return False
+
+        rel_Z_mode_err = self.thermo_err['Z_mode_err'] / self.Z_mode_hist[-1]
+
+        if self.verbosity > 1:
+            print('Iteration: ', iterations)
+            print('ZPE err', self.thermo_err['ZPE_err'])
+            print('rel Z_mode err', rel_Z_mode_err)
+            print('entropic energy err',
+                  self.thermo_err['entropic_energy_err'])
+
+        if iterations > self.settings.get('max_step_iterations', 15):
+            print(
+                'Exiting after %i iterations: Cannot converge properly'
+                % iterations)
+            print('rel_Z_mode_err', rel_Z_mode_err)
+            return True
+
+        return bool(
+            self.thermo_err['ZPE_err'] < self.settings.get('ZPE_tol', 1e-3)
+            and rel_Z_mode_err < self.rel_Z_mode_change_tol
+            and self.thermo_err['entropic_energy_err']
+            < self.settings.get('entropic_energy_tol', 1e-3))
+
     def plot_potential_energy(self, fitobj=None, filename=None):
         # Matplotlib is loaded selectively as it is requires
         # libraries that are often not installed on clusters
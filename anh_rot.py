@@ -1,11 +1,11 @@
-from copy import copy
 import sys
+import time
 
 import numpy as np
 
 from ase.io.trajectory import Trajectory
 
-from define_rot_mode import calculate_rot_mode, rotatepoints
+from define_rot_mode import rotatepoints
 from anh_base import BaseAnalysis
 from fit_periodic import PeriodicFit
 from fit_settings import fit_settings
@@ -48,89 +48,55 @@ class RotAnalysis(BaseAnalysis):
     def initial_sampling(self):
         """ Function to start initial sampling of the rotational
         mode. This can be done before extra samples are introduced.
+        Generator that yields when there are angles waiting to be
+        calculated.
         """
 
-        # initializing
+        # initializing, the first angle is the ground state
         if len(self.an_mode.get('displacements', [])) == 0:
-            self.an_mode['displacements'] = self.get_initial_angles()
-            self.add_rot_energy(None)  # adding ground state
+            self.an_mode['displacements'] = list(self.get_initial_angles())
 
         # getting initial data points
-        while (len(self.an_mode['displacements']) >
-               len(self.an_mode.get('displacement_energies', []))):
-
-            next_angle = self.an_mode['displacements'][
-                len(self.an_mode['displacement_energies'])]
-
-            self.add_rot_energy(next_angle)
-
-    def sample_until_convergence(self):
-        """ Function will choose new points along the rotation
-        to calculate groundstate of and terminates if the thermodynamical
-        properties have converged for the mode.
-        """
-        # initialize history to check convergence on
-        self.ZPE = []
-        self.entropy_E = []
-
-        # while not converged and samples < max-samples
-        self.ZPE_hist = []
-        self.Z_mode_hist = []
-
-        while self.is_converged() is False:
-            if len(self.ZPE_hist) > 0:
-                # sample a new point
-                self.sample_new_point()
-
-            if self.verbosity > 1:
-                self.log.write('Step %i \n' % len(self.ZPE_hist))
-
-            # Fit mode
-            fit_settings.update({
-                'symnumber': self.an_mode['symnumber'],
-                'verbose': False,
-                'search_method': 'iterative',
-            })
-
-            fitobj = PeriodicFit(fit_settings)
-
-            if self.fit_forces:
-                fitobj.set_data(
-                    self.an_mode['displacements'],
-                    self.an_mode['displacement_energies'],
-                    self.an_mode.get('rot_forces', []))
-            else:
-                fitobj.set_data(
-                    self.an_mode['displacements'],
-                    self.an_mode['displacement_energies'],
-                    [])
-
-            fitobj.run()
-
-            ZPE, Z_mode, energies = self.get_thermo(fitobj)
-
-            self.ZPE_hist.append(ZPE)
-            self.Z_mode_hist.append(Z_mode)
-
-        if self.settings.get('plot_mode'):
-            self.plot_potential_energy(fitobj=fitobj)
-
-        return ZPE, Z_mode, energies
+        if len(self.get_pending_displacements()) > 0:
+            yield
+
+    def make_fit_object(self):
+        """The fitting object for the potential of the mode"""
+        # A copy, as the fit keeps its settings
+        mode_fit_settings = dict(fit_settings)
+        mode_fit_settings.update({
+            'symnumber': self.an_mode['symnumber'],
+            'verbose': False,
+            'search_method': 'iterative',
+        })
+
+        return self.get_fit_object(
+            mode_fit_settings, PeriodicFit, 'periodic',
+            period=2*np.pi/self.an_mode['symnumber'])
 
     def sample_new_point(self):
-        """What new angle to sample:
+        """Generator that chooses the new angle to sample, and yields
+        when it is waiting to be calculated.
+
+        What new angle to sample:
 
         We take the maximum angle distance between two samples scaled with
         the exponenital to the average potential energy of the two angles.
          > exp(avg(E[p0],E[p2])/kT)
+
+        For a mode with a baseline from a cheap calculator, the point is
+        instead chosen to maximize the expected reduction in the variance
+        of Z_mode over the bootstrap ensemble of the fit.
         """
-        sample_angles = list(self.an_mode['displacements'])
-        angle_energies = list(copy(self.an_mode['displacement_energies']))
+        if self.use_variance_acquisition():
+            new_angle = self.get_variance_reduction_displacement(
+                self.fitobj)
+            self.add_displacement(new_angle)
 
-        angles_sort_args = np.argsort(sample_angles)
+            yield
+            return
 
-        angles = np.array([sample_angles[i] for i in angles_sort_args])
-        energies = np.array([angle_energies[i] for i in angles_sort_args])
+        angles, energies = self.get_samples().get_sorted()
         energies -= np.min(energies)
 
         angle_spacings = [angles[i+1] - angles[i]
@@ -142,10 +108,9 @@ class RotAnalysis(BaseAnalysis):
 
         arg = np.argmax(scaled_angle_spacings)
         new_angle = angles[arg]+angle_spacings[arg]/2.
-        self.an_mode['displacements'] = list(
-            np.hstack((self.an_mode['displacements'], new_angle)))
+        self.add_displacement(new_angle)
 
-        self.add_rot_energy(new_angle)
+        yield
 
     def add_rot_energy(self, angle):
         """ Add groundstate energy for a rotation by angle (input) to
@@ -154,54 +119,93 @@ class RotAnalysis(BaseAnalysis):
         Args:
             angle (float): angle of the rotation in radians
         """
-        if angle:  # it will otherwise do a groundstate calculation
-            # It should use the initial groundstate energy if the system
-            # is in a position similar to the starting point.
-            # We thereby save a DFT calculation as the old is reused.
-            if (np.abs(2.*np.pi/self.an_mode['symnumber']-angle) > 1e-5):
-                new_positions = self.get_rotate_positions(angle)
-                self.atoms.set_positions(new_positions)
+        start_time = time.time()
+        e, forces, positions = self.calculate_displacement(angle)
+        self.record_calculation(
+            angle, e, forces, positions, time.time() - start_time)
+
+    def calculate_displacement(self, angle, reset=True):
+        """Calculate the energy with the calculator attached to the atoms
+        for a rotation by angle.
 
-        if not self.an_mode.get('displacement_energies'):
-            self.an_mode['displacement_energies'] = list()
+        Args:
+            angle (float): angle of the rotation in radians
+            reset (optional[bool]): Move the atoms back to the groundstate
+                afterwards.
+
+        Returns:
+            e (float): The potential energy
+            forces (numpy array or None): The forces if
+                fit_forces is set
+            positions (numpy array): The positions of the calculation
+        """
+        # The groundstate positions are used for the angles equivalent to
+        # the starting point, so an old calculation there can be reused.
+        self.atoms.set_positions(self.get_mode_positions(angle))
 
         if self.use_force_consistent:
             e = self.atoms.get_potential_energy(force_consistent=True)
-
-            # For the forces, we need the projection of the forces
-            # on the normal mode of the rotation at the current angle
-            v_force = self.atoms.get_forces()[
-                self.an_mode['indices']].reshape(-1)
-
-            mode = calculate_rot_mode(
-                self.atoms,
-                self.an_mode['base_pos'],
-                self.an_mode['rot_axis'],
-                self.an_mode['branch'],
-                mass_weight=False,
-                normalize=False).reshape((-1, 3))[
-                    self.an_mode['indices']].ravel()
-
-            f = float(np.dot(v_force, mode))
-
-            if not self.an_mode.get('rot_forces'):
-                self.an_mode['rot_forces'] = [f]
-            else:
-                self.an_mode['rot_forces'].append(f)
         else:
             e = self.atoms.get_potential_energy()
 
-        # adding to trajectory:
-        if self.traj is not None:
-            self.traj.write(self.atoms)
+        if self.fit_forces:
+            forces = self.atoms.get_forces()
+        else:
+            forces = None
+
+        positions = self.atoms.get_positions()
+
+        if reset:
+            self.atoms.set_positions(self.groundstate_positions)
+
+        return e, forces, positions
+
+    def get_positions_batch(self, angles):
+        """The positions of all atoms after rotations by angles. No
+        rotation and the full rotation give the groundstate positions.
+
+        Args:
+            angles (list): angles of rotation in radians
+
+        Returns:
+            Numpy array (number of angles x number of atoms x 3)
+        """
+        angles = np.array([0. if a is None else a for a in angles],
+                          dtype=float)
+
+        positions = self.get_rotate_positions(angles)
+
+        groundstate = (angles == 0) | (
+            np.abs(2.*np.pi/self.an_mode['symnumber']-angles) <= 1e-5)
+        positions[groundstate] = self.groundstate_positions
+
+        return positions
+
+    def project_positions(self, positions):
+        """The angle of rotation of the branch closest to the positions,
+        from the branch atom furthest from the axis.
+
+        Args:
+            positions (numpy array): The positions of all atoms
+
+        Returns:
+            The angle in radians between 0 and 2 pi (float)
+        """
+        axis = np.asarray(self.an_mode['rot_axis'], dtype=float)
+        axis = axis / np.linalg.norm(axis)
 
-        self.an_mode['displacement_energies'].append(e)
+        branch = self.an_mode['branch']
+        start = self.groundstate_positions[branch] - self.an_mode['base_pos']
+        end = np.asarray(positions)[branch] - self.an_mode['base_pos']
 
-        self.atoms.set_positions(self.groundstate_positions)
+        # The parts perpendicular to the axis
+        start -= np.outer(np.dot(start, axis), axis)
+        end -= np.outer(np.dot(end, axis), axis)
 
-        # save to backup file:
-        if self.an_filename:
-            self.save_to_backup()
+        i = np.argmax(np.linalg.norm(start, axis=1))
+        angle = np.arctan2(np.dot(axis, np.cross(start[i], end[i])),
+                           np.dot(start[i], end[i]))
+        return np.mod(angle, 2.*np.pi)
 
     def get_initial_angles(self, nsamples=5):
         """ Returns at which initial angles the energy calculations
@@ -218,20 +222,26 @@ class RotAnalysis(BaseAnalysis):
         after the branch has been rotated by angle.
 
         Args:
-            angle (float): angle of rotation in radians
+            angle (float or numpy array): angle of rotation in radians,
+                or an array of angles
         returns:
-            rot_pos (numpy array): the positions of the atoms in the
-                branch.
+            rot_pos (numpy array): the positions of all atoms (natoms x 3),
+                or (number of angles x natoms x 3) for an array of angles
         """
+        branch = self.an_mode['branch']
 
-        rot_pos = copy(self.groundstate_positions)
-
-        rot_pos[self.an_mode['branch']] = rotatepoints(
+        rotated = rotatepoints(
             self.an_mode['base_pos'],
             self.an_mode['rot_axis'],
-            angle,
-            rot_pos[self.an_mode['branch']])
+            np.atleast_1d(angle),
+            self.groundstate_positions[branch])
+
+        rot_pos = np.repeat(
+            self.groundstate_positions[None], len(rotated), axis=0)
+        rot_pos[:, branch] = rotated
 
+        if np.ndim(angle) == 0:
+            return rot_pos[0]
         return rot_pos
 
     def make_inspection_traj(
@@ -250,8 +260,7 @@ class RotAnalysis(BaseAnalysis):
 
         angles = self.get_initial_angles(nsamples=num_displacements)
 
-        for angle in angles:
-            new_pos = self.get_rotate_positions(angle)
+        for new_pos in self.get_rotate_positions(angles):
             self.atoms.set_positions(new_pos)
             traj.write(self.atoms)
             self.atoms.set_positions(old_pos)
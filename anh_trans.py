@@ -1,13 +1,12 @@
 import sys
-import warnings
+import time
 import numpy as np
 
 from ase.io.trajectory import Trajectory
-from ase.constraints import FixedLine, FixAtoms
-from ase.optimize import QuasiNewton
 from ase.visualize import view
 
 from anh_base import BaseAnalysis
+from an_utils import relax_along_axis, get_displaced_positions
 from fit_periodic import PeriodicFit
 from fit_settings import fit_settings
 
@@ -48,73 +47,16 @@ class TransAnalysis(BaseAnalysis):
 
     def initial_sampling(self):
         """Start initial sampling of the mode. This can be done before extra
-        samples are introduced.
+        samples are introduced. Generator that yields when there are
+        displacements waiting to be calculated.
         """
-        # initializing
+        # initializing, the first point is the ground state
         if len(self.an_mode.get('displacements', [])) == 0:
-            self.an_mode['displacements'] = self.get_initial_points(
-                self.settings.get('n_initial', 5))
-            self.add_displacement_energy(None)  # adding ground state
+            self.an_mode['displacements'] = list(self.get_initial_points(
+                self.settings.get('n_initial', 5)))
 
-        while (len(self.an_mode['displacements']) >
-               len(self.an_mode.get('displacement_energies', []))):
-
-            displacement = self.an_mode['displacements'][
-                len(self.an_mode['displacement_energies'])]
-
-            self.add_displacement_energy(displacement)
-
-    def sample_until_convergence(self):
-        """ Function will choose new points along the rotation
-        to calculate groundstate of and terminates if the thermodynamical
-        properties have converged for the mode.
-        """
-        # initialize history to check convergence on
-        self.ZPE = []
-        self.entropy_E = []
-
-        # while not converged and samples < max-samples
-        self.ZPE_hist = []
-        self.Z_mode_hist = []
-
-        while self.is_converged() is False:
-            if len(self.ZPE_hist) > 0:
-                # sample a new point
-                self.sample_new_point()
-
-            if self.verbosity > 1:
-                self.log.write('Step %i \n' % len(self.ZPE_hist))
-
-            fit_settings.update({
-                'symnumber': 1,
-                'verbose': False,
-                'search_method': 'iterative',
-            })
-
-            fitobj = PeriodicFit(fit_settings)
-
-            if self.fit_forces:
-                fitobj.set_data(
-                    self.an_mode['displacements'],
-                    self.an_mode['displacement_energies'],
-                    self.an_mode.get('trans_forces', []))
-            else:
-                fitobj.set_data(
-                    self.an_mode['displacements'],
-                    self.an_mode['displacement_energies'],
-                    [])
-
-            fitobj.run()
-
-            ZPE, Z_mode, energies = self.get_thermo(fitobj)
-
-            self.ZPE_hist.append(ZPE)
-            self.Z_mode_hist.append(Z_mode)
-
-        if self.settings.get('plot_mode'):
-            self.plot_potential_energy(fitobj=fitobj)
-
-        return ZPE, Z_mode, energies
+        if len(self.get_pending_displacements()) > 0:
+            yield
 
     def get_initial_points(self, nsamples):
         """Get the points to initially calculate the potential
@@ -129,21 +71,42 @@ class TransAnalysis(BaseAnalysis):
             * (np.array(range(0, nsamples)) / (nsamples-1)))
         return displacements
 
+    def make_fit_object(self):
+        """The fitting object for the potential of the mode"""
+        # A copy, as the fit keeps its settings
+        mode_fit_settings = dict(fit_settings)
+        mode_fit_settings.update({
+            'symnumber': 1,
+            'verbose': False,
+            'search_method': 'iterative',
+        })
+
+        return self.get_fit_object(
+            mode_fit_settings, PeriodicFit, 'periodic',
+            period=self.an_mode['transition_path_length'])
+
     def sample_new_point(self):
-        """Decide what displacement to sample next
+        """Decide what displacement to sample next. Generator that yields
+        when the new displacement is waiting to be calculated.
 
         We take the maximum angle distance between two samples scaled with
         the exponenital to the average potential energy of the two angles.
          > exp(avg(E[p0],E[p2])/kT)
+
+        For a mode with a baseline from a cheap calculator, the point is
+        instead chosen to maximize the expected reduction in the variance
+        of Z_mode over the bootstrap ensemble of the fit.
         """
 
-        displacements = list(self.an_mode['displacements'])
-        displacement_energies = list(self.an_mode['displacement_energies'])
+        if self.use_variance_acquisition():
+            new_displacement = self.get_variance_reduction_displacement(
+                self.fitobj)
+            self.add_displacement(new_displacement)
 
-        sort_args = np.argsort(displacements)
+            yield
+            return
 
-        displacements_sorted = np.array([displacements[i] for i in sort_args])
-        energies = np.array([displacement_energies[i] for i in sort_args])
+        displacements_sorted, energies = self.get_samples().get_sorted()
         energies -= np.min(energies)
 
         displacements_spacings = [
@@ -153,17 +116,16 @@ class TransAnalysis(BaseAnalysis):
         scaled_displacements_spacings = [
             displacements_spacings[i]*np.exp(
                 -(energies[i]+energies[i+1])/(2*self.kT))
-            for i in range(len(displacements)-1)]
+            for i in range(len(displacements_sorted)-1)]
 
         arg = np.argmax(scaled_displacements_spacings)
         # Pick the point in between the two displacements that is the biggest
         new_displacement = (displacements_sorted[arg]
                             + 0.5*displacements_spacings[arg])
 
-        self.an_mode['displacements'] = list(
-            np.hstack((displacements, new_displacement)))
+        self.add_displacement(new_displacement)
 
-        self.add_displacement_energy(new_displacement)
+        yield
 
     def add_displacement_energy(self, displacement):
         """Add the groundstate energy for a displacements along the
@@ -172,75 +134,205 @@ class TransAnalysis(BaseAnalysis):
         Args:
             displacement (float): How much to follow translational path.
         """
+        start_time = time.time()
+        e, forces, positions = self.calculate_displacement(displacement)
+        self.record_calculation(
+            displacement, e, forces, positions, time.time() - start_time)
+
+    def calculate_displacement(self, displacement, reset=True):
+        """Calculate the groundstate energy for a displacement along the
+        translational path with the calculator attached to the atoms,
+        relaxing along the relax_axis if it is set.
 
-        # Will otherwise do a groundstate calculation at initial positions
-        if displacement:
-            if displacement != self.an_mode['transition_path_length']:
-                self.atoms.set_positions(
-                    self.get_translation_positions(displacement))
-
-                # Do 1D optimization
-                fix_environment = FixAtoms(mask=[
-                    i not in self.an_mode['indices']
-                    for i in range(len(self.atoms))])
-
-                axis_relax = self.an_mode.get('relax_axis')
-                if axis_relax:
-                    if self.use_force_consistent:
-                        warnings.warn(' '.join([
-                            "relax along axis and force_consistent",
-                            "should only be used with ase releases after",
-                            "Jan 2017. See",
-                            "https://gitlab.com/ase/ase/merge_requests/354"
-                        ]))
-                    c = []
-                    for i in self.an_mode['indices']:
-                        c.append(FixedLine(i, axis_relax))
-                    # Fixing everything that is not the vibrating part
-                    c.append(fix_environment)
-                    self.atoms.set_constraint(c)
-
-                    # Optimization
-                    dyn = QuasiNewton(self.atoms, logfile='/dev/null')
-                    dyn.run(fmax=self.settings.get('fmax', 0.05))
-
-                    self.atoms.set_constraint(fix_environment)
-
-        if not self.an_mode.get('displacement_energies'):
-            self.an_mode['displacement_energies'] = list()
+        Args:
+            displacement (float): How much to follow translational path.
+            reset (optional[bool]): Move the atoms back to the groundstate
+                afterwards.
+
+        Returns:
+            e (float): The potential energy
+            forces (numpy array or None): The forces if
+                fit_forces is set
+            positions (numpy array): The positions of the calculation
+        """
+        self.atoms.set_positions(self.get_mode_positions(displacement))
+
+        # No relaxation for the groundstate at the ends of the path
+        if (displacement and
+                displacement != self.an_mode['transition_path_length']):
+            axis_relax = self.an_mode.get('relax_axis')
+            if axis_relax:
+                # Start from the relaxed neighbours on the path
+                hessian = None
+                if self.settings.get('relax_warm_start', True):
+                    self.atoms.set_positions(
+                        self.get_relax_start_positions(displacement))
+                    hessian = self.get_relax_hessian(displacement)
+                if hessian is None:
+                    hessian = self.get_axis_hessian()
+
+                # Minimization in the subspace of the axis
+                hessian, iterations, force_calls = relax_along_axis(
+                    self.atoms, self.an_mode['indices'], axis_relax,
+                    hessian, fmax=self.settings.get('fmax', 0.05))
+
+                self.add_relaxed_point(
+                    displacement, hessian, iterations, force_calls)
 
         if self.use_force_consistent:
             e = self.atoms.get_potential_energy(force_consistent=True)
+        else:
+            e = self.atoms.get_potential_energy()
+
+        if self.fit_forces:
+            forces = self.atoms.get_forces()
+        else:
+            forces = None
+
+        positions = self.atoms.get_positions()
 
-            # For the forces, we need the projection of the forces
-            # on the normal mode of the rotation at the current angle
-            v_force = self.atoms.get_forces()[
-                self.an_mode['indices']].reshape(-1)
+        if reset:
+            self.atoms.set_positions(self.groundstate_positions)
 
-            f = float(np.dot(
-                v_force, self.an_mode['mode_tangent']))
+        return e, forces, positions
 
-            if not self.an_mode.get('trans_forces'):
-                self.an_mode['trans_forces'] = [f]
-            else:
-                self.an_mode['trans_forces'].append(f)
+    def can_calculate_batch(self):
+        """The points cannot be calculated in a batch if they are relaxed
+        along the relax_axis"""
+        return not self.an_mode.get('relax_axis')
+
+    def add_relaxed_point(self, displacement, hessian, iterations,
+                          force_calls):
+        """Store the relaxed height of the translating atoms at a
+        displacement in an_mode['relaxed_displacements'] and
+        an_mode['relaxed_offsets'], and the curvature along the axis.
+        The steps and force calls of the relaxations are counted in
+        an_mode['relax_steps'] and an_mode['relax_force_calls'].
+
+        Args:
+            displacement (float): The displacement along the path
+            hessian (numpy array): The curvature along the axis after
+                the relaxation
+            iterations (int): Steps of the relaxation
+            force_calls (int): Force calculations of the relaxation
+        """
+        indices = self.an_mode['indices']
+        offsets = (self.atoms.get_positions()[indices] -
+                   self.get_translation_positions(displacement)[indices])
+
+        if not self.an_mode.get('relaxed_displacements'):
+            self.an_mode['relaxed_displacements'] = []
+            self.an_mode['relaxed_offsets'] = []
+        self.an_mode['relaxed_displacements'].append(displacement)
+        self.an_mode['relaxed_offsets'].append(offsets)
+
+        self.an_mode['relax_steps'] = (
+            self.an_mode.get('relax_steps', 0) + iterations)
+        self.an_mode['relax_force_calls'] = (
+            self.an_mode.get('relax_force_calls', 0) + force_calls)
+
+        if getattr(self, 'relax_hessians', None) is None:
+            self.relax_hessians = {}
+        self.relax_hessians[displacement] = hessian
+
+    def get_axis_hessian(self):
+        """The curvature along the relax_axis of the translating atoms at
+        the groundstate from the Hessian of the Vibrations object
+        (an_mode['relax_hessian']), or a default curvature if the mode
+        has none."""
+        if self.an_mode.get('relax_hessian') is not None:
+            return np.array(self.an_mode['relax_hessian'])
+        return 70. * np.eye(len(self.an_mode['indices']))
+
+    def get_relax_start_positions(self, displacement):
+        """Starting positions of the relaxation at a displacement with
+        the offsets of the translating atoms linearly interpolated from
+        the nearest relaxed points on either side. The ends of the path
+        are the groundstate.
+
+        Args:
+            displacement (float): The displacement along the path
+
+        Returns:
+            positions (numpy array): The positions of all atoms
+        """
+        positions = self.get_translation_positions(displacement)
+        indices = self.an_mode['indices']
+
+        known = [(0., np.zeros((len(indices), 3))),
+                 (self.an_mode['transition_path_length'],
+                  np.zeros((len(indices), 3)))]
+        known += list(zip(self.an_mode.get('relaxed_displacements', []),
+                          self.an_mode.get('relaxed_offsets', [])))
+
+        below = max([k for k in known if k[0] <= displacement],
+                    key=lambda k: k[0])
+        above = min([k for k in known if k[0] >= displacement],
+                    key=lambda k: k[0])
+
+        if above[0] > below[0]:
+            t = (displacement - below[0]) / (above[0] - below[0])
         else:
-            e = self.atoms.get_potential_energy()
+            t = 0.
+
+        positions[indices] += (1 - t) * below[1] + t * above[1]
+
+        return positions
 
-        if self.traj is not None:
-            self.traj.write(self.atoms)
+    def get_relax_hessian(self, displacement):
+        """The curvature along the axis after the relaxation of the
+        nearest relaxed point in this session, or None if there is
+        none."""
+        hessians = getattr(self, 'relax_hessians', None)
+        if not hessians:
+            return None
 
-        self.an_mode['displacement_energies'].append(e)
+        nearest = min(hessians, key=lambda d: abs(d - displacement))
+        return hessians[nearest]
 
-        # adding to trajectory:
-        if self.traj is not None:
-            self.traj.write(self.atoms)
+    def get_positions_batch(self, displacements):
+        """The unrelaxed positions of all atoms at displacements along
+        the translational path. The start and the end of the path give
+        the groundstate positions.
 
-        self.atoms.set_positions(self.groundstate_positions)
+        Args:
+            displacements (list): The displacements along the path
 
-        # save to backup file:
-        if self.an_filename:
-            self.save_to_backup()
+        Returns:
+            Numpy array (number of displacements x number of atoms x 3)
+        """
+        displacements = np.asarray(displacements, dtype=float)
+
+        positions = self.get_translation_positions(displacements)
+
+        ends = ((displacements == 0) |
+                (displacements == self.an_mode['transition_path_length']))
+        positions[ends] = self.groundstate_positions
+
+        return positions
+
+    def project_positions(self, positions):
+        """The displacement along the translational path closest to the
+        positions. A relaxation along the relax_axis is left out.
+
+        Args:
+            positions (numpy array): The positions of all atoms
+
+        Returns:
+            The displacement (float)
+        """
+        direction = (np.asarray(self.an_mode['mode_position_delta'])
+                     / self.an_mode['transition_path_length'])
+        delta = np.mean((np.asarray(positions) - self.groundstate_positions)[
+            self.an_mode['indices']], axis=0)
+
+        if self.an_mode.get('relax_axis') is not None:
+            axis = np.asarray(self.an_mode['relax_axis'], dtype=float)
+            axis = axis / np.linalg.norm(axis)
+            direction = direction - np.dot(direction, axis)*axis
+            delta = delta - np.dot(delta, axis)*axis
+
+        return np.dot(delta, direction) / np.dot(direction, direction)
 
     def get_translation_positions(self, displacement):
         """Calculate the new positions of the atoms with the vibrational
@@ -248,17 +340,27 @@ class TransAnalysis(BaseAnalysis):
         given as an input.
 
         Args:
-            displacement (float): The displacement along the translational path
+            displacement (float or numpy array): The displacement along the
+                translational path, or an array of displacements
 
         Returns:
             positions (numpy array): The new positions of the atoms with the
-                vibrational system moved along the translational path.
+                vibrational system moved along the translational path
+                (natoms x 3), or (number of displacements x natoms x 3)
+                for an array of displacements.
         """
-
-        positions = self.atoms.get_positions()
-        for index in self.an_mode['indices']:
-            positions[index] += displacement*self.an_mode['mode_tangent']
-
+        # All translating atoms move together along the path
+        direction = (np.asarray(self.an_mode['mode_position_delta'])
+                     / self.an_mode['transition_path_length'])
+
+        positions = get_displaced_positions(
+            self.groundstate_positions,
+            self.an_mode['indices'],
+            np.multiply.outer(np.atleast_1d(displacement),
+                              direction)[:, None, :])
+
+        if np.ndim(displacement) == 0:
+            return positions[0]
         return positions
 
     def make_inspection_traj(
@@ -277,8 +379,7 @@ class TransAnalysis(BaseAnalysis):
 
         displacements = self.get_initial_points(num_displacements)
 
-        for displacement in displacements:
-            new_pos = self.get_translation_positions(displacement)
+        for new_pos in self.get_translation_positions(displacements):
             self.atoms.set_positions(new_pos)
             traj.write(self.atoms)
             self.atoms.set_positions(old_pos)
@@ -0,0 +1,503 @@
+import sys
+import time
+import numpy as np
+
+import ase.units as units
+from ase.io.trajectory import Trajectory
+
+from anh_base import BaseAnalysis
+from an_utils import relax_along_axis, get_displaced_positions
+from energy_spectrum_solver import energy_spectrum_2d
+from fit_periodic2d import Periodic2DFit
+from fit_settings import fit_settings
+
+
+class Trans2DAnalysis(BaseAnalysis):
+    """Module for calculate the partition function of two dimensional
+    translational modes on a surface.
+
+    The displacements are the fractional coordinates [u, v] of the
+    translating atoms in the surface cell spanned by
+    an_mode['cell_vectors'], with [0, 0] the groundstate. The potential
+    is fitted by a 2D Fourier series and the levels are found with a
+    plane wave solver, see energy_spectrum_solver.energy_spectrum_2d.
+    """
+    sample_ndim = 2
+
+    def __init__(
+        self,
+        an_mode,
+        atoms,
+        an_filename=None,
+        settings={},
+        log=sys.stdout,
+        verbosity=1,
+    ):
+        super(Trans2DAnalysis, self).__init__()
+
+        self.an_mode = an_mode
+        self.atoms = atoms
+        self.an_filename = an_filename
+        self.settings = settings
+        self.log = log
+        self.verbosity = verbosity
+
+        # Checks
+        assert self.an_mode['type'] == 'translation_2d'
+
+        # settings
+        # The 2D fit only uses the energies
+        self.fit_forces = False
+        self.E_max_kT = settings.get('E_max_kT', 5)
+        self.temperature = settings.get('temperature', 300)  # Kelvin
+        self.use_force_consistent = settings.get('use_force_consistent', False)
+        # Convergence tolerance
+        self.rel_Z_mode_change_tol = settings.get('rel_Z_mode_tol', 0.01)
+
+        self.initialize()
+
+        self.symmetry_operations = self.get_symmetry_operations()
+
+    def initial_sampling(self):
+        """Start initial sampling of the mode on a grid of
+        settings['n_initial'] x settings['n_initial'] points in the cell,
+        leaving out points that are equivalent by symmetry. Generator
+        that yields when there are displacements waiting to be
+        calculated.
+        """
+        if len(self.an_mode.get('displacements', [])) == 0:
+            self.an_mode['displacements'] = self.get_initial_points(
+                self.settings.get('n_initial', 3))
+
+        if len(self.get_pending_displacements()) > 0:
+            yield
+
+    def get_initial_points(self, n):
+        """Get the points of an n x n grid in the cell that are not
+        equivalent by symmetry, starting with the groundstate.
+
+        Returns:
+            displacements (list): The [u, v] of the points
+        """
+        displacements = []
+        for u in np.arange(n) / float(n):
+            for v in np.arange(n) / float(n):
+                if not self.is_sampled([u, v], displacements):
+                    displacements.append([u, v])
+        return displacements
+
+    def get_symmetry_operations(self):
+        """The rotations by 2 pi k/symnumber about the surface normal
+        through the groundstate, as matrices acting on the fractional
+        coordinates (row vectors).
+
+        Returns:
+            List of 2x2 numpy arrays, the identity first
+        """
+        A = np.asarray(self.an_mode['cell_vectors'], dtype=float)
+        normal = np.cross(A[0], A[1])
+        normal /= np.linalg.norm(normal)
+
+        # From cartesian to fractional coordinates
+        to_fractional = np.dot(A.T, np.linalg.inv(np.dot(A, A.T)))
+
+        operations = []
+        for k in range(self.an_mode['symnumber']):
+            angle = 2*np.pi*k/self.an_mode['symnumber']
+            K = np.array([[0., -normal[2], normal[1]],
+                          [normal[2], 0., -normal[0]],
+                          [-normal[1], normal[0], 0.]])
+            R = (np.eye(3) + np.sin(angle)*K +
+                 (1 - np.cos(angle))*np.dot(K, K))
+            operations.append(np.dot(np.dot(A, R.T), to_fractional))
+
+        return operations
+
+    def get_symmetry_images(self, displacement):
+        """The points equivalent to a displacement by the symmetry of the
+        surface, folded into the cell.
+
+        Args:
+            displacement (list): [u, v] of the point
+
+        Returns:
+            Numpy array (symnumber x 2) of the equivalent points
+        """
+        images = np.array([np.dot(displacement, operation)
+                           for operation in self.symmetry_operations])
+        return np.mod(np.round(images, 8), 1.)
+
+    def get_periodic_distances(self, point, points):
+        """The shortest distances in Angstrom between a point and a list
+        of points with the periodicity of the cell.
+
+        Args:
+            point (list): [u, v] of the point
+            points (numpy array): [u, v] of the points
+
+        Returns:
+            Numpy array with the distances
+        """
+        A = np.asarray(self.an_mode['cell_vectors'], dtype=float)
+        delta = np.atleast_2d(points) - np.asarray(point)
+        delta -= np.round(delta)
+
+        shifts = np.array([[i, j] for i in (-1, 0, 1) for j in (-1, 0, 1)])
+        distances = np.linalg.norm(
+            np.dot(delta[:, None, :] + shifts[None, :, :], A), axis=2)
+
+        return np.min(distances, axis=1)
+
+    def is_sampled(self, displacement, displacements, tol=1e-6):
+        """Check if a point or one of its symmetry images is in a list of
+        points"""
+        if len(displacements) == 0:
+            return False
+        images = self.get_symmetry_images(displacement)
+        return any(np.min(self.get_periodic_distances(image, displacements))
+                   < tol for image in images)
+
+    def get_unfolded_samples(self):
+        """The sampled points and all their symmetry images with the
+        energy of the sample.
+
+        Returns:
+            displacements (numpy array): The [u, v] of the points
+            energies (numpy array): The potential energies
+        """
+        samples = self.get_samples()
+
+        displacements = []
+        energies = []
+        for displacement, energy in zip(
+                samples.sampled_displacements, samples.energies):
+            for image in self.get_symmetry_images(displacement):
+                if (len(displacements) == 0 or np.min(
+                        self.get_periodic_distances(image, displacements))
+                        > 1e-6):
+                    displacements.append(image)
+                    energies.append(energy)
+
+        return np.array(displacements), np.array(energies)
+
+    def make_fit_object(self):
+        """The fitting object for the potential of the mode"""
+        # A copy, as the fit keeps its settings
+        mode_fit_settings = dict(fit_settings)
+        mode_fit_settings.update({
+            'cell_vectors': self.an_mode['cell_vectors'],
+            'verbose': False,
+            'search_method': 'iterative',
+        })
+
+        return Periodic2DFit(mode_fit_settings)
+
+    def get_fit(self):
+        """Fit the sampled potential energies and their symmetry images
+        with a 2D Fourier series.
+
+        Returns:
+            The fitting object
+        """
+        x, y = self.get_unfolded_samples()
+
+        fitobj = self.make_fit_object()
+        fitobj.set_data(x, y)
+        fitobj.run()
+
+        return fitobj
+
+    def get_hcoeff(self):
+        """hbar**2/(2 M) in eV*Angstrom**2 with M the total mass of the
+        translating atoms"""
+        return units._hbar**2/(2*self.an_mode['mass']*units._amu *
+                               units._e * 1e-20)
+
+    def get_thermo(self, fitobj):
+        """Calculate thermodynamics of the mode from the levels of the
+        2D schrodinger equation in the cell.
+
+        Args:
+            fitobj (object): The fitting object
+
+        Returns:
+            ZPE (float): The zero point energy for the mode.
+            Z_mode (float): The partition function for mode.
+            energies_truncated (list): Energy levels of modes
+                truncated to specific max energy.
+        """
+        energies = self.get_spectrum(fitobj.get_fourier_coefficients())
+        self.spectrum = energies
+
+        return self.get_spectrum_thermo(energies)
+
+    def get_spectrum_window(self):
+        """The energy above the lowest level up to which the spectrum of
+        the last get_thermo holds all the levels, see get_spectrum."""
+        return (self.E_max_kT + 1)*self.kT
+
+    def get_spectrum(self, fourier_coefficients):
+        """The energy levels of a potential relative to the groundstate
+        energy, up to E_max_kT*kT above the lowest level.
+
+        Args:
+            fourier_coefficients (dict): The potential, see
+                Periodic2DFit.get_fourier_coefficients
+
+        Returns:
+            The energy levels (numpy array)
+        """
+        groundstate_energy = np.min(self.get_samples().energies)
+
+        energies = energy_spectrum_2d(
+            fourier_coefficients, self.an_mode['cell_vectors'],
+            self.get_hcoeff(), (self.E_max_kT + 1)*self.kT)
+
+        return energies - groundstate_energy
+
+    def get_ensemble_spectra(self, fitobj, members):
+        """The energy spectra of members of the bootstrap ensemble of the
+        fit relative to the groundstate energy.
+
+        Args:
+            fitobj (object): The fitting object with a bootstrap ensemble
+            members (numpy array): Indices of the ensemble members
+
+        Returns:
+            List with a spectrum for each member
+        """
+        return [self.get_spectrum(fitobj.get_fourier_coefficients(
+            fitobj.coeffs_samples[member])) for member in members]
+
+    def get_fit_grid(self, npoints):
+        """The fit stored in the mode object by finish on an even n x n
+        grid of the cell with n the square root of npoints.
+
+        Args:
+            npoints (int): Number of points of the grid
+
+        Returns:
+            displacements (numpy array with [u, v] of each point),
+                energies (numpy array)
+        """
+        n = max(1, int(np.sqrt(npoints)))
+        u = np.arange(n) / float(n)
+        displacements = np.array([(ui, vi) for ui in u for vi in u])
+        return displacements, self.an_mode['fit'].fval(displacements)
+
+    def sample_new_point(self):
+        """Decide what displacement to sample next. Generator that yields
+        when the new displacement is waiting to be calculated.
+
+        The candidates are a grid of settings['acquisition_grid_2d']
+        points along each cell vector. We take the candidate with the
+        largest distance to the samples and their symmetry images scaled
+        with the exponential to the fitted potential energy,
+         > d*exp(-(V - V_min)/kT)
+        """
+        n = self.settings.get('acquisition_grid_2d', 12)
+        candidates = np.array([[u, v] for u in np.arange(n) / float(n)
+                               for v in np.arange(n) / float(n)])
+
+        samples, _ = self.get_unfolded_samples()
+        distances = np.array([
+            np.min(self.get_periodic_distances(candidate, samples))
+            for candidate in candidates])
+
+        energies = self.fitobj.fval(candidates)
+        energies -= min(np.min(energies),
+                        np.min(self.get_samples().energies))
+
+        new_displacement = candidates[
+            np.argmax(distances*np.exp(-energies/self.kT))]
+
+        self.add_displacement(list(new_displacement))
+
+        yield
+
+    def is_groundstate(self, displacement):
+        """Check if a displacement is a lattice vector away from the
+        groundstate"""
+        return np.allclose(np.mod(np.round(displacement, 8), 1.), 0.)
+
+    def calculate_displacement(self, displacement, reset=True):
+        """Calculate the groundstate energy for a displacement in the
+        cell with the calculator attached to the atoms, relaxing along
+        the relax_axis if it is set.
+
+        Args:
+            displacement (list): [u, v] of the point
+            reset (optional[bool]): Move the atoms back to the groundstate
+                afterwards.
+
+        Returns:
+            e (float): The potential energy
+            forces (None): The forces are not used by the 2D fit
+            positions (numpy array): The positions of the calculation
+        """
+        self.atoms.set_positions(self.get_mode_positions(displacement))
+
+        # No relaxation for the groundstate
+        axis_relax = self.an_mode.get('relax_axis')
+        if axis_relax and not self.is_groundstate(displacement):
+            if self.an_mode.get('relax_hessian') is not None:
+                hessian = np.array(self.an_mode['relax_hessian'])
+            else:
+                hessian = 70. * np.eye(len(self.an_mode['indices']))
+
+            relax_along_axis(
+                self.atoms, self.an_mode['indices'], axis_relax,
+                hessian, fmax=self.settings.get('fmax', 0.05))
+
+        if self.use_force_consistent:
+            e = self.atoms.get_potential_energy(force_consistent=True)
+        else:
+            e = self.atoms.get_potential_energy()
+
+        positions = self.atoms.get_positions()
+
+        if reset:
+            self.atoms.set_positions(self.groundstate_positions)
+
+        return e, None, positions
+
+    def can_calculate_batch(self):
+        """The points cannot be calculated in a batch if they are relaxed
+        along the relax_axis"""
+        return not self.an_mode.get('relax_axis')
+
+    def project_forces(self, forces, displacement):
+        """The forces along the two cell vectors, -dE/du and -dE/dv.
+
+        Args:
+            forces (numpy array): forces on all atoms
+            displacement (list): [u, v] of the point
+
+        Returns:
+            Numpy array with the two projected forces
+        """
+        forces = np.asarray(forces)[self.an_mode['indices']]
+        return np.dot(np.sum(forces, axis=0),
+                      np.asarray(self.an_mode['cell_vectors']).T)
+
+    def get_positions_batch(self, displacements):
+        """The unrelaxed positions of all atoms at displacements in the
+        cell. Lattice vectors give the groundstate positions.
+
+        Args:
+            displacements (list): [u, v] of the points
+
+        Returns:
+            Numpy array (number of displacements x number of atoms x 3)
+        """
+        displacements = np.reshape(
+            np.asarray(displacements, dtype=float), (-1, 2))
+
+        positions = self.get_translation_positions(displacements)
+
+        groundstate = np.all(
+            np.mod(np.round(displacements, 8), 1.) == 0, axis=1)
+        positions[groundstate] = self.groundstate_positions
+
+        return positions
+
+    def project_positions(self, positions):
+        """The point [u, v] of the cell closest to the positions. A
+        relaxation along the relax_axis is left out.
+
+        Args:
+            positions (numpy array): The positions of all atoms
+
+        Returns:
+            Numpy array [u, v]
+        """
+        cell_vectors = np.array(self.an_mode['cell_vectors'], dtype=float)
+        delta = np.mean((np.asarray(positions) - self.groundstate_positions)[
+            self.an_mode['indices']], axis=0)
+
+        if self.an_mode.get('relax_axis') is not None:
+            axis = np.asarray(self.an_mode['relax_axis'], dtype=float)
+            axis = axis / np.linalg.norm(axis)
+            cell_vectors -= np.outer(np.dot(cell_vectors, axis), axis)
+            delta = delta - np.dot(delta, axis)*axis
+
+        return np.linalg.lstsq(cell_vectors.T, delta, rcond=None)[0]
+
+    def get_translation_positions(self, displacement):
+        """Calculate the new positions of the atoms with the vibrational
+        system moved by u*a1 + v*a2.
+
+        Args:
+            displacement (numpy array): [u, v] of the point, or an array
+                of points (number of points x 2)
+
+        Returns:
+            positions (numpy array): The new positions of the atoms
+                (natoms x 3), or (number of points x natoms x 3) for an
+                array of points.
+        """
+        shifts = np.dot(np.atleast_2d(displacement),
+                        self.an_mode['cell_vectors'])
+
+        positions = get_displaced_positions(
+            self.groundstate_positions, self.an_mode['indices'],
+            shifts[:, None, :])
+
+        if np.ndim(displacement) == 1:
+            return positions[0]
+        return positions
+
+    def make_inspection_traj(
+            self,
+            num_displacements=5,
+            filename=None):
+        """Make trajectory file for translational mode to inspect"""
+        if filename is None:
+            filename = self.an_filename+'_inspect.traj'
+
+        traj = Trajectory(filename, mode='w', atoms=self.atoms)
+
+        old_pos = self.atoms.positions.copy()
+        calc = self.atoms.get_calculator()
+        self.atoms.set_calculator()
+
+        u = np.linspace(0., 1., num_displacements)
+        U, V = np.meshgrid(u, u, indexing='ij')
+        displacements = np.vstack((U.ravel(), V.ravel())).T
+
+        for new_pos in self.get_translation_positions(displacements):
+            self.atoms.set_positions(new_pos)
+            traj.write(self.atoms)
+            self.atoms.set_positions(old_pos)
+
+        self.atoms.set_calculator(calc)
+        traj.close()
+
+    def plot_potential_energy(self, fitobj=None, filename=None):
+        # Matplotlib is loaded selectively as it is requires
+        # libraries that are often not installed on clusters
+        import matplotlib.pylab as plt
+
+        if filename is None:
+            filename = self.an_filename+'.png'
+
+        A = np.asarray(self.an_mode['cell_vectors'])
+
+        if fitobj is not None:
+            u = np.linspace(0., 1., 40)
+            U, V = np.meshgrid(u, u, indexing='ij')
+            points = np.vstack((U.ravel(), V.ravel())).T
+            xy = np.dot(points, A)
+            plt.tricontourf(xy[:, 0], xy[:, 1], fitobj.fval(points), 20)
+            plt.colorbar(label='Potential energy (eV)')
+
+        samples = np.dot(self.an_mode['displacements'], A)
+        plt.plot(samples[:, 0], samples[:, 1], 'x', color='k',
+                 label=('Samples (%i points)' % len(samples)))
+
+        plt.legend()
+        plt.xlabel('x (angstrom)')
+        plt.ylabel('y (angstrom)')
+
+        plt.savefig(filename)
+        plt.clf()
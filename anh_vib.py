@@ -1,5 +1,5 @@
 import sys
-from copy import copy
+import time
 
 import numpy as np
 
@@ -9,7 +9,7 @@ from anh_base import BaseAnalysis
 from fit_legendre import NonPeriodicFit
 from fit_settings import fit_settings
 
-from an_utils import to_none_massweight_coor
+from an_utils import to_none_massweight_coor, get_displaced_positions
 
 from scipy.optimize import minimize_scalar
 
@@ -58,26 +58,23 @@ class VibAnalysis(BaseAnalysis):
         self.initialize()
 
     def initial_sampling(self):
-        """Initial sampling"""
+        """Initial sampling. Generator that yields when there are
+        displacements waiting to be calculated."""
 
         if len(self.an_mode.get('displacements', [])) == 0:
-
-            self.an_mode['displacements'] = [0.]  # Starting point
-            self.add_displacement_energy(None)  # Groundstate energy
-
-            self.an_mode['displacements'] = list(
-                np.hstack([
-                    0.,
-                    self.get_initial_displacements()]))
+            if self.has_baseline():
+                # The range is already known from the baseline
+                xmin, xmax, _ = self.get_hamiltonian_domain()
+                self.an_mode['displacements'] = [
+                    0., xmin, xmax, xmin/2., xmax/2.]
+            else:
+                # Starting point (groundstate energy) and initial points
+                self.an_mode['displacements'] = [0.] + list(
+                    self.get_initial_displacements())
 
         # getting initial data points
-        while (len(self.an_mode['displacements']) >
-               len(self.an_mode.get('displacement_energies', []))):
-
-            next_displacement = self.an_mode['displacements'][
-                len(self.an_mode['displacement_energies'])]
-
-            self.add_displacement_energy(next_displacement)
+        if len(self.get_pending_displacements()) > 0:
+            yield
 
     def get_initial_displacements(
             self,
@@ -113,90 +110,58 @@ class VibAnalysis(BaseAnalysis):
             #
             step_size = self.max_stepsize
 
-        steps = np.linspace(0., step_size, displacements/2+1)[1:]
+        steps = np.linspace(0., step_size, displacements//2+1)[1:]
 
         displacements = np.hstack((-steps[::-1], [0.], steps))
 
         return displacements
 
-    def get_fit(self):
-        # Fit mode
-        fit_settings.update({
+    def make_fit_object(self):
+        """The fitting object for the potential of the mode"""
+        # A copy, as the fit keeps its settings
+        mode_fit_settings = dict(fit_settings)
+        mode_fit_settings.update({
             'verbose': False,
             'search_method': 'iterative',
         })
 
-        fitobj = NonPeriodicFit(fit_settings)
-
-        x = np.array(self.an_mode['displacements'])
-        y = np.array(self.an_mode['displacement_energies'])
-
-        if self.fit_forces:
-            fitobj.set_data(
-                x, y,
-                self.an_mode.get('displacement_forces', []))
-        else:
-            fitobj.set_data(x, y, [])
-
-        fitobj.run()
-
-        return fitobj
-
-    def sample_until_convergence(self):
-        # initialize history to check convergence on
-        self.ZPE = []
-        self.entropy_E = []
-
-        # while not converged and samples < max-samples
-        self.ZPE_hist = []
-        self.Z_mode_hist = []
-        self.energies_last = []
-
-        while self.is_converged() is False:
-            if len(self.ZPE_hist) > 0:
-                self.sample_new_point()
-
-            if self.verbosity > 1:
-                self.log.write('Step %i \n' % len(self.ZPE_hist))
-
-            fitobj = self.get_fit()
-
-            ZPE, Z_mode, energies = self.get_thermo(fitobj)
-            self.ZPE_hist.append(ZPE)
-            self.Z_mode_hist.append(Z_mode)
-            self.energie_hist = energies
-            self.fitobj = fitobj
-
-        if self.settings.get('plot_mode'):
-            self.plot_potential_energy(fitobj=fitobj)
-
-        return ZPE, Z_mode, energies
+        return self.get_fit_object(
+            mode_fit_settings, NonPeriodicFit,
+            self.settings.get('gp_kernel', 'matern52'))
 
     def sample_new_point(self):
-        """What new angle to sample:
+        """Generator that chooses the new displacements to sample, and
+        yields each time a new displacement is waiting to be calculated.
+
+        What new angle to sample:
         We take the maximum angle distance between two samples scaled with
         the exponenital to the average potential energy of the two angles.
          > exp(avg(E[p0],E[p2])/kT)
 
+        For a mode with a baseline from a cheap calculator, the point is
+        instead chosen to maximize the expected reduction in the variance
+        of Z_mode over the bootstrap ensemble of the fit.
+
         """
         # Should we sample further out
-        sample_energies = np.array(self.an_mode['displacement_energies'])
-        x = self.an_mode['displacements']
+        samples = self.get_samples()
+        sample_energies = samples.energies
+        x = samples.sampled_displacements
 
         min_energy_sampling = self.kT * self.min_sample_energy_kT
 
         arg_min_x = np.argmin(sample_energies)
 
-        # Need to go out to the bounds in both directions
-        for k, direction in enumerate([1, -1]):
-            displacement_i = [i for i, xi in enumerate(x)
-                              if direction*(xi-x[arg_min_x]) > 0.]
+        # Need to go out to the bounds in both directions, unless the
+        # range is fixed by a baseline
+        directions = [] if self.has_baseline() else [1, -1]
+        for k, direction in enumerate(directions):
+            displacement_i = np.nonzero(direction*(x-x[arg_min_x]) > 0.)[0]
 
             if len(displacement_i) > 0:
                 # First we check for if we have gotten the potential defined
                 # good enough, or if we need to sample further out
-                displacement_energies = [sample_energies[i]
-                                         for i in displacement_i]
+                displacement_energies = sample_energies[displacement_i]
                 sampling_energy_span = (np.max(displacement_energies) -
                                         np.min(displacement_energies))
 
@@ -207,7 +172,7 @@ class VibAnalysis(BaseAnalysis):
 
                 # We want to sample the potential energy curve further out
 
-                boundary = np.sort([x[i] for i in displacement_i])[[-1, 0][k]]
+                boundary = np.sort(x[displacement_i])[[-1, 0][k]]
 
                 # fit with current points
                 fitobj = self.get_fit()
@@ -246,23 +211,21 @@ class VibAnalysis(BaseAnalysis):
 
                     next_displacement = res.x
 
-                self.an_mode['displacements'].append(next_displacement)
-                self.add_displacement_energy(next_displacement)
+                self.add_displacement(next_displacement)
+                yield
             else:
                 # We are in a situation where the furthest point that we
                 # sampled in this direction has the lowest energy.
                 # This could be caused by sampling an imaginary frequency
                 # mode.
-                x_arg_sort = np.argsort(x)
+                x_sorted = samples.get_sorted()[0]
                 if direction == 1:
-                    next_displacement = (
-                        2*x[x_arg_sort[-1]]-x[x_arg_sort[-2]])
+                    next_displacement = 2*x_sorted[-1]-x_sorted[-2]
                 else:
-                    next_displacement = (
-                        2*x[x_arg_sort[0]]-x[x_arg_sort[1]])
+                    next_displacement = 2*x_sorted[0]-x_sorted[1]
 
-                self.an_mode['displacements'].append(next_displacement)
-                self.add_displacement_energy(next_displacement)
+                self.add_displacement(next_displacement)
+                yield
 
         #
         # Find the next point to sample as the one that we think would
@@ -273,12 +236,17 @@ class VibAnalysis(BaseAnalysis):
         #
         fitobj = self.get_fit()
 
-        displacements = np.sort(self.an_mode['displacements'])
-        sort_args = np.argsort(self.an_mode['displacements'])
-        energies = np.array([self.an_mode['displacement_energies'][i]
-                             for i in sort_args])
+        displacements, energies = self.get_samples().get_sorted()
         energies -= np.min(energies)  # subtracting the groundstate energy
 
+        if self.use_variance_acquisition():
+            next_displacement = self.get_variance_reduction_displacement(
+                fitobj)
+
+            self.add_displacement(next_displacement)
+            yield
+            return
+
         if self.settings.get('use_scaled_spacings', 1):
             scaled_spacings = [
                 (displacements[i+1]-displacements[i])
@@ -295,54 +263,105 @@ class VibAnalysis(BaseAnalysis):
         next_displacement = (
             displacements[max_arg+1]+displacements[max_arg]) / 2.
 
-        self.an_mode['displacements'].append(next_displacement)
-        self.add_displacement_energy(next_displacement)
+        self.add_displacement(next_displacement)
+        yield
 
     def add_displacement_energy(self, displacement):
+        """Calculate the energy at a displacement and add it to the
+        mode object."""
+        start_time = time.time()
+        e, forces, positions = self.calculate_displacement(displacement)
+        self.record_calculation(
+            displacement, e, forces, positions, time.time() - start_time)
+
+    def calculate_displacement(self, displacement, reset=True):
+        """Calculate the energy with the calculator attached to the atoms
+        at the given displacement along the mode.
+
+        Args:
+            displacement (float): displacement along the mode. None gives
+                the groundstate.
+            reset (optional[bool]): Move the atoms back to the groundstate
+                afterwards.
+
+        Returns:
+            e (float): The potential energy
+            forces (numpy array or None): The forces if
+                fit_forces is set
+            positions (numpy array): The positions of the calculation
+        """
 
-        if displacement is not None:  # otherwise do a groundstate calculation
+        if displacement is not None:
             new_positions = self.get_displacement_positions(displacement)
             self.atoms.set_positions(new_positions)
-
-        if not self.an_mode.get('displacement_energies'):
-            self.an_mode['displacement_energies'] = list()
+        else:
+            self.atoms.set_positions(self.groundstate_positions)
 
         if self.use_force_consistent:
             e = self.atoms.get_potential_energy(force_consistent=True)
+        else:
+            e = self.atoms.get_potential_energy()
 
-            # For the forces, we need the projection of the forces
-            # on the normal mode of the rotation at the current angle
-            v_force = self.atoms.get_forces()[
-                self.an_mode['indices']].reshape(-1)
+        if self.fit_forces:
+            forces = self.atoms.get_forces()
+        else:
+            forces = None
 
-            f = float(np.dot(v_force, self.an_mode['mode']))
+        positions = self.atoms.get_positions()
 
-            if not self.an_mode.get('displacement_forces'):
-                self.an_mode['displacement_forces'] = [f]
-            else:
-                self.an_mode['displacement_forces'].append(f)
-        else:
-            e = self.atoms.get_potential_energy()
+        if reset:
+            self.atoms.set_positions(self.groundstate_positions)
+
+        return e, forces, positions
+
+    def get_positions_batch(self, displacements):
+        """The positions of all atoms at displacements along the mode.
+        None gives the groundstate.
+
+        Args:
+            displacements (list): The displacements along the mode
 
-        # adding to trajectory:
-        if self.traj is not None:
-            self.traj.write(self.atoms)
+        Returns:
+            Numpy array (number of displacements x number of atoms x 3)
+        """
+        steps = np.array([0. if d is None else d for d in displacements],
+                         dtype=float)
+        return self.get_displacement_positions(steps)
 
-        self.an_mode['displacement_energies'].append(e)
+    def project_positions(self, positions):
+        """The displacement along the mode closest to the positions.
 
-        self.atoms.set_positions(self.groundstate_positions)
+        Args:
+            positions (numpy array): The positions of all atoms
 
-        # save to backup file:
-        if self.an_filename:
-            self.save_to_backup()
+        Returns:
+            The displacement (float)
+        """
+        delta = (np.asarray(positions) -
+                 self.groundstate_positions)[self.an_mode['indices']]
+        mode = self.mode_xyz.ravel()
+        return np.dot(delta.ravel(), mode) / np.dot(mode, mode)
 
     def get_displacement_positions(self, stepsize):
         """
         This function is where we define how to follow the given mode
-        """
-        pos = copy(self.groundstate_positions)
-        pos[self.an_mode['indices']] += stepsize * self.mode_xyz.reshape(-1, 3)
 
+        Args:
+            stepsize (float or numpy array): The displacement along the
+                mode, or an array of displacements
+
+        Returns:
+            The positions (natoms x 3), or (number of displacements x
+                natoms x 3) for an array of displacements
+        """
+        pos = get_displaced_positions(
+            self.groundstate_positions,
+            self.an_mode['indices'],
+            np.multiply.outer(np.atleast_1d(stepsize),
+                              self.mode_xyz.reshape(-1, 3)))
+
+        if np.ndim(stepsize) == 0:
+            return pos[0]
         return pos
 
     def make_inspection_traj(self, points=10, filename=None):
@@ -358,8 +377,7 @@ class VibAnalysis(BaseAnalysis):
 
         displacements = self.get_initial_displacements(displacements=points)
 
-        for displacement in displacements:
-            new_pos = self.get_displacement_positions(displacement)
+        for new_pos in self.get_displacement_positions(displacements):
             self.atoms.set_positions(new_pos)
             traj.write(self.atoms)
             self.atoms.set_positions(old_pos)
@@ -89,7 +89,7 @@ def calculate_rot_mode(atoms, base_pos, rot_axis, branch_arr,
     # For each atom find vector and weight to rotation axis
     for i in branch_arr:
         BA = np.array(ap[i])-np.array(base_pos)
-        BA = BA - np.dot(BA, BC)
+        BA = BA - np.dot(BA, BC)*BC
         v_rot[i] = np.cross(BC, BA)
 
     v_rot = np.ravel(v_rot)
@@ -102,46 +102,33 @@ def calculate_rot_mode(atoms, base_pos, rot_axis, branch_arr,
 
 def rotatepoints(rotationcenter, rotationaxis, angle, atompos):
     """
-    Rotate some coordinates
-    See http://en.wikipedia.org/wiki/Rotation_matrix
+    Rotate some coordinates by Rodrigues' rotation formula
+        v_rot = v cos(a) + (k x v) sin(a) + k (k . v)(1 - cos(a))
+    See https://en.wikipedia.org/wiki/Rodrigues%27_rotation_formula
 
     Args:
         rotationcenter (numpy array): center for rotation
         rotationaxis (numpy array): axis to rotate around
-        angle (float): angle to rotate in radians
+        angle (float or numpy array): angle to rotate in radians, or an
+            array of angles to rotate by in one call
         atompos (numpy array): positions to rotate
+
+    Returns:
+        The rotated positions (natoms x 3), or (number of angles x
+            natoms x 3) for an array of angles
     """
-    x0 = np.matrix(rotationcenter)
-    u = np.matrix(rotationaxis)
-    ap = np.matrix(atompos)
-
-    natoms = ap.shape[0]
-    rp = np.zeros([natoms, 3])
-
-    R = np.matrix([
-        [
-            np.cos(angle)+u[0, 1]**2*(1.-np.cos(angle)),
-            u[0, 1]*u[0, 1]*(1.-np.cos(angle))-u[0, 2]*np.sin(angle),
-            u[0, 1]*u[0, 2]*(1.-np.cos(angle))+u[0, 1]*np.sin(angle)],
-        [
-            u[0, 1]*u[0, 0]*(1.-np.cos(angle))+u[0, 2]*np.sin(angle),
-            np.cos(angle)+u[0, 1]**2*(1.-np.cos(angle)),
-            u[0, 1]*u[0, 2]*(1.-np.cos(angle))-u[0, 0]*np.sin(angle)],
-        [
-            u[0, 2]*u[0, 0]*(1.-np.cos(angle))-u[0, 1]*np.sin(angle),
-            u[0, 2]*u[0, 1]*(1.-np.cos(angle))+u[0, 0]*np.sin(angle),
-            np.cos(angle)+u[0, 2]**2*(1.-np.cos(angle))]])
-
-    # Repeat center coordinate natoms rows
-    x0 = np.tile(x0, [natoms, 1])
+    k = np.asarray(rotationaxis, dtype=float)
+    k = k / np.linalg.norm(k)
 
     # Vectors from rot center for all atoms
-    ap = ap - x0
+    v = np.asarray(atompos, dtype=float) - rotationcenter
 
-    # Apply rotation transformation
-    rp = np.dot(R, ap.T)
+    # Broadcast the angles over the atoms and coordinates
+    cos = np.cos(angle)[..., None, None]
+    sin = np.sin(angle)[..., None, None]
 
-    # Adding the offset
-    rp = rp.T + x0
+    rp = (v*cos + np.cross(k, v)*sin
+          + np.outer(np.dot(v, k), k)*(1. - cos))
 
-    return rp
+    # Adding the offset
+    return rp + rotationcenter
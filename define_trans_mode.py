@@ -33,3 +33,47 @@ def get_trans_dict(from_atom_to_atom, vib):
     }
 
     return trans_mode_dict
+
+
+def get_surface_trans_dict(from_atom_to_atoms, vib, symnumber=1):
+    """Get the cell and the tangents of a two dimensional translational
+    mode on a surface.
+
+    The translating atoms move in the surface cell spanned by
+    a1 = pos[#2] - pos[#1] and a2 = pos[#3] - pos[#1]. The groundstate
+    is taken as the site the symmetry rotations are made about.
+    """
+    indices = vib.indices
+    atoms = vib.atoms
+    positions = atoms.get_positions()
+    masses = atoms.get_masses()
+
+    cell_vectors = np.array([
+        positions[from_atom_to_atoms[1]] - positions[from_atom_to_atoms[0]],
+        positions[from_atom_to_atoms[2]] - positions[from_atom_to_atoms[0]]])
+
+    tangents = []
+    for delta in cell_vectors:
+        mode_tangent = np.hstack([delta for i in range(len(indices))])
+        mode_tangent *= 1./np.sqrt(np.sum(mode_tangent**2))
+        tangents.append(mode_tangent)
+
+    # Convert to mass weighted coordinates
+    tangents_mass_weighted = [
+        to_massweight_coor(mode_tangent, atoms, indices=indices)
+        for mode_tangent in tangents]
+
+    trans_mode_dict = {
+        "type": 'translation_2d',
+        "from_atom_to_atoms": from_atom_to_atoms,
+        "indices": indices,
+        "symnumber": symnumber,
+        "cell_vectors": cell_vectors,
+        "mass": float(np.sum(masses[indices])),
+        "mode_tangent": tangents[0],
+        "mode_tangent_2": tangents[1],
+        "mode_tangent_mass_weighted": tangents_mass_weighted[0],
+        "mode_tangent_mass_weighted_2": tangents_mass_weighted[1],
+    }
+
+    return trans_mode_dict
@@ -5,6 +5,7 @@ and the Romberg integration correction.
 from __future__ import print_function
 
 import numpy as np
+from scipy.linalg import eigvals_banded
 
 
 lapjj = [
@@ -225,6 +226,42 @@ def FDsolver(
     Returns:
         eigenvalue spectrum (numpy array)
     """
+    H = FDhamiltonian(
+        xmin, xmax, n, fval, Hcoeff,
+        correction=correction,
+        neighbors=neighbors)
+
+    if not correction:
+        # H symmetric, eigenvalues are real
+        eigenvaluesrough = np.linalg.eigvalsh(H)
+        eigenvalues = np.sort(eigenvaluesrough)
+    else:
+        # H not symmetric -> eigenvalues could have imaginary component,
+        # careful here..
+        eigenvaluesrough = np.linalg.eigvals(H)
+        eigenvalues = np.sort(np.abs(eigenvaluesrough))
+
+    return eigenvalues
+
+
+def FDhamiltonian(
+        xmin, xmax, n, fval, Hcoeff,
+        correction=False,
+        neighbors=2):
+    """Build the FD hamiltonian used by FDsolver
+
+    Args:
+        xmin (float): lower end of domain
+        xmax(float): upper end of domain
+        n (int): number of points
+        fval (object): function for 'RHS'
+        Hcoeff (float):coefficient to multiply the FD matrix with
+        correction (bool): use the modified boundary stencil
+        neighbours -- order of FD solver
+
+    Returns:
+        H (numpy array): the n x n hamiltonian matrix
+    """
     # Insure tha the bounds are properly defined
     assert xmax > xmin
 
@@ -238,6 +275,38 @@ def FDsolver(
         x0[i] = xmin + i*h
         potential[i] = fval(x0[i])
 
+    H = FDkinetic(
+        xmin, xmax, n, Hcoeff,
+        correction=correction,
+        neighbors=neighbors)
+
+    # Adding the potential
+    H += np.diag(potential)
+
+    return H
+
+
+def FDkinetic(
+        xmin, xmax, n, Hcoeff,
+        correction=False,
+        neighbors=2):
+    """Build the kinetic part of the FD hamiltonian, i.e. the FD stencil
+    of -1/2*LAPLACIAN multiplied by Hcoeff.
+
+    Args:
+        xmin (float): lower end of domain
+        xmax(float): upper end of domain
+        n (int): number of points
+        Hcoeff (float):coefficient to multiply the FD matrix with
+        correction (bool): use the modified boundary stencil
+        neighbours -- order of FD solver
+
+    Returns:
+        H (numpy array): the n x n kinetic matrix
+    """
+    # Distance between grid points
+    h = (xmax-xmin)/(n - 1.0)
+
     # Initialization of Main Matrix
     H = np.zeros((n, n))
     for i, c in enumerate(lapbli[neighbors]):
@@ -264,20 +333,188 @@ def FDsolver(
     # Standard is units._hbar**2/(2*units._amu*modemass*1e-20*units._e)
     H *= Hcoeff
 
-    # Adding the potential
-    H += np.diag(potential)
+    return H
 
-    if not correction:
-        # H symmetric, eigenvalues are real
-        eigenvaluesrough = np.linalg.eigvalsh(H)
-        eigenvalues = np.sort(eigenvaluesrough)
-    else:
-        # H not symmetric -> eigenvalues could have imaginary component,
-        # careful here..
-        eigenvaluesrough = np.linalg.eigvals(H)
-        eigenvalues = np.sort(np.abs(eigenvaluesrough))
 
-    return eigenvalues
+def energy_spectra(
+        xmin, xmax,
+        fval_samples, Hcoeff,
+        mode='fast',
+        neighbors=None,
+        minimalgrid=None):
+    """Calculate the energy spectra of a batch of potentials
+
+    The potentials share the domain and the kinetic part of the
+    hamiltonian, which is therefore only built once. The FD hamiltonian
+    is banded, so the banded eigenvalue solver is used, which is much
+    faster than the dense solver in FDsolver.
+
+    Args:
+        xmin (float): lower end of domain
+        xmax (float): upper end of domain
+        fval_samples (object): function that takes the grid points and
+            returns the potentials on the grid (n_potentials x n)
+        Hcoeff (float): coefficient to multiply the FD matrix with
+        mode (str): 'fast' or 'accurate', see energy_spectrum
+        neighbours -- order of FD solver
+        minimalgrid (int): number of points in grid
+
+    Returns:
+        eigenvalue spectra (numpy array: n_potentials x n)
+    """
+    modes = {
+        'fast': {'minimalgrid': 1024, 'neighbors': 6},
+        'accurate': {'minimalgrid': 2048, 'neighbors': 6},
+    }
+    assert mode in modes.keys()
+
+    if minimalgrid is None:
+        minimalgrid = modes[mode]['minimalgrid']
+    if neighbors is None:
+        neighbors = modes[mode]['neighbors']
+
+    x = np.linspace(xmin, xmax, minimalgrid)
+    potentials = np.atleast_2d(fval_samples(x))
+
+    # Lower banded storage of the kinetic matrix
+    H = FDkinetic(xmin, xmax, minimalgrid, Hcoeff, neighbors=neighbors)
+    H_banded = np.zeros((neighbors+1, minimalgrid))
+    for i in range(neighbors+1):
+        H_banded[i, :minimalgrid-i] = np.diagonal(H, -i)
+
+    spectra = np.zeros((len(potentials), minimalgrid))
+    for i, potential in enumerate(potentials):
+        H_banded_i = H_banded.copy()
+        H_banded_i[0] += potential
+        spectra[i] = eigvals_banded(H_banded_i, lower=True)
+
+    return spectra
+
+
+def energy_spectrum_2d(fourier_coefficients, cell_vectors, Hcoeff, Ecut,
+                       nmax=None, max_nmax=40):
+    """Low lying energy levels of a particle moving in a potential that is
+    periodic in a surface unit cell.
+
+    The hamiltonian is set up in a basis of plane waves
+    exp(i G.r) with G = p b1 + q b2 and |p|, |q| <= nmax. The kinetic
+    energy is diagonal, Hcoeff*|G|**2, and the potential couples plane
+    waves differing by one of its Fourier components, so the hamiltonian
+    is sparse. Only the levels up to Ecut above the lowest level are
+    found, with the shift-invert Lanczos solver of scipy.
+
+    Args:
+        fourier_coefficients (dict): c_mn of the potential
+            V(u, v) = sum_mn c_mn exp(2 pi i (m u + n v)) with (m, n)
+            as keys, e.g. from Periodic2DFit.get_fourier_coefficients.
+        cell_vectors (numpy array): a1 and a2 of the cell (2x3)
+        Hcoeff (float): hbar**2/(2 mass) in eV*Angstrom**2
+        Ecut (float): The levels up to Ecut above the lowest level are
+            returned, and at least three levels
+        nmax (optional[int]): Size of the plane wave basis. By default
+            the kinetic energy of the largest plane waves along the
+            shortest reciprocal vector is four times the corrugation of
+            the potential plus Ecut.
+        max_nmax (optional[int]): Upper limit for the default nmax
+
+    Returns:
+        The energy levels (numpy array) in increasing order
+    """
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.linalg import eigsh
+
+    from fit_periodic2d import get_reciprocal_vectors
+
+    B = get_reciprocal_vectors(cell_vectors)
+
+    # The corrugation of the potential on a grid in the cell
+    u = np.linspace(0., 1., 24, endpoint=False)
+    U, V = np.meshgrid(u, u, indexing='ij')
+    potential = np.zeros_like(U)
+    for (m, n), c in fourier_coefficients.items():
+        potential += np.real(c*np.exp(2j*np.pi*(m*U + n*V)))
+    Vmin = np.min(potential)
+
+    if nmax is None:
+        Gmax = np.sqrt(4.*(np.max(potential) - Vmin + Ecut)/Hcoeff)
+        nmax = int(np.ceil(Gmax/np.min(np.linalg.norm(B, axis=1))))
+        nmax = min(max(nmax, 2), max_nmax)
+
+    pq = np.array([(p, q) for p in range(-nmax, nmax+1)
+                   for q in range(-nmax, nmax+1)])
+    index = dict(((p, q), i) for i, (p, q) in enumerate(pq))
+    N = len(pq)
+
+    rows = list(range(N))
+    cols = list(range(N))
+    values = list(Hcoeff*np.sum(np.dot(pq, B)**2, axis=1) +
+                np.real(fourier_coefficients.get((0, 0), 0.)))
+
+    for (m, n), c in fourier_coefficients.items():
+        if (m, n) == (0, 0) or abs(c) == 0.:
+            continue
+        for i, (p, q) in enumerate(pq):
+            j = index.get((p - m, q - n))
+            if j is not None:
+                rows.append(i)
+                cols.append(j)
+                values.append(c)
+
+    H = coo_matrix((values, (rows, cols)), shape=(N, N)).tocsc()
+
+    # Increase the number of levels until Ecut is reached
+    k = min(16, N - 2)
+    while True:
+        if k >= N - 2:
+            energies = np.linalg.eigvalsh(H.toarray())
+            break
+
+        energies = np.sort(eigsh(
+            H, k=k, sigma=Vmin - 1e-3, which='LM',
+            return_eigenvectors=False))
+        if energies[-1] - energies[0] > Ecut:
+            break
+        k = min(2*k, N - 2)
+
+    # At least three levels, as for energy_spectrum, so the first
+    # excitation is known at low temperatures
+    n = max(3, np.count_nonzero(energies - energies[0] <= Ecut))
+    return energies[:n]
+
+
+def thermal_density(xmin, xmax, fval, Hcoeff, kT, n=256, neighbors=6):
+    """Thermal probability density of the particle on the FD grid
+
+    The density is the Boltzmann weighted sum of the squared eigenstates,
+        rho(x) = sum_n exp(-(E_n-E_0)/kT) |psi_n(x)|^2 / Z
+    By first order perturbation theory, changing the potential by dV(x)
+    changes the partition function by
+        dln(Z) = -sum_x rho(x) dV(x) / kT
+    which in the low temperature limit is the change of the ZPE.
+
+    Args:
+        xmin (float): lower end of domain
+        xmax (float): upper end of domain
+        fval (object): function for right hand side (RHS)
+        Hcoeff (float): coefficient to multiply the FD matrix with
+        kT (float): thermal energy in eV
+        n (int): number of grid points
+        neighbors (int): order of FD solver
+
+    Returns:
+        x (numpy array): The grid points
+        rho (numpy array): The thermal density on the grid, normalized
+            so that it sums to one.
+    """
+    x = np.linspace(xmin, xmax, n)
+    H = FDhamiltonian(xmin, xmax, n, fval, Hcoeff, neighbors=neighbors)
+    eigenvalues, eigenvectors = np.linalg.eigh(H)
+
+    weights = np.exp(-(eigenvalues-eigenvalues[0])/kT)
+    rho = np.dot(eigenvectors**2, weights)
+    rho /= np.sum(rho)
+
+    return x, rho
 
 
 def ConvergenceExponent(new, newer, newest, increment):
@@ -27,6 +27,8 @@ class BaseFit:
     -----------
     settings        -- All external tweakable settings
     coeffs          -- Vector with best fit ceofficients for current basis
+    coeffs_samples  -- Bootstrap ensemble of coefficients at the optimal
+                       regularization (Ns x order)
     xvals           -- Original input coordinates for fitting (sorted)
     yvals           -- The measured function values at input coordinates
     yders           -- The derivates of function values at input coordinates
@@ -39,6 +41,7 @@ class BaseFit:
     def __init__(self, settings):
         self.settings = settings
         self.coeffs = []
+        self.coeffs_samples = []
         self.cleardata()
         self.basisfunction = self.undefinedbasisfunc
         self.order = -1
@@ -119,14 +122,18 @@ class BaseFit:
         # Setting up ydata
         y = self.scale_measureddata(self.yvals, self.yders)
 
-        # Setting up design matrix
-        X = self.xvalsinbasis(self.xvals, self.yders)
+        # Setting up design matrix, with the derivative rows weighted
+        # as the measured derivatives
+        X = self.scale_basismatrix(self.xvalsinbasis(self.xvals, self.yders))
 
         # zero prior
         p = np.zeros(self.order)
 
-        # Finding the optimal omega2 (regularzation parameter)
-        opt_omega2 = find_optimal_regularization(X, y, p)
+        # Finding the optimal omega2 (regularzation parameter) and keeping
+        # the bootstrap ensemble of the fit at that omega2. A value and
+        # its derivative are resampled together.
+        opt_omega2, coeffs_samples = find_optimal_regularization(
+            X, y, p, return_coefs_samples=True, npoints=len(self.xvals))
 
         # Finding the optimal solution
         a0, neff = RR(X, y, p, opt_omega2)
@@ -140,10 +147,27 @@ class BaseFit:
             print("omega2 opt : %.3e" % opt_omega2)
 
         self.coeffs = a0
+        self.coeffs_samples = coeffs_samples
+
+    def get_derivative_weight(self):
+        """ The weight of the derivatives relative to the function values.
+        If settings['derivateive_weight'] is None the mean spacing of the
+        input coordinates is used, which makes a weighted derivative
+        comparable to the change of the function between two points
+        independent of the units of the coordinates. With a single point
+        there is no spacing and the weight is 1.
+        """
+        weight = self.settings.get('derivateive_weight')
+        if weight is None:
+            if len(self.xvals) < 2:
+                return 1.
+            weight = ((np.max(self.xvals) - np.min(self.xvals)) /
+                      (len(self.xvals) - 1))
+        return weight
 
     def scale_basismatrix(self, basismatrix):
         """ Scaling the row corresponding to derivatives """
-        weight = self.settings['derivateive_weight']
+        weight = self.get_derivative_weight()
         rowstart = len(self.xvals)
         basismatrix[rowstart:, :] = np.multiply(
             basismatrix[rowstart:, :], weight)
@@ -153,7 +177,7 @@ class BaseFit:
         """ Scaling the derivatives of the function
         to have more or less impact on the fitting procedure
         """
-        weight = self.settings['derivateive_weight']
+        weight = self.get_derivative_weight()
         yders_scaled = np.multiply(yders, weight)
         return np.concatenate((yvals, yders_scaled))
 
@@ -174,6 +198,39 @@ class BaseFit:
                 y[i] = np.dot(b, self.coeffs)
         return y
 
+    def fval_samples(self, x):
+        """ Returns the function values of every bootstrap fit in the
+        ensemble at the points x
+
+        Args:
+            x (numpy array): points to evaluate the ensemble at
+
+        Returns:
+            Numpy array with shape (number of samples, len(x))
+        """
+        B = np.array([self.basisval(xi, 0) for xi in np.atleast_1d(x)])
+        return np.dot(self.coeffs_samples, B.T)
+
+    def fval_covariance(self, x1, x2):
+        """ Returns the covariance of the function values at the points
+        x1 and x2 over the bootstrap ensemble
+
+        Returns:
+            Numpy array with shape (len(x1), len(x2))
+        """
+        V1 = self.fval_samples(x1)
+        V2 = self.fval_samples(x2)
+        V1 = V1 - np.mean(V1, axis=0)
+        V2 = V2 - np.mean(V2, axis=0)
+        return np.dot(V1.T, V2) / (len(V1) - 1)
+
+    def get_dof(self):
+        """ Returns the number of unique data points in excess of the
+        fitting coefficients. The bootstrap ensemble can only be
+        trusted if the fit is not a pure interpolation of the data.
+        """
+        return len(np.unique(self.xvals)) - self.order
+
     def basisval(self, x, ndiff):
         """ Returns the vector of x in current basis """
         return self.basisfunction(x, ndiff)
@@ -0,0 +1,44 @@
+import numpy as np
+
+
+class DeltaFit:
+    """
+    Introduction:
+    -------------
+    Potential given by a fixed baseline and a fitted correction,
+        V(x) = baseline(x) + delta(x)
+    e.g. a dense fit of a cheap calculator corrected by a fit of the
+    difference to an expensive calculator at a few points.
+
+    The baseline is taken as exact, so the uncertainty of the potential
+    is the uncertainty of the delta fit.
+
+    Attributes:
+    -----------
+    baseline        -- Fitted object (with fval) of the baseline potential
+    delta           -- Fitted object of the correction
+    """
+
+    def __init__(self, baseline, delta):
+        self.baseline = baseline
+        self.delta = delta
+        self.order = delta.order
+        self.coeffs_samples = delta.coeffs_samples
+
+    def fval(self, x):
+        """ Returns the value of the potential at a point or list of
+        points """
+        return self.baseline.fval(x) + self.delta.fval(x)
+
+    def fval_samples(self, x):
+        """ Returns the potential of every member of the ensemble of the
+        delta fit, shape (number of samples, len(x)) """
+        return (self.baseline.fval(np.atleast_1d(x))[None, :]
+                + self.delta.fval_samples(x))
+
+    def fval_covariance(self, x1, x2):
+        """ Returns the covariance of the potential at x1 and x2 """
+        return self.delta.fval_covariance(x1, x2)
+
+    def get_dof(self):
+        return self.delta.get_dof()
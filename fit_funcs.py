@@ -2,7 +2,8 @@ import numpy as np
 # np.seterr(all='raise')
 
 
-def find_optimal_regularization(X, Y, p, Ns=100):
+def find_optimal_regularization(X, Y, p, Ns=100, return_coefs_samples=False,
+                                npoints=None):
     """
     To find optimal omega2=w value for the fitting.
     This means go over a range of w2 values,
@@ -23,6 +24,11 @@ def find_optimal_regularization(X, Y, p, Ns=100):
     Y : target vector
     p : prior function
     Ns : number of boostrap samples to use
+    return_coefs_samples : also return the bootstrap coefficient
+        ensemble (Ns x order) found at the optimal omega2
+    npoints : number of sampled points if the rows of X hold several
+        observations per point (value and derivative). The bootstrap
+        then resamples whole points with all their rows.
 
     """
 
@@ -30,6 +36,7 @@ def find_optimal_regularization(X, Y, p, Ns=100):
     omega2_min = float('inf')
     omega2_list = []
     epe_list = []
+    coefs_samples_list = []
 
     # Tries to find the best value by successively
     # reducing seach area for the omega2 value
@@ -49,17 +56,21 @@ def find_optimal_regularization(X, Y, p, Ns=100):
         omega2_range = [np.exp(pp) for pp in np.linspace(
             wlow, whigh, wsteps)]
 
-        BS_res = bootstrap_master(X, Y, p, omega2_range, Ns)
-        _, _, epe_list_i, _ = BS_res
+        BS_res = bootstrap_master(X, Y, p, omega2_range, Ns, npoints)
+        _, _, epe_list_i, coefs_samples_i = BS_res
 
         omega2_list += omega2_range
         epe_list += epe_list_i.tolist()
+        coefs_samples_list += np.split(coefs_samples_i, len(omega2_range))
 
         omega2_min = omega2_list[np.argmin(epe_list)]
         # Update search range
         logmin_epe = np.log(omega2_min)
         wlow = logmin_epe - basesearchwidth/(refinespeed**iref)
         whigh = logmin_epe + basesearchwidth/(refinespeed**iref)
+
+    if return_coefs_samples:
+        return omega2_min, coefs_samples_list[np.argmin(epe_list)]
     return omega2_min
 
 
@@ -180,9 +191,9 @@ def LOOCV(X, Y, p, omega2, W2=None, Vh=None):
     return np.sqrt(LOOCV_EPE)
 
 
-def bootstrap_master(X, Y, p, omega2_l, Ns=200):
+def bootstrap_master(X, Y, p, omega2_l, Ns=200, npoints=None):
     assert len(np.shape(omega2_l)) == 1
-    samples = get_bootstrap_samples(len(Y), Ns)
+    samples = get_bootstrap_samples(len(Y), Ns, npoints=npoints)
     assert len(np.shape(samples)) == 2
 
     # Make full SVD on all samples one time for all
@@ -190,7 +201,7 @@ def bootstrap_master(X, Y, p, omega2_l, Ns=200):
     W2_samples, Vh_samples = get_samples_svd(X, samples)
     for i, omega2 in enumerate(omega2_l):
         res = bootstrap_calc(
-            X, Y, p, omega2, samples,
+            X, Y, p, omega2, samples, npoints=npoints,
             X2_W=X2_W, X2_Vh=X2_Vh,
             W2_samples=W2_samples, Vh_samples=Vh_samples
         )
@@ -213,17 +224,26 @@ def bootstrap_master(X, Y, p, omega2_l, Ns=200):
     return err_l, ERR_l, EPE_l, coefs_samples_l
 
 
-def get_bootstrap_samples(Nd, Ns=100, seed=15):
+def get_bootstrap_samples(Nd, Ns=100, seed=15, npoints=None):
     """
     Nd : number of datapoints
     Ns : number of bootstrap samples
+    npoints : number of points, when the Nd datapoints are Nd/npoints
+        blocks of observations of the same points. Row i belongs to
+        point i % npoints and the rows of a point are drawn together.
     """
     np.random.seed(seed)
-    return np.random.random_integers(0, Nd-1, (Ns, Nd))
+    if npoints is None or npoints == Nd:
+        return np.random.random_integers(0, Nd-1, (Ns, Nd))
+
+    assert Nd % npoints == 0
+    point_samples = np.random.random_integers(0, npoints-1, (Ns, npoints))
+    return np.hstack([point_samples + block*npoints
+                      for block in range(Nd//npoints)])
 
 
 def bootstrap_calc(
-        X, Y, p, omega2, samples,
+        X, Y, p, omega2, samples, npoints=None,
         X2_W=None, X2_Vh=None,
         W2_samples=None, Vh_samples=None):
 
@@ -234,7 +254,11 @@ def bootstrap_calc(
         W2_samples, Vh_samples = get_samples_svd(X, samples)
 
     coefs = RR_preSVD(X, Y, p, omega2, X2_W, X2_Vh)
-    err = np.sum((np.dot(X, coefs.T)-Y)**2/len(Y))
+    # The prediction error is measured on the function values
+    if npoints is None:
+        npoints = len(Y)
+
+    err = np.sum((np.dot(X[:npoints], coefs.T)-Y[:npoints])**2/npoints)
 
     error_samples = []
 
@@ -246,7 +270,7 @@ def bootstrap_calc(
         a_si = RR_preSVD(X_si, Y_si, p, omega2, W2_si, Vh_si)
 
         # return a_si, X_si, Y_si, omega2, p
-        error = np.dot(X, a_si.T) - Y
+        error = np.dot(X[:npoints], a_si.T) - Y[:npoints]
 
         if i == 0:
             a_samples = a_si
@@ -255,7 +279,7 @@ def bootstrap_calc(
             a_samples = np.vstack((a_samples, a_si))
             error_samples = np.vstack((error_samples, error))
 
-    ERR = bootstrap_ERR(error_samples, samples)
+    ERR = bootstrap_ERR(error_samples, samples[:, :npoints])
     EPE = np.sqrt(0.368*err + 0.632*ERR)
 
     return err, ERR, EPE, a_samples
@@ -0,0 +1,265 @@
+import numpy as np
+from scipy.special import ive
+
+from fit_base import BaseFit
+
+
+class GPFit(BaseFit):
+    """
+    Introduction:
+    -------------
+    Gaussian process regression of the potential energy of a mode.
+
+    The kernel is represented by a finite basis with a diagonal prior,
+    k(x, x') = sum_j lambda_j phi_j(x) phi_j(x'), so the posterior is a
+    normal distribution of the coefficients and plugs into the BaseFit
+    interface: coeffs is the posterior mean and coeffs_samples are
+    draws from the posterior instead of a bootstrap ensemble.
+
+    Kernels (settings['kernel']):
+        periodic  -- exp(-2 sin(pi r/period)**2/l**2), whose Fourier
+                     series is exact in the basis of cos and sin
+        rbf       -- squared exponential
+        matern52  -- Matern with nu=5/2
+    The non periodic kernels use the eigenfunctions of the Laplacian on
+    an interval enclosing the data (Solin and Sarkka, Stat Comput 2020)
+    and a quadratic mean with a broad prior for the well of a vibration.
+
+    The length scale and the signal variance are chosen by maximizing
+    the marginal likelihood on a grid. Derivative observations enter
+    as rows with the derivative of the basis.
+
+    Attributes:
+    -----------
+    lambdas         -- Prior variances of the basis coefficients
+    coeffs_cov      -- Posterior covariance of the coefficients
+    lengthscale     -- The optimal length scale
+    ymean           -- Constant mean of the process
+    mean_variance   -- Prior variance of the quadratic mean coefficients
+    """
+
+    def __init__(self, settings):
+        if settings['verbose']:
+            print('Initialize Gaussian process fit...'),
+        super(GPFit, self).__init__(settings)
+        self.settings['basistype'] = 'gaussian_process'
+        self.basisfunction = self.gpbasefunc
+        self.lambdas = None
+        self.coeffs_cov = None
+        self.lengthscale = None
+        self.ymean = 0.
+        self.mean_variance = 1.
+        self.center = 0.
+        self.halfwidth = 1.
+        if settings['verbose']:
+            print('[DONE]')
+
+    def is_periodic(self):
+        return self.settings.get('kernel', 'matern52') == 'periodic'
+
+    def gpbasefunc(self, x, ndiff):
+        """ Returns the basis functions of the kernel at x, or their
+        ndiff'th derivative """
+        if self.is_periodic():
+            return self.fourierbasis(x, ndiff)
+        return self.laplacebasis(x, ndiff)
+
+    def fourierbasis(self, x, ndiff):
+        """ [1, cos(k_1 x), sin(k_1 x), cos(k_2 x), ...] with
+        k_n = 2 pi n/period """
+        n = np.arange(1, (self.order-1)//2 + 1)
+        k = 2*np.pi*n / self.settings['period']
+
+        row = np.zeros(self.order)
+        if ndiff == 0:
+            row[0] = 1.
+        row[1::2] = k**ndiff * np.cos(k*x + ndiff*np.pi/2.)
+        row[2::2] = k**ndiff * np.sin(k*x + ndiff*np.pi/2.)
+        return row
+
+    def laplacebasis(self, x, ndiff):
+        """ sin(k_j (x-center+halfwidth))/sqrt(halfwidth) with
+        k_j = pi j/(2 halfwidth), which vanish at the ends of the
+        interval enclosing the data, followed by the quadratic mean
+        [1, u, u**2] with u = (x-center)/halfwidth """
+        k = self.get_wavenumbers()
+        row = np.zeros(self.order)
+        row[:len(k)] = (k**ndiff * np.sin(
+            k*(x - self.center + self.halfwidth) + ndiff*np.pi/2.)
+            / np.sqrt(self.halfwidth))
+
+        u = (x - self.center) / self.halfwidth
+        mean_row = [[1., u, u**2], [0., 1., 2*u], [0., 0., 2.]]
+        if ndiff < 3:
+            row[len(k):] = (np.array(mean_row[ndiff])
+                            / self.halfwidth**ndiff)
+        return row
+
+    def get_wavenumbers(self):
+        if self.is_periodic():
+            n = np.arange(1, (self.order-1)//2 + 1)
+            return 2*np.pi*n / self.settings['period']
+        return np.pi*np.arange(1, self.order-2) / (2.*self.halfwidth)
+
+    def get_prior_variances(self, lengthscale, signal_variance):
+        """ Prior variance of each coefficient
+
+        Args:
+            lengthscale (float): Length scale of the kernel. Relative to
+                the period for the periodic kernel.
+            signal_variance (float): Variance of the kernel
+
+        Returns:
+            lambdas (numpy array): Prior variances in the order of the basis
+        """
+        kernel = self.settings.get('kernel', 'matern52')
+        k = self.get_wavenumbers()
+
+        if kernel == 'periodic':
+            z = 1./lengthscale**2
+            n = np.arange(1, len(k)+1)
+            lambdas = np.zeros(self.order)
+            lambdas[0] = ive(0, z)
+            lambdas[1::2] = 2*ive(n, z)
+            lambdas[2::2] = 2*ive(n, z)
+        elif kernel == 'rbf':
+            lambdas = (np.sqrt(2*np.pi) * lengthscale
+                       * np.exp(-0.5*(lengthscale*k)**2))
+        elif kernel == 'matern52':
+            lambdas = (16./3 * 5**2.5 / lengthscale**5
+                       * (5./lengthscale**2 + k**2)**-3)
+        else:
+            raise ValueError('Unknown kernel %s' % kernel)
+
+        lambdas = signal_variance * lambdas
+
+        if not self.is_periodic():
+            # broad prior of the quadratic mean
+            lambdas = np.hstack((lambdas, np.ones(3) * self.mean_variance))
+
+        return lambdas
+
+    def get_lengthscales(self):
+        """ The length scales searched by the marginal likelihood """
+        if self.is_periodic():
+            return np.logspace(-1.3, 0.7, 21)
+        return 2*self.halfwidth * np.logspace(-1.5, 0.3, 21)
+
+    def setpersistentbasis(self):
+        """ Sets the interval and number of basis functions """
+        self.order = self.getorder(len(self.xvals))
+        if not self.is_periodic():
+            xmin, xmax = np.min(self.xvals), np.max(self.xvals)
+            self.center = 0.5*(xmin + xmax)
+            self.halfwidth = (0.5*(xmax - xmin)
+                              * self.settings.get('gp_boundary_factor', 1.5))
+
+    def getorder(self, N):
+        """ The number of basis functions is fixed by
+        settings['gp_nbasis'] and not by the number of data points """
+        nbasis = self.settings.get('gp_nbasis', 41)
+        if self.is_periodic():
+            # constant and a cos and sin for each frequency
+            return nbasis + 1 - nbasis % 2
+        # and the quadratic mean
+        return nbasis + 3
+
+    def get_noise(self):
+        """ Noise variance of each observation """
+        noise = np.ones(len(self.xvals)) * self.settings.get(
+            'gp_noise', 1e-4)**2
+        if len(self.yders) > 0:
+            force_noise = self.settings.get('gp_force_noise', 1e-3)
+            noise = np.hstack(
+                (noise, np.ones(len(self.yders)) * force_noise**2))
+        return noise
+
+    def log_marginal_likelihood(self, X, y, noise, lambdas):
+        """ ln p(y) for y ~ N(0, X diag(lambdas) X^T + diag(noise)) """
+        K = np.dot(X * lambdas, X.T) + np.diag(noise)
+        try:
+            L = np.linalg.cholesky(K)
+        except np.linalg.LinAlgError:
+            return -np.inf
+        alpha = np.linalg.solve(L, y)
+        return (-0.5*np.dot(alpha, alpha) - np.sum(np.log(np.diag(L)))
+                - 0.5*len(y)*np.log(2*np.pi))
+
+    def run(self):
+        """ Condition the Gaussian process on the data.
+
+        The posterior of the coefficients is
+            coeffs = Lambda X^T K^-1 y
+            coeffs_cov = Lambda - Lambda X^T K^-1 X Lambda
+        with K = X Lambda X^T + noise, which is stable also when the
+        prior variances of the high frequencies vanish.
+        """
+
+        # require more than 3 points
+        assert len(self.xvals) > 3
+
+        X = self.xvalsinbasis(self.xvals, self.yders)
+
+        self.ymean = np.mean(self.yvals)
+        y = np.concatenate((np.asarray(self.yvals) - self.ymean,
+                            np.asarray(self.yders, dtype=float)))
+        noise = self.get_noise()
+
+        # Signal variance relative to the spread of the data
+        yscale = max(np.var(self.yvals), np.max(noise))
+        signal_variances = yscale * np.logspace(-3, 3, 25)
+        self.mean_variance = 1e4 * yscale
+
+        best = (-np.inf, None, None)
+        for lengthscale in self.get_lengthscales():
+            for signal_variance in signal_variances:
+                lml = self.log_marginal_likelihood(
+                    X, y, noise, self.get_prior_variances(
+                        lengthscale, signal_variance))
+                if lml > best[0]:
+                    best = (lml, lengthscale, signal_variance)
+
+        lml, self.lengthscale, signal_variance = best
+        self.lambdas = self.get_prior_variances(
+            self.lengthscale, signal_variance)
+
+        XL = X * self.lambdas
+        K = np.dot(XL, X.T) + np.diag(noise)
+        L = np.linalg.cholesky(K)
+        V = np.linalg.solve(L, XL)
+
+        self.coeffs = np.dot(V.T, np.linalg.solve(L, y))
+        self.coeffs_cov = np.diag(self.lambdas) - np.dot(V.T, V)
+
+        # Draws from the posterior for the ensemble based uncertainties
+        w, U = np.linalg.eigh(self.coeffs_cov)
+        sqrt_cov = U * np.sqrt(np.clip(w, 0., None))
+        rng = np.random.RandomState(self.settings.get('gp_seed', 15))
+        z = rng.standard_normal((self.settings.get('gp_nsamples', 100),
+                                 self.order))
+        self.coeffs_samples = self.coeffs + np.dot(z, sqrt_cov.T)
+
+        if self.settings['verbose']:
+            print("Length scale : %.3e" % self.lengthscale)
+            print("Signal variance : %.3e" % signal_variance)
+            print("ln marginal likelihood : %.3f" % lml)
+
+    def fval(self, x):
+        """ Returns the posterior mean at a point or list of points """
+        return super(GPFit, self).fval(x) + self.ymean
+
+    def fval_samples(self, x):
+        """ Returns the function values of the posterior draws at the
+        points x, shape (number of samples, len(x)) """
+        return super(GPFit, self).fval_samples(x) + self.ymean
+
+    def fval_covariance(self, x1, x2):
+        """ Posterior covariance of the function values at x1 and x2 """
+        B1 = np.array([self.basisval(xi, 0) for xi in np.atleast_1d(x1)])
+        B2 = np.array([self.basisval(xi, 0) for xi in np.atleast_1d(x2)])
+        return np.dot(B1, np.dot(self.coeffs_cov, B2.T))
+
+    def get_dof(self):
+        """ The posterior is well defined for any number of points, so
+        all unique data points count as degrees of freedom """
+        return len(np.unique(self.xvals))
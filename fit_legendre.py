@@ -80,7 +80,7 @@ def getxpolyvec(xval, ndiff, order):
             xpoly[ndiff] *= diffcoeff
             for i in range(ndiff+1, order):
                 diffcoeff *= i
-                diffcoeff /= (i-ndiff+1)
+                diffcoeff /= (i-ndiff)
                 xpoly[i] *= diffcoeff
     return xpoly
 
@@ -0,0 +1,130 @@
+import numpy as np
+
+from fit_base import BaseFit
+
+
+class Periodic2DFit(BaseFit):
+    """
+    Introduction:
+    -------------
+    Fit for a function that is periodic in the two fractional
+    coordinates (u, v) of a surface unit cell. The basis functions are
+    plane waves cos and sin of 2 pi (m u + n v), which makes the Fourier
+    coefficients of the fit directly available to a plane wave solver.
+
+    The smoothness is handled as in PeriodicFit: the basis functions are
+    scaled by 1/|G|**pdiff with G = m b1 + n b2 the reciprocal lattice
+    vector of the cell given by settings['cell_vectors'].
+
+    Attributes:
+    -----------
+    frequencies     -- The (m, n) of the cos and sin pairs of the basis
+    Gnorms          -- The length of the reciprocal lattice vectors
+                       in 1/Angstrom
+    """
+
+    def __init__(self, settings):
+        if settings['verbose']:
+            print('Initialize Periodic 2D fit...'),
+
+        super(Periodic2DFit, self).__init__(settings)
+        self.settings['basistype'] = 'plane_waves'
+        self.basisfunction = self.planewavebasefunc
+        self.frequencies = np.zeros((0, 2), dtype=int)
+        self.Gnorms = np.zeros(0)
+
+        if settings['verbose']:
+            print('[DONE]')
+
+    def planewavebasefunc(self, point, ndiff):
+        """ The basis functions at a point (u, v)
+        [1, cos(2 pi (m_1 u + n_1 v)), sin(2 pi (m_1 u + n_1 v)), ...]
+        Only ndiff=0 is supported. """
+        assert ndiff == 0, 'No derivatives of the 2D fit'
+
+        theta = 2*np.pi*np.dot(self.frequencies, point)
+        scale = self.Gnorms**(-self.settings['pdiff'])
+
+        row = np.zeros(self.order)
+        row[0] = 1.
+        row[1::2] = scale*np.cos(theta)
+        row[2::2] = scale*np.sin(theta)
+        return row
+
+    def getorder(self, N):
+        """ The plane waves with |m|, |n| <= K for the smallest K with
+        (2K+1)**2 >= N. As in the 1D fits the number of coefficients
+        follows the number of points and the regularization handles the
+        smoothness. """
+        K = max(1, int(np.ceil((np.sqrt(N) - 1) / 2.)))
+        return (2*K + 1)**2
+
+    def setpersistentbasis(self):
+        """ The frequencies in one half plane, as each gives a cos and
+        sin, and the lengths of their reciprocal lattice vectors """
+        K = int((np.sqrt(self.order) - 1) // 2)
+
+        self.frequencies = np.array([
+            (m, n) for m in range(0, K+1) for n in range(-K, K+1)
+            if m > 0 or n > 0])
+
+        B = get_reciprocal_vectors(self.settings['cell_vectors'])
+        self.Gnorms = np.linalg.norm(np.dot(self.frequencies, B), axis=1)
+
+    def fval(self, x):
+        """ Returns the value of the optimal function at a point (u, v)
+        or an array of points with shape (number of points, 2) """
+        x = np.asarray(x, dtype=float)
+        if x.ndim == 1:
+            return np.dot(self.basisval(x, 0), self.coeffs)
+        return np.array([np.dot(self.basisval(xi, 0), self.coeffs)
+                         for xi in x])
+
+    def fval_samples(self, x):
+        """ Returns the function values of every bootstrap fit in the
+        ensemble at the points x, shape (number of samples, len(x)) """
+        B = np.array([self.basisval(xi, 0) for xi in np.atleast_2d(x)])
+        return np.dot(self.coeffs_samples, B.T)
+
+    def get_dof(self):
+        return len(np.unique(np.asarray(self.xvals), axis=0)) - self.order
+
+    def get_fourier_coefficients(self, coeffs=None):
+        """ The complex Fourier coefficients c of the fit,
+            V(u, v) = sum_mn c_mn exp(2 pi i (m u + n v))
+
+        Args:
+            coeffs (optional[numpy array]): Coefficients of the basis,
+                e.g. a member of the bootstrap ensemble, instead of the
+                optimal coefficients
+
+        Returns:
+            Dictionary with (m, n) as keys and c_mn as values
+        """
+        if coeffs is None:
+            coeffs = self.coeffs
+
+        scale = self.Gnorms**(-self.settings['pdiff'])
+        a = coeffs[1::2]*scale
+        b = coeffs[2::2]*scale
+
+        coefficients = {(0, 0): complex(coeffs[0])}
+        for (m, n), ai, bi in zip(self.frequencies, a, b):
+            coefficients[(m, n)] = (ai - 1j*bi)/2.
+            coefficients[(-m, -n)] = (ai + 1j*bi)/2.
+
+        return coefficients
+
+
+def get_reciprocal_vectors(cell_vectors):
+    """ The in plane reciprocal vectors b1, b2 of the surface cell with
+    a_i . b_j = 2 pi delta_ij
+
+    Args:
+        cell_vectors (numpy array): a1 and a2 (2x3)
+
+    Returns:
+        Numpy array (2x3) with b1 and b2 in 1/Angstrom
+    """
+    A = np.asarray(cell_vectors, dtype=float)
+    return 2*np.pi*np.linalg.solve(np.dot(A, A.T), A)
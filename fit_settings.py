@@ -35,7 +35,19 @@ fit_settings = {
 
     # Weighting the derivative impact on fitting. When fitting the curve
     # regular data will always have a comperative weight 1.
-    'derivateive_weight': 1,
+    # None uses the mean spacing of the data points.
+    'derivateive_weight': None,
+
+    # Gaussian process fit (fit_gp.GPFit) only:
+    # Kernel, one of periodic, rbf and matern52
+    'kernel': 'matern52',
+    # Period of the periodic kernel
+    'period': 2*3.141592653589793,
+    # Noise of the energies (eV) and forces (eV/Angstrom) of the samples
+    'gp_noise': 1e-4,
+    'gp_force_noise': 1e-3,
+    # Number of basis functions representing the kernel
+    'gp_nbasis': 41,
 
     # Print 'debug' info to terminal as program runs
     'verbose': 1
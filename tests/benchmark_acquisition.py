@@ -0,0 +1,182 @@
+"""Benchmark of the rules for choosing new samples.
+
+Counts the number of calculator calls needed to converge the EMT test
+systems with the default spacing rule, with the 'relative' change and
+the 'uncertainty' based convergence criteria, and with the variance
+reduction rule that uses the bootstrap ensemble of the fit. The errors
+of the ZPE and the entropic energy of the mode are relative to the
+potential mapped on a dense grid, which does not depend on the fit.
+
+The variance reduction rule did not need fewer calls. With the
+'uncertainty' criterion it needs 8, 4 and 13 calls against 10, 4 and 14
+for the spacing, but the default spacing with the 'relative' criterion
+needs 8, 6 and 10 calls at errors below 0.5 meV, and with a fixed
+number of calls the spacing is as accurate. Candidates over the whole
+domain instead of between the samples, or also reducing the variance of
+the ZPE, did not change this. The variance reduction is therefore only
+used for modes with a baseline from a cheap calculator (see
+BaseAnalysis.use_variance_acquisition), and is switched on for all
+modes here to compare it.
+"""
+from __future__ import print_function
+import sys
+sys.path.append("..")
+
+from ase.build import molecule, fcc111, add_adsorbate
+from ase.optimize import QuasiNewton
+from ase.constraints import FixAtoms
+from ase.calculators.emt import EMT
+from ase.vibrations import Vibrations
+
+import numpy as np
+from scipy.interpolate import CubicSpline
+
+from __init__ import AnharmonicModes
+from anh_base import BaseAnalysis
+from energy_spectrum_solver import energy_spectrum
+
+
+class CountingEMT(EMT):
+    """EMT calculator that counts the number of calculations"""
+    ncalls = 0
+
+    def calculate(self, *args, **kwargs):
+        self.ncalls += 1
+        EMT.calculate(self, *args, **kwargs)
+
+
+def h2_vibration():
+    atoms = molecule('H2')
+    atoms.set_calculator(CountingEMT())
+    QuasiNewton(atoms, logfile='/dev/null').run(fmax=0.05)
+    return atoms, [0, 1], {'temperature': 1000}, [
+        ('define_vibration', {'mode_number': -1})]
+
+
+def ch3_rotation():
+    atoms = fcc111('Al', size=(2, 2, 2), vacuum=3.0)
+    add_adsorbate(atoms, molecule('CH3'), 2.5, 'ontop')
+    atoms.set_constraint(FixAtoms(mask=[a.symbol == 'Al' for a in atoms]))
+    atoms.set_calculator(CountingEMT())
+    QuasiNewton(atoms, logfile='/dev/null').run(fmax=0.05)
+    return atoms, [8, 9, 10, 11], {}, [
+        ('define_rotation', {'basepos': [0., 0., -1.],
+                             'branch': [9, 10, 11],
+                             'symnumber': 3})]
+
+
+def h_translation():
+    atoms = fcc111('Au', size=(2, 2, 2), vacuum=4.0)
+    add_adsorbate(atoms, molecule('H'), 3.0, 'ontop')
+    atoms.set_constraint(FixAtoms(mask=[a.symbol == 'Au' for a in atoms]))
+    atoms.set_calculator(CountingEMT())
+    QuasiNewton(atoms, logfile='/dev/null').run(fmax=0.05)
+    return atoms, [8], {}, [
+        ('define_translation', {'from_atom_to_atom': [4, 6]})]
+
+
+def h2_vibration_wide():
+    """H2 sampled far enough out to hold the zero point motion"""
+    atoms, indices, settings, definitions = h2_vibration()
+    return atoms, indices, dict(settings, min_sample_energy_kT=10), \
+        definitions
+
+
+class DenseFit:
+    """The potential of the calculator on a dense grid"""
+    def __init__(self, AMA, npoints=300):
+        xmin, xmax, _ = AMA.get_hamiltonian_domain()
+        x = np.linspace(xmin, xmax, npoints)
+        e = [AMA.calculate_displacement(xi)[0] for xi in x]
+        if AMA.an_mode['type'] == 'vibration':
+            self.fval = CubicSpline(x, e)
+        else:
+            e[-1] = e[0]
+            self.fval = CubicSpline(x, e, bc_type='periodic')
+
+
+def get_analysis(system, settings):
+    atoms, indices, system_settings, definitions = system()
+
+    vib = Vibrations(atoms, indices=indices, name='bench_vib')
+    vib.run()
+    vib.summary(log='/dev/null')
+    vib.clean()
+
+    AM = AnharmonicModes(vib, settings=dict(system_settings, **settings),
+                         pre_names='bench_mode_')
+    for method, kwargs in definitions:
+        getattr(AM, method)(**kwargs)
+
+    return AM, atoms.get_calculator()
+
+
+def get_mode_thermo(AM):
+    """The ZPE and the entropic energy of the mode"""
+    an_mode = AM.an_modes[0]
+    return an_mode['ZPE'], AM.get_analysis_object(0).get_entropic_energy(
+        an_mode['energy_levels'])
+
+
+def get_reference(system, npoints=201):
+    """The ZPE and the entropic energy of the mode from its potential on
+    a dense grid over the domain of a converged run, interpolated by a
+    cubic spline"""
+    AM, _ = get_analysis(system, {'rel_Z_mode_tol': 1e-3})
+    AM.run()
+
+    AMA = AM.get_analysis_object(0)
+    AMA.restore_backup()
+    displacements, energies = AMA.map_potential(npoints)
+    AM.clean()
+
+    energies = np.array(energies)
+    periodic = AMA.an_mode['type'] != 'vibration'
+    if periodic:
+        energies[-1] = energies[0]
+    potential = CubicSpline(displacements, energies,
+                            bc_type='periodic' if periodic else 'not-a-knot')
+
+    xmin, xmax, Hcoeff = AMA.get_hamiltonian_domain()
+    ZPE, _, energy_levels = AMA.get_spectrum_thermo(
+        energy_spectrum(xmin, xmax, potential, Hcoeff) - np.min(energies))
+    return ZPE, AMA.get_entropic_energy(energy_levels)
+
+
+def count_calls(system, rule, rel_Z_mode_tol, convergence='relative'):
+    AM, calc = get_analysis(system, {'convergence': convergence,
+                                     'rel_Z_mode_tol': rel_Z_mode_tol,
+                                     'max_step_iterations': 40})
+
+    use_variance_acquisition = BaseAnalysis.use_variance_acquisition
+    if rule == 'variance':
+        BaseAnalysis.use_variance_acquisition = lambda self: True
+
+    calc.ncalls = 0
+    try:
+        AM.run()
+    finally:
+        BaseAnalysis.use_variance_acquisition = use_variance_acquisition
+    AM.clean()
+
+    return (calc.ncalls,) + get_mode_thermo(AM)
+
+
+if __name__ == '__main__':
+    print('%-15s %-10s %-12s %7s %6s %9s %9s' % (
+        'system', 'rule', 'convergence', 'tol', 'calls',
+        'dZPE/meV', 'dEent/meV'))
+    for system in [h2_vibration, ch3_rotation, h_translation]:
+        ZPE_ref, entropic_energy_ref = get_reference(system)
+        for rule, convergence, rel_Z_mode_tol in [
+                ('spacing', 'relative', 0.01),
+                ('spacing', 'relative', 0.001),
+                ('spacing', 'uncertainty', 0.01),
+                ('variance', 'uncertainty', 0.01)]:
+            ncalls, ZPE, entropic_energy = count_calls(
+                system, rule, rel_Z_mode_tol, convergence)
+            print('%-15s %-10s %-12s %7.0e %6i %9.2f %9.2f' % (
+                system.__name__, rule, convergence,
+                rel_Z_mode_tol, ncalls,
+                1000 * abs(ZPE - ZPE_ref),
+                1000 * abs(entropic_energy - entropic_energy_ref)))
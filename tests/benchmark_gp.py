@@ -0,0 +1,67 @@
+"""Benchmark of the Gaussian process fit.
+
+Counts the number of calculator calls needed to converge the EMT test
+systems with the regularized fits and with the Gaussian process fit
+(settings['fit_method'] = 'gaussian_process'), and the error of the
+thermodynamics relative to the potential of the calculator on the
+domain of the run (see DenseFit in benchmark_acquisition.py).
+"""
+from __future__ import print_function
+import sys
+sys.path.append("..")
+
+from ase.vibrations import Vibrations
+
+from __init__ import AnharmonicModes
+from benchmark_acquisition import (h2_vibration_wide, ch3_rotation,
+                                   h_translation, DenseFit)
+
+
+def count_calls(system, extra_settings):
+    atoms, indices, settings, definitions = system()
+
+    vib = Vibrations(atoms, indices=indices, name='bench_vib')
+    vib.run()
+    vib.summary(log='/dev/null')
+    vib.clean()
+
+    settings = dict(settings, max_step_iterations=40, **extra_settings)
+    AM = AnharmonicModes(vib, settings=settings, pre_names='bench_mode_',
+                         verbosity=0)
+    for method, kwargs in definitions:
+        getattr(AM, method)(**kwargs)
+
+    calc = atoms.get_calculator()
+    calc.ncalls = 0
+    AM.run()
+    ncalls = calc.ncalls
+    AM.clean()
+
+    AMA = AM.get_analysis_object(0)
+    ZPE, _, energies = AMA.get_thermo(AMA.get_fit())
+    ZPE_exact, _, energies_exact = AMA.get_thermo(DenseFit(AMA))
+    AM.clean()
+
+    return (ncalls, abs(ZPE - ZPE_exact),
+            abs(AMA.get_entropic_energy(energies) -
+                AMA.get_entropic_energy(energies_exact)))
+
+
+if __name__ == '__main__':
+    print('%-18s %-17s %-12s %-6s %6s %9s %9s' % (
+        'system', 'fit', 'convergence', 'forces', 'calls',
+        'dZPE/meV', 'dEent/meV'))
+    for system in [h2_vibration_wide, ch3_rotation, h_translation]:
+        for convergence, rel_Z_mode_tol in [('relative', 0.01),
+                                            ('uncertainty', 0.01)]:
+            for fit_method in ['regularization', 'gaussian_process']:
+                for fit_forces in [False, True]:
+                    ncalls, dZPE, dentropic_energy = count_calls(
+                        system, dict(fit_method=fit_method,
+                                     fit_forces=fit_forces,
+                                     convergence=convergence,
+                                     rel_Z_mode_tol=rel_Z_mode_tol))
+                    print('%-18s %-17s %-12s %-6s %6i %9.2f %9.2f' % (
+                        system.__name__, fit_method, convergence,
+                        fit_forces, ncalls,
+                        1000 * dZPE, 1000 * dentropic_energy))
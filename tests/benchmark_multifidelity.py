@@ -0,0 +1,68 @@
+"""Benchmark of the multi-fidelity sampling.
+
+The EMT test systems are sampled with EMT as the expensive calculator,
+once alone and once with a cheap calculator mapping the potentials
+first (AnharmonicModes(cheap_calculator=...)). The cheap calculator is
+EMT with the cutoff of asap, which is a different but similar
+potential. The number of expensive calculations and the errors relative
+to the expensive potential on the domain of the run are compared.
+"""
+from __future__ import print_function
+import sys
+sys.path.append("..")
+
+from ase.calculators.emt import EMT
+from ase.vibrations import Vibrations
+
+from __init__ import AnharmonicModes
+from benchmark_acquisition import (h2_vibration_wide, ch3_rotation,
+                                   h_translation, DenseFit)
+
+
+def count_calls(system, cheap_calculator, extra_settings):
+    atoms, indices, settings, definitions = system()
+
+    vib = Vibrations(atoms, indices=indices, name='bench_vib')
+    vib.run()
+    vib.summary(log='/dev/null')
+    vib.clean()
+
+    settings = dict(settings, max_step_iterations=40, **extra_settings)
+    AM = AnharmonicModes(vib, settings=settings, pre_names='bench_mode_',
+                         verbosity=0, cheap_calculator=cheap_calculator)
+    for method, kwargs in definitions:
+        getattr(AM, method)(**kwargs)
+
+    calc = atoms.get_calculator()
+    calc.ncalls = 0
+    AM.run()
+    ncalls = calc.ncalls
+    AM.clean()
+
+    AMA = AM.get_analysis_object(0)
+    ZPE, _, energies = AMA.get_thermo(AMA.get_fit())
+    ZPE_exact, _, energies_exact = AMA.get_thermo(DenseFit(AMA))
+    AM.clean()
+
+    return (ncalls, abs(ZPE - ZPE_exact),
+            abs(AMA.get_entropic_energy(energies) -
+                AMA.get_entropic_energy(energies_exact)))
+
+
+if __name__ == '__main__':
+    print('%-18s %-17s %-12s %-6s %6s %9s %9s' % (
+        'system', 'fit', 'convergence', 'cheap', 'calls',
+        'dZPE/meV', 'dEent/meV'))
+    for system in [h2_vibration_wide, ch3_rotation, h_translation]:
+        for convergence in ['relative', 'uncertainty']:
+            for fit_method in ['regularization', 'gaussian_process']:
+                for cheap_calculator in [None, EMT(asap_cutoff=True)]:
+                    ncalls, dZPE, dentropic_energy = count_calls(
+                        system, cheap_calculator,
+                        dict(fit_method=fit_method,
+                             convergence=convergence,
+                             rel_Z_mode_tol=0.01))
+                    print('%-18s %-17s %-12s %-6s %6i %9.2f %9.2f' % (
+                        system.__name__, fit_method, convergence,
+                        cheap_calculator is not None, ncalls,
+                        1000 * dZPE, 1000 * dentropic_energy))
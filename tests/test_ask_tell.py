@@ -0,0 +1,69 @@
+import sys
+
+from ase.build import molecule, fcc111, add_adsorbate
+from ase.optimize import QuasiNewton
+from ase.constraints import FixAtoms
+from ase.calculators.emt import EMT
+from ase.vibrations import Vibrations
+
+sys.path.append("..")
+
+from __init__ import AnharmonicModes
+
+slab = fcc111('Au', size=(2, 2, 2), vacuum=4.0)
+H = molecule('H')
+add_adsorbate(slab, H, 3.0, 'ontop')
+
+constraint = FixAtoms(mask=[a.symbol == 'Au' for a in slab])
+slab.set_constraint(constraint)
+
+slab.set_calculator(EMT())
+
+QuasiNewton(slab, logfile='/dev/null').run(fmax=0.05)
+
+vib = Vibrations(slab, indices=[8])
+vib.run()
+vib.summary(log='/dev/null')
+vib.clean()
+
+# Reference with the synchronous run
+AM = AnharmonicModes(vibrations_object=vib)
+AM.define_vibration(mode_number=-1)
+AM.define_translation(from_atom_to_atom=[4, 6])
+AM.run()
+AM.summary(log='/dev/null')
+AM.clean()
+
+ZPE_ref = AM.get_ZPE()
+entropic_energy_ref = AM.get_entropic_energy()
+
+# Drive both modes from the outside, interleaving their calculations
+AM = AnharmonicModes(vibrations_object=vib)
+AM.define_vibration(mode_number=-1)
+AM.define_translation(from_atom_to_atom=[4, 6])
+
+AMAs = [AM.get_analysis_object(i) for i in range(len(AM.an_modes))]
+points = [AMA.ask() for AMA in AMAs]
+
+while any(points):
+    for i, AMA in enumerate(AMAs):
+        if not points[i]:
+            continue
+
+        energies = []
+        for displacement, positions in points[i]:
+            atoms = slab.copy()
+            atoms.set_positions(positions)
+            atoms.set_calculator(EMT())
+            energies.append(atoms.get_potential_energy())
+
+        AMA.tell(energies)
+        points[i] = AMA.ask()
+
+AM.calculate_anharmonic_thermo()
+AM.summary(log='/dev/null')
+AM.clean()
+
+assert abs(AM.get_ZPE() - ZPE_ref) < 1e-6, (AM.get_ZPE(), ZPE_ref)
+assert abs(AM.get_entropic_energy() - entropic_energy_ref) < 1e-6, (
+    AM.get_entropic_energy(), entropic_energy_ref)
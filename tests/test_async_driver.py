@@ -0,0 +1,66 @@
+import os
+import sys
+
+from ase.build import molecule, fcc111, add_adsorbate
+from ase.optimize import QuasiNewton
+from ase.constraints import FixAtoms
+from ase.calculators.emt import EMT
+from ase.calculators.socketio import PySocketIOClient
+from ase.vibrations import Vibrations
+
+sys.path.append("..")
+
+from __init__ import AnharmonicModes
+
+slab = fcc111('Au', size=(2, 2, 2), vacuum=4.0)
+H = molecule('H')
+add_adsorbate(slab, H, 3.0, 'ontop')
+
+constraint = FixAtoms(mask=[a.symbol == 'Au' for a in slab])
+slab.set_constraint(constraint)
+
+slab.set_calculator(EMT())
+
+QuasiNewton(slab, logfile='/dev/null').run(fmax=0.05)
+
+vib = Vibrations(slab, indices=[8])
+vib.run()
+vib.summary(log='/dev/null')
+vib.clean()
+
+# Reference with the synchronous run
+AM = AnharmonicModes(vibrations_object=vib)
+AM.define_vibration(mode_number=-1)
+AM.define_translation(from_atom_to_atom=[4, 6])
+AM.run()
+AM.summary(log='/dev/null')
+AM.clean()
+
+ZPE_ref = AM.get_ZPE()
+entropic_energy_ref = AM.get_entropic_energy()
+
+# Same analysis with the energies from two socket clients
+AM = AnharmonicModes(vibrations_object=vib)
+AM.define_vibration(mode_number=-1)
+AM.define_translation(from_atom_to_atom=[4, 6])
+AM.run_async(unixsocket='anh_test_%i' % os.getpid(),
+             launch_client=PySocketIOClient(EMT),
+             n_clients=2)
+AM.summary(log='/dev/null')
+AM.clean()
+
+# Energies pass through atomic units on the socket
+assert abs(AM.get_ZPE() - ZPE_ref) < 1e-4, (AM.get_ZPE(), ZPE_ref)
+assert abs(AM.get_entropic_energy() - entropic_energy_ref) < 1e-4, (
+    AM.get_entropic_energy(), entropic_energy_ref)
+
+# The clients cannot relax the points of a translation along its axis
+AM = AnharmonicModes(vibrations_object=vib)
+AM.define_translation(from_atom_to_atom=[4, 6], relax_axis=[0, 0, 1])
+try:
+    AM.run_async(unixsocket='anh_test_%i' % os.getpid())
+except ValueError:
+    pass
+else:
+    raise AssertionError('run_async relaxed a translation')
+AM.clean()
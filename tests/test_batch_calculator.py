@@ -0,0 +1,96 @@
+import sys
+
+import numpy as np
+
+from ase.build import molecule, fcc111, add_adsorbate
+from ase.optimize import QuasiNewton
+from ase.constraints import FixAtoms
+from ase.calculators.emt import EMT
+from ase.vibrations import Vibrations
+
+sys.path.append("..")
+
+from __init__ import AnharmonicModes
+
+
+class BatchEMT(EMT):
+    """EMT with a batch interface as machine learning potentials have"""
+    batch_sizes = []
+
+    def calculate_batch(self, images):
+        self.batch_sizes.append(len(images))
+        energies = []
+        forces = []
+        for atoms in images:
+            atoms.set_calculator(EMT())
+            energies.append(atoms.get_potential_energy())
+            forces.append(atoms.get_forces())
+        return energies, np.array(forces)
+
+
+slab = fcc111('Au', size=(2, 2, 2), vacuum=4.0)
+H = molecule('H')
+add_adsorbate(slab, H, 3.0, 'ontop')
+
+constraint = FixAtoms(mask=[a.symbol == 'Au' for a in slab])
+slab.set_constraint(constraint)
+
+slab.set_calculator(EMT())
+
+QuasiNewton(slab, logfile='/dev/null').run(fmax=0.05)
+
+vib = Vibrations(slab, indices=[8])
+vib.run()
+vib.summary(log='/dev/null')
+vib.clean()
+
+
+def run(settings={}):
+    AM = AnharmonicModes(vibrations_object=vib, settings=settings)
+    AM.define_vibration(mode_number=-1)
+    AM.define_translation(from_atom_to_atom=[4, 6])
+    AM.run()
+    AM.summary(log='/dev/null')
+    AM.clean()
+    return AM
+
+
+# Reference with one calculation at a time
+AM_ref = run({'fit_forces': True})
+
+# A calculator with calculate_batch gets the initial sampling in one call
+slab.set_calculator(BatchEMT())
+AM = run({'fit_forces': True})
+slab.set_calculator(EMT())
+
+assert max(BatchEMT.batch_sizes) >= 5, BatchEMT.batch_sizes
+assert sum(BatchEMT.batch_sizes) == sum(
+    an_mode['n_calls'] for an_mode in AM.an_modes)
+assert abs(AM.get_ZPE() - AM_ref.get_ZPE()) < 1e-8
+assert abs(AM.get_entropic_energy() - AM_ref.get_entropic_energy()) < 1e-8
+for an_mode, an_mode_ref in zip(AM.an_modes, AM_ref.an_modes):
+    assert np.allclose(an_mode['displacement_forces'],
+                       an_mode_ref['displacement_forces'])
+
+# A user function on the positions of the points
+calls = []
+
+
+def batch_evaluator(positions):
+    calls.append(len(positions))
+    atoms = slab.copy()
+    atoms.set_calculator(EMT())
+    energies = []
+    for p in positions:
+        atoms.set_positions(p)
+        energies.append(atoms.get_potential_energy())
+    return energies, None
+
+
+AM_ref = run()
+AM = run({'batch_evaluator': batch_evaluator})
+
+assert max(calls) >= 5, calls
+assert sum(calls) == sum(an_mode['n_calls'] for an_mode in AM.an_modes)
+assert abs(AM.get_ZPE() - AM_ref.get_ZPE()) < 1e-8
+assert abs(AM.get_entropic_energy() - AM_ref.get_entropic_energy()) < 1e-8
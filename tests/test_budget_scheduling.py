@@ -0,0 +1,55 @@
+import sys
+sys.path.append("..")
+
+from ase.build import molecule, fcc111, add_adsorbate
+from ase.optimize import QuasiNewton
+from ase.constraints import FixAtoms
+from ase.calculators.emt import EMT
+from ase.vibrations import Vibrations
+
+from __init__ import AnharmonicModes
+
+slab = fcc111('Au', size=(2, 2, 2), vacuum=4.0)
+H = molecule('H')
+add_adsorbate(slab, H, 3.0, 'ontop')
+
+constraint = FixAtoms(mask=[a.symbol == 'Au' for a in slab])
+slab.set_constraint(constraint)
+slab.set_calculator(EMT())
+
+dyn = QuasiNewton(slab, logfile='/dev/null')
+dyn.run(fmax=0.05)
+
+vib = Vibrations(slab, indices=[8])
+vib.run()
+vib.summary(log='/dev/null')
+vib.clean()
+
+# Budget for a single mode given through its mode_settings
+AM = AnharmonicModes(vibrations_object=vib)
+AM.define_translation(
+    from_atom_to_atom=[4, 6],
+    mode_settings={'max_calls': 7})
+AM.run()
+AM.summary(log='/dev/null')
+AM.clean()
+
+assert AM.an_modes[0]['n_calls'] <= 7, AM.an_modes[0]['n_calls']
+
+# Cost aware scheduling of several modes with a global budget
+AM = AnharmonicModes(
+    vibrations_object=vib,
+    settings={
+        'scheduler': 'cost_aware',
+        'max_total_calls': 20,
+    })
+AM.define_vibration(mode_number=-1)
+AM.define_translation(from_atom_to_atom=[4, 6])
+AM.run()
+AM.summary(log='/dev/null')
+AM.clean()
+
+n_calls = [an_mode['n_calls'] for an_mode in AM.an_modes]
+# Both modes are iterated, and only one step can overshoot the budget
+assert min(n_calls) > 5, n_calls
+assert sum(n_calls) <= 20 + 3, n_calls
@@ -0,0 +1,65 @@
+import os
+import sys
+
+from ase.build import molecule, fcc111, add_adsorbate
+from ase.optimize import QuasiNewton
+from ase.constraints import FixAtoms
+from ase.calculators.emt import EMT
+from ase.calculators.socketio import PySocketIOClient
+from ase.vibrations import Vibrations
+
+sys.path.append("..")
+
+from __init__ import AnharmonicModes
+
+slab = fcc111('Au', size=(2, 2, 2), vacuum=4.0)
+H = molecule('H')
+add_adsorbate(slab, H, 3.0, 'ontop')
+
+constraint = FixAtoms(mask=[a.symbol == 'Au' for a in slab])
+slab.set_constraint(constraint)
+
+slab.set_calculator(EMT())
+
+QuasiNewton(slab, logfile='/dev/null').run(fmax=0.05)
+
+vib = Vibrations(slab, indices=[8])
+vib.run()
+vib.summary(log='/dev/null')
+vib.clean()
+
+# Reference with the synchronous run
+AM = AnharmonicModes(vibrations_object=vib)
+AM.define_vibration(mode_number=-1)
+AM.define_translation(from_atom_to_atom=[4, 6])
+AM.run()
+AM.summary(log='/dev/null')
+AM.clean()
+
+ZPE_ref = AM.get_ZPE()
+entropic_energy_ref = AM.get_entropic_energy()
+
+# Same analysis with one persistent calculator client for all points
+launched = []
+
+
+def launch_client(atoms, properties=None, port=None, unixsocket=None):
+    launched.append(unixsocket)
+    return PySocketIOClient(EMT)(atoms, properties, port, unixsocket)
+
+
+AM = AnharmonicModes(vibrations_object=vib)
+AM.define_vibration(mode_number=-1)
+AM.define_translation(from_atom_to_atom=[4, 6])
+AM.run_with_session(unixsocket='anh_test_%i' % os.getpid(),
+                    launch_client=launch_client)
+AM.summary(log='/dev/null')
+AM.clean()
+
+assert len(launched) == 1, launched
+assert isinstance(slab.get_calculator(), EMT)
+
+# Energies pass through atomic units on the socket
+assert abs(AM.get_ZPE() - ZPE_ref) < 1e-4, (AM.get_ZPE(), ZPE_ref)
+assert abs(AM.get_entropic_energy() - entropic_energy_ref) < 1e-4, (
+    AM.get_entropic_energy(), entropic_energy_ref)
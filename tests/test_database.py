@@ -0,0 +1,78 @@
+import os
+import sys
+
+import numpy as np
+
+from ase.build import molecule, fcc111, add_adsorbate
+from ase.optimize import QuasiNewton
+from ase.constraints import FixAtoms
+from ase.calculators.emt import EMT
+from ase.vibrations import Vibrations
+
+sys.path.append("..")
+
+from __init__ import AnharmonicModes
+from an_database import ResultsDatabase
+
+slab = fcc111('Au', size=(2, 2, 2), vacuum=4.0)
+H = molecule('H')
+add_adsorbate(slab, H, 3.0, 'ontop')
+
+constraint = FixAtoms(mask=[a.symbol == 'Au' for a in slab])
+slab.set_constraint(constraint)
+
+slab.set_calculator(EMT())
+
+QuasiNewton(slab, logfile='/dev/null').run(fmax=0.05)
+
+vib = Vibrations(slab, indices=[8])
+vib.run()
+vib.summary(log='/dev/null')
+vib.clean()
+
+settings = {'database': 'an_mode_results.db', 'fit_forces': True}
+
+AM = AnharmonicModes(vibrations_object=vib, settings=settings)
+AM.define_vibration(mode_number=-1)
+AM.define_translation(from_atom_to_atom=[4, 6])
+AM.run()
+
+# Everything is in the database
+assert [fn for fn in os.listdir('.') if fn.startswith('an_mode_')] == [
+    'an_mode_results.db']
+
+db = ResultsDatabase('an_mode_results.db')
+results = db.get_results(temperature=300)
+assert len(results) == 2
+assert len(db.get_results(mode_type='translation')) == 1
+
+for an_mode in AM.an_modes:
+    result, = db.get_results(temperature=300, mode_type=an_mode['type'])
+    assert abs(an_mode['ZPE'] - result['ZPE']) < 1e-12
+    assert np.allclose(an_mode['energy_levels'], result['energy_levels'])
+
+    mode_id = db.get_mode_id(result['system'], result['mode_hash'])
+    displacements, energies, forces, positions = db.get_points(mode_id)
+    assert len(energies) == an_mode['n_calls'] == result['n_calls']
+    assert np.allclose(energies, an_mode['displacement_energies'])
+    assert np.allclose(forces, an_mode['displacement_forces'])
+    assert np.array(positions).shape == (len(energies), len(slab), 3)
+
+    fitobj = db.get_fit(mode_id, 300)
+    x = np.array(an_mode['displacements'])
+    assert np.max(np.abs(
+        fitobj.fval(x) - np.array(an_mode['displacement_energies']))) < 1e-2
+
+# A new run of the same modes is restored from the database
+slab.set_calculator(None)
+
+AM_restored = AnharmonicModes(vibrations_object=vib, settings=settings)
+AM_restored.define_vibration(mode_number=-1)
+AM_restored.define_translation(from_atom_to_atom=[4, 6])
+AM_restored.run()
+
+assert AM.get_ZPE() == AM_restored.get_ZPE()
+assert AM.get_entropic_energy() == AM_restored.get_entropic_energy()
+
+db.close()
+AM.clean()
@@ -0,0 +1,94 @@
+import os
+import sys
+
+import numpy as np
+
+from ase import Atoms
+from ase.build import fcc111, add_adsorbate
+from ase.optimize import QuasiNewton
+from ase.constraints import FixAtoms
+from ase.calculators.emt import EMT
+from ase.vibrations import Vibrations
+
+sys.path.append("..")
+
+from __init__ import AnharmonicModes
+from an_estimate import HarmonicCalculator
+
+slab = fcc111('Pt', size=(2, 2, 2), vacuum=4.0)
+add_adsorbate(slab, Atoms('O'), 1.5, 'fcc')
+
+constraint = FixAtoms(mask=[a.symbol == 'Pt' for a in slab])
+slab.set_constraint(constraint)
+
+calc = EMT()
+slab.set_calculator(calc)
+
+QuasiNewton(slab, logfile='/dev/null').run(fmax=0.01)
+
+vib = Vibrations(slab, indices=[8])
+vib.run()
+vib.summary(log='/dev/null')
+vib.clean()
+
+# The harmonic surrogate reproduces the frequencies of the Hessian
+harmonic = slab.copy()
+harmonic.set_calculator(HarmonicCalculator(
+    slab.get_positions(), vib.indices, vib.H))
+harmonic_vib = Vibrations(harmonic, indices=[8])
+harmonic_vib.run()
+assert np.allclose(harmonic_vib.get_energies(), vib.get_energies(),
+                   atol=1e-4)
+harmonic_vib.clean()
+
+
+def define_modes(AM):
+    AM.define_vibration(mode_number=-1)
+    AM.define_translation(from_atom_to_atom=[4, 6], relax_axis=[0, 0, 1])
+
+
+settings = {'fmax': 0.01}
+
+# Estimate with the harmonic surrogate, without any files
+AM = AnharmonicModes(vibrations_object=vib, settings=settings)
+define_modes(AM)
+estimate = AM.estimate_cost()
+
+assert not [fn for fn in os.listdir('.') if fn.startswith('an_mode_')]
+assert slab.get_calculator() is calc
+assert [mode['type'] for mode in estimate['modes']] == [
+    'vibration', 'translation']
+for key in ['n_calls', 'relax_steps']:
+    assert estimate[key] == sum(mode[key] for mode in estimate['modes'])
+    for mode in estimate['modes'] + [estimate]:
+        lowest, highest = mode[key + '_range']
+        assert lowest <= mode[key] <= highest
+assert estimate['modes'][0]['relax_steps'] == 0
+assert estimate['n_calls_range'][0] < estimate['n_calls_range'][1]
+
+# The run budgets cap the estimate
+AM = AnharmonicModes(vibrations_object=vib,
+                     settings={'fmax': 0.01, 'max_calls': 7})
+define_modes(AM)
+estimate = AM.estimate_cost(scales=[])
+assert [mode['n_calls'] for mode in estimate['modes']] == [7, 7]
+assert all(mode['capped'] for mode in estimate['modes'])
+
+# A scan with the calculator of the run as the cheap calculator predicts
+# the run
+AM = AnharmonicModes(vibrations_object=vib, settings=settings,
+                     cheap_calculator=EMT())
+define_modes(AM)
+estimate = AM.estimate_cost(surrogate='cheap')
+
+AM = AnharmonicModes(vibrations_object=vib, settings=settings)
+define_modes(AM)
+AM.run()
+
+for mode, an_mode in zip(estimate['modes'], AM.an_modes):
+    assert mode['n_calls'] == an_mode['n_calls']
+    assert mode['relax_steps'] == an_mode.get('relax_steps', 0)
+    assert not mode['capped']
+assert estimate['modes'][1]['relax_steps'] > 0
+
+AM.clean()
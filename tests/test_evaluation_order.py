@@ -0,0 +1,46 @@
+import sys
+
+from ase.build import molecule, fcc111, add_adsorbate
+from ase.optimize import QuasiNewton
+from ase.constraints import FixAtoms
+from ase.calculators.emt import EMT
+from ase.vibrations import Vibrations
+
+sys.path.append("..")
+
+from __init__ import AnharmonicModes
+
+slab = fcc111('Au', size=(2, 2, 2), vacuum=4.0)
+H = molecule('H')
+add_adsorbate(slab, H, 3.0, 'ontop')
+
+constraint = FixAtoms(mask=[a.symbol == 'Au' for a in slab])
+slab.set_constraint(constraint)
+
+slab.set_calculator(EMT())
+
+QuasiNewton(slab, logfile='/dev/null').run(fmax=0.05)
+
+vib = Vibrations(slab, indices=[8])
+vib.run()
+vib.summary(log='/dev/null')
+vib.clean()
+
+AM = AnharmonicModes(vibrations_object=vib, settings={'n_initial': 9})
+AM.define_translation(from_atom_to_atom=[4, 6])
+
+AMA = AM.get_analysis_object(0)
+AMA.start()
+AM.clean()
+
+# The initial points along the path are calculated in one sweep
+# instead of returning to the groundstate in between.
+path_length = AMA.an_mode['transition_path_length']
+assert AMA.an_mode['geometry_jump'] < path_length, (
+    AMA.an_mode['geometry_jump'], path_length)
+
+# Energies are still stored in the order of the displacements
+energies = [AMA.calculate_displacement(d)[0]
+            for d in AMA.an_mode['displacements']]
+assert max(abs(e - e_ref) for e, e_ref in zip(
+    energies, AMA.an_mode['displacement_energies'])) < 1e-10
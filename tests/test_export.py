@@ -0,0 +1,89 @@
+import os
+import shutil
+import sys
+
+import numpy as np
+
+from ase.build import molecule, fcc111, add_adsorbate
+from ase.optimize import QuasiNewton
+from ase.constraints import FixAtoms
+from ase.calculators.emt import EMT
+from ase.vibrations import Vibrations
+
+sys.path.append("..")
+
+from __init__ import AnharmonicModes
+from an_export import ModeArchive
+
+slab = fcc111('Au', size=(2, 2, 2), vacuum=4.0)
+H = molecule('H')
+add_adsorbate(slab, H, 3.0, 'ontop')
+
+constraint = FixAtoms(mask=[a.symbol == 'Au' for a in slab])
+slab.set_constraint(constraint)
+
+slab.set_calculator(EMT())
+
+QuasiNewton(slab, logfile='/dev/null').run(fmax=0.05)
+
+vib = Vibrations(slab, indices=[8])
+vib.run()
+vib.summary(log='/dev/null')
+vib.clean()
+
+directory = 'modes_archive'
+shutil.rmtree(directory, ignore_errors=True)
+
+AM = AnharmonicModes(vibrations_object=vib, settings={'fit_forces': True})
+AM.define_vibration(mode_number=-1)
+AM.define_translation(from_atom_to_atom=[4, 6])
+AM.run()
+
+archive = AM.export(directory, npoints=32)
+assert len(archive) == 2
+assert list(archive.index['type']) == ['vibration', 'translation']
+assert isinstance(archive.get_block('sample_energies', 0), np.memmap)
+
+for i, an_mode in enumerate(AM.an_modes):
+    displacements, energies, forces = archive.get_samples(i)
+    assert np.allclose(displacements[:, 0], an_mode['displacements'])
+    assert np.all(np.isnan(displacements[:, 1]))
+    assert np.allclose(energies, an_mode['displacement_energies'])
+    assert np.allclose(forces[:, 0], an_mode['displacement_forces'])
+    assert np.allclose(archive.get_energy_levels(i),
+                       an_mode['energy_levels'])
+    assert archive.index['ZPE'][i] == an_mode['ZPE']
+    assert archive.index['mode_hash'][i] == an_mode['mode_hash']
+
+    grid, potential = archive.get_potential(i)
+    assert len(grid) == 32
+    assert np.allclose(potential, an_mode['fit'].fval(grid[:, 0]))
+
+# The same run replaces its modes in a new segment, and the segment
+# of the replaced modes is removed
+AM.export(directory)
+archive = ModeArchive(directory)
+assert len(archive) == 2
+assert list(archive.index['segment']) == [1, 1]
+assert sorted(fn for fn in os.listdir(directory)
+              if fn.startswith('segment_')) == ['segment_1']
+
+# An interrupted export, which did not write the index, is not seen
+os.makedirs(os.path.join(directory, 'segment_2'))
+assert len(ModeArchive(directory)) == 2
+
+# Another temperature is added without rewriting the earlier blocks
+block = os.path.join(directory, 'segment_1', 'sample_energies.npy')
+inode = os.stat(block).st_ino
+
+AM.settings['temperature'] = 500
+archive = AM.export(directory)
+assert len(archive) == 4
+assert os.stat(block).st_ino == inode
+assert list(archive.index['segment']) == [1, 1, 2, 2]
+assert list(archive.select(type='translation', temperature=500)) == [3]
+assert np.allclose(archive.get_samples(1)[1],
+                   AM.an_modes[1]['displacement_energies'])
+
+AM.clean()
+shutil.rmtree(directory)
@@ -0,0 +1,94 @@
+import sys
+
+import numpy as np
+
+from ase.build import molecule, fcc111, add_adsorbate
+from ase.optimize import QuasiNewton
+from ase.constraints import FixAtoms
+from ase.calculators.emt import EMT
+from ase.vibrations import Vibrations
+
+sys.path.append("..")
+
+from __init__ import AnharmonicModes
+from fit_legendre import NonPeriodicFit
+from fit_periodic import PeriodicFit
+from fit_settings import fit_settings
+
+# The derivatives of the basis functions
+for fitobj in [NonPeriodicFit(dict(fit_settings, verbose=False)),
+               PeriodicFit(dict(fit_settings, verbose=False, symnumber=3))]:
+    fitobj.order = 7
+    fitobj.setpersistentbasis()
+    for x in [-0.7, 0.1, 0.5]:
+        dbasis = (fitobj.basisfunction(x + 1e-6, 0) -
+                  fitobj.basisfunction(x - 1e-6, 0)) / 2e-6
+        assert np.max(np.abs(dbasis - fitobj.basisfunction(x, 1))) < 1e-6
+
+# The forces along the mode are -dE/d(displacement)
+slab = fcc111('Au', size=(2, 2, 2), vacuum=4.0)
+H = molecule('H')
+add_adsorbate(slab, H, 3.0, 'ontop')
+
+constraint = FixAtoms(mask=[a.symbol == 'Au' for a in slab])
+slab.set_constraint(constraint)
+
+slab.set_calculator(EMT())
+
+QuasiNewton(slab, logfile='/dev/null').run(fmax=0.05)
+
+vib = Vibrations(slab, indices=[8])
+vib.run()
+vib.summary(log='/dev/null')
+vib.clean()
+
+AM = AnharmonicModes(vibrations_object=vib, settings={'fit_forces': True})
+AM.define_translation(from_atom_to_atom=[4, 6])
+
+AMA = AM.get_analysis_object(0)
+for displacement in [0.3, 1.0]:
+    e_plus = AMA.calculate_displacement(displacement + 1e-4)[0]
+    e_minus = AMA.calculate_displacement(displacement - 1e-4)[0]
+    e, forces, positions = AMA.calculate_displacement(displacement)
+    assert abs(AMA.project_forces(forces, displacement) +
+               (e_plus - e_minus) / 2e-4) < 1e-5
+
+AM.run()
+AM.summary(log='/dev/null')
+AM.clean()
+
+an_mode = AM.an_modes[0]
+assert (len(an_mode['displacement_forces']) ==
+        len(an_mode['displacement_energies']))
+assert abs(AM.get_entropic_energy() - 0.0294) < 1e-3, (
+    AM.get_entropic_energy())
+
+# A point told without forces keeps the forces aligned with the energies
+AM = AnharmonicModes(vibrations_object=vib, settings={'fit_forces': True})
+AM.define_translation(from_atom_to_atom=[4, 6])
+
+AMA = AM.get_analysis_object(0, an_filename='')
+points = AMA.ask()
+energies = []
+forces = []
+for displacement, positions in points:
+    atoms = slab.copy()
+    atoms.set_positions(positions)
+    atoms.set_calculator(EMT())
+    energies.append(atoms.get_potential_energy())
+    forces.append(atoms.get_forces())
+forces[1] = None
+AMA.tell(energies, forces)
+
+an_mode = AMA.an_mode
+assert len(an_mode['displacement_forces']) == len(points)
+assert an_mode['displacement_forces'][1] is None
+for i in [0, 2]:
+    assert abs(an_mode['displacement_forces'][i] - AMA.project_forces(
+        forces[i], points[i][0])) < 1e-12
+assert len(AMA.get_fit_derivatives()) == 0
+
+# The default weight of the derivatives of a single point
+fitobj = NonPeriodicFit(dict(fit_settings, verbose=False))
+fitobj.set_data(np.array([0.1]), np.array([0.]), [1.])
+assert fitobj.get_derivative_weight() == 1.
@@ -0,0 +1,71 @@
+import sys
+
+import numpy as np
+
+from ase.build import molecule, fcc111, add_adsorbate
+from ase.constraints import FixAtoms
+from ase.calculators.emt import EMT
+from ase.optimize import QuasiNewton
+from ase.vibrations import Vibrations
+
+sys.path.append("..")
+
+from __init__ import AnharmonicModes
+from define_rot_mode import rotatepoints
+
+# Rotations about an arbitrary axis agree with ase
+atoms = molecule('CH3CH2OH')
+center = np.array([0.3, -0.2, 0.1])
+axis = np.array([1., 2., -0.5])
+angles = np.array([0.3, 1.2, -2.])
+
+rotated = rotatepoints(center, axis, angles, atoms.get_positions())
+assert rotated.shape == (len(angles), len(atoms), 3)
+
+for angle, positions in zip(angles, rotated):
+    reference = atoms.copy()
+    reference.rotate(180.*angle/np.pi, axis, center=center)
+    assert np.allclose(positions, reference.get_positions())
+    assert np.allclose(
+        rotatepoints(center, axis, angle, atoms.get_positions()), positions)
+
+# The batch of positions of each mode type is the positions one by one
+slab = fcc111('Au', size=(2, 2, 2), vacuum=4.0)
+add_adsorbate(slab, molecule('H'), 3.0, 'ontop')
+slab.set_constraint(FixAtoms(mask=[a.symbol == 'Au' for a in slab]))
+slab.set_calculator(EMT())
+QuasiNewton(slab, logfile='/dev/null').run(fmax=0.05)
+
+vib = Vibrations(slab, indices=[8])
+vib.run()
+vib.summary(log='/dev/null')
+vib.clean()
+
+path_length = np.linalg.norm(slab[5].position - slab[4].position)
+
+for i, (definition, kwargs, displacements) in enumerate([
+        ('define_vibration', {'mode_number': 0}, [None, -0.1, 0.2]),
+        ('define_rotation', {'basepos': slab[4].position, 'branch': [8],
+                             'rot_axis': [1., 1., 0.]},
+         [0., 0.5, 2*np.pi]),
+        ('define_translation', {'from_atom_to_atom': [4, 5]},
+         [0., 0.7, path_length]),
+        ('define_surface_translation',
+         {'from_atom_to_atoms': [4, 5, 6], 'symnumber': 3},
+         [[0., 0.], [0.3, 0.6], [1., 0.]])]):
+    AM = AnharmonicModes(vibrations_object=vib)
+    getattr(AM, definition)(**kwargs)
+
+    AMA = AM.get_analysis_object(0)
+    batch = AMA.get_positions_batch(displacements)
+    assert batch.shape == (len(displacements), len(slab), 3)
+    for displacement, positions in zip(displacements, batch):
+        assert np.allclose(AMA.get_mode_positions(displacement), positions)
+
+    # The start, and the end of periodic modes, are the groundstate
+    assert np.allclose(batch[0], slab.get_positions())
+    if i > 0:
+        assert np.allclose(batch[-1], slab.get_positions())
+    assert not np.allclose(batch[1], slab.get_positions())
+
+    AM.clean()
@@ -0,0 +1,82 @@
+import sys
+
+import numpy as np
+
+from ase.build import molecule, fcc111, add_adsorbate
+from ase.optimize import QuasiNewton
+from ase.constraints import FixAtoms
+from ase.calculators.emt import EMT
+from ase.vibrations import Vibrations
+
+sys.path.append("..")
+
+from __init__ import AnharmonicModes
+from fit_gp import GPFit
+from fit_settings import fit_settings
+
+# The derivatives of the basis functions
+for kernel in ['matern52', 'periodic']:
+    fitobj = GPFit(dict(fit_settings, verbose=False, kernel=kernel,
+                        period=2*np.pi/3))
+    fitobj.set_data(np.linspace(-1., 1., 5), np.zeros(5))
+    fitobj.setpersistentbasis()
+    for x in [-0.7, 0.1, 0.5]:
+        dbasis = (fitobj.basisfunction(x + 1e-6, 0) -
+                  fitobj.basisfunction(x - 1e-6, 0)) / 2e-6
+        assert np.max(np.abs(dbasis - fitobj.basisfunction(x, 1))) < 1e-5
+
+# The posterior of a well interpolates the data and its uncertainty
+# shrinks with force observations
+x = np.linspace(-0.3, 0.3, 7)
+x_test = np.linspace(-0.3, 0.3, 51)
+errors = []
+for yders in [[], 20*x + 15*x**2]:
+    fitobj = GPFit(dict(fit_settings, verbose=False, kernel='matern52'))
+    fitobj.set_data(x, 10*x**2 + 5*x**3, yders)
+    fitobj.run()
+
+    error = np.max(np.abs(
+        fitobj.fval(x_test) - (10*x_test**2 + 5*x_test**3)))
+    std = np.sqrt(np.diag(fitobj.fval_covariance(x_test, x_test)))
+    assert error < 3*np.max(std)
+    assert np.max(np.abs(fitobj.fval(x) - 10*x**2 - 5*x**3)) < 1e-3
+    assert fitobj.fval_samples(x_test).shape == (
+        len(fitobj.coeffs_samples), len(x_test))
+    errors.append(np.max(std))
+assert errors[1] < errors[0]
+
+# A periodic mode analysed with the Gaussian process fit
+slab = fcc111('Au', size=(2, 2, 2), vacuum=4.0)
+H = molecule('H')
+add_adsorbate(slab, H, 3.0, 'ontop')
+
+constraint = FixAtoms(mask=[a.symbol == 'Au' for a in slab])
+slab.set_constraint(constraint)
+
+slab.set_calculator(EMT())
+
+QuasiNewton(slab, logfile='/dev/null').run(fmax=0.05)
+
+vib = Vibrations(slab, indices=[8])
+vib.run()
+vib.summary(log='/dev/null')
+vib.clean()
+
+AM = AnharmonicModes(vibrations_object=vib,
+                     settings={'fit_method': 'gaussian_process'})
+AM.define_translation(from_atom_to_atom=[4, 6])
+
+AM.run()
+AM.summary(log='/dev/null')
+
+# The options of a mode are not written to the shared fit settings
+AMA = AM.get_analysis_object(0, settings={'fit_method': 'gaussian_process',
+                                          'gp_nbasis': 21})
+assert AMA.make_fit_object().settings['gp_nbasis'] == 21
+assert fit_settings['gp_nbasis'] == 41
+assert fit_settings['kernel'] == 'matern52'
+
+AM.clean()
+
+assert abs(AM.get_entropic_energy() - 0.0294) < 1e-3, (
+    AM.get_entropic_energy())
@@ -0,0 +1,76 @@
+import os
+import sys
+
+import numpy as np
+
+from ase.build import molecule, fcc111, add_adsorbate
+from ase.constraints import FixAtoms
+from ase.calculators.emt import EMT
+from ase.optimize import QuasiNewton
+from ase.vibrations import Vibrations
+
+sys.path.append("..")
+
+from __init__ import AnharmonicModes
+
+slab = fcc111('Au', size=(2, 2, 2), vacuum=4.0)
+add_adsorbate(slab, molecule('H'), 3.0, 'ontop')
+slab.set_constraint(FixAtoms(mask=[a.symbol == 'Au' for a in slab]))
+slab.set_calculator(EMT())
+QuasiNewton(slab, logfile='/dev/null').run(fmax=0.05)
+
+vib = Vibrations(slab, indices=[8])
+vib.run()
+vib.summary(log='/dev/null')
+vib.clean()
+
+# Positions on a mode are projected back on their displacement
+for definition, kwargs, displacement in [
+        ('define_vibration', {'mode_number': 0}, -0.1),
+        ('define_rotation', {'basepos': slab[4].position, 'branch': [8],
+                             'rot_axis': [1., 1., 0.]}, 2.),
+        ('define_translation', {'from_atom_to_atom': [4, 5]}, 0.7),
+        ('define_surface_translation',
+         {'from_atom_to_atoms': [4, 5, 6], 'symnumber': 3}, [0.3, 0.6])]:
+    AM = AnharmonicModes(vibrations_object=vib)
+    getattr(AM, definition)(**kwargs)
+
+    AMA = AM.get_analysis_object(0)
+    positions = AMA.get_mode_positions(displacement)
+    assert np.allclose(AMA.project_positions(positions), displacement)
+    assert AMA.get_projection_residual(positions, displacement) < 1e-10
+
+    # Positions off the mode are not
+    positions[8, 2] += 0.1
+    assert AMA.get_projection_residual(
+        positions, AMA.project_positions(positions)) > 1e-3
+
+    AM.clean()
+
+AM = AnharmonicModes(vibrations_object=vib)
+AM.define_vibration(mode_number=-1)
+AM.define_translation(from_atom_to_atom=[4, 6])
+AM.run()
+
+# The backups are lost, but the trajectories are left
+for fn in os.listdir('.'):
+    if fn.startswith('an_mode_') and not fn.endswith('.traj'):
+        os.remove(fn)
+
+# The same sampling is repeated from the trajectories without a
+# calculator
+slab.set_calculator(None)
+
+AM_imported = AnharmonicModes(vibrations_object=vib)
+AM_imported.define_vibration(mode_number=-1)
+AM_imported.define_translation(from_atom_to_atom=[4, 6])
+AM_imported.run()
+
+assert abs(AM.get_ZPE() - AM_imported.get_ZPE()) < 1e-12
+for an_mode, an_mode_imported in zip(AM.an_modes, AM_imported.an_modes):
+    assert an_mode_imported.get('n_calls', 0) == 0
+    assert an_mode_imported['n_imported'] == an_mode['n_calls']
+    assert np.allclose(an_mode['displacement_energies'],
+                       an_mode_imported['displacement_energies'])
+
+AM.clean()
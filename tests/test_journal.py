@@ -0,0 +1,109 @@
+import os
+import sys
+
+import numpy as np
+
+from ase.build import molecule, fcc111, add_adsorbate
+from ase.optimize import QuasiNewton
+from ase.constraints import FixAtoms
+from ase.calculators.emt import EMT
+from ase.vibrations import Vibrations
+
+sys.path.append("..")
+
+from __init__ import AnharmonicModes
+from an_journal import ModeJournal, apply_record
+
+# One record per point, with only the new items of the lists
+journal = ModeJournal('an_mode_journal', snapshot_every=1000)
+an_mode = {'type': 'vibration', 'displacements': [],
+           'displacement_energies': []}
+sizes = []
+for i in range(40):
+    an_mode['displacements'] = list(an_mode['displacements']) + [0.1*i]
+    an_mode['displacement_energies'].append(-i**2)
+    an_mode['n_calls'] = i + 1
+    journal.record(an_mode)
+    sizes.append(os.path.getsize('an_mode_journal.journal'))
+
+assert not os.path.exists('an_mode_journal.pckl')
+record_sizes = np.diff(sizes)
+assert np.max(record_sizes) == np.min(record_sizes[5:]), record_sizes
+assert ModeJournal('an_mode_journal').load() == an_mode
+
+# A list that got shorter or was replaced is stored whole
+list_journal = ModeJournal('an_mode_lists', snapshot_every=1000)
+lists = {'ZPE_hist': [1., 2., 3.]}
+list_journal.record(lists)
+lists['ZPE_hist'] = [1., 2.]
+assert list_journal.get_changes(lists)['set'] == {'ZPE_hist': [1., 2.]}
+lists['ZPE_hist'] = [1., 5., 3.]
+assert list_journal.get_changes(lists)['set'] == {'ZPE_hist': [1., 5., 3.]}
+lists['ZPE_hist'].append(4.)
+assert list_journal.get_changes(lists)['append'] == {'ZPE_hist': (3, [4.])}
+assert list_journal.get_changes(lists) is None
+
+# The records can be replayed twice
+records = journal.read_records()
+replayed = {}
+for record in records + records:
+    apply_record(replayed, record)
+assert replayed == an_mode
+
+# A record torn by a crash is dropped and cut off the journal
+with open('an_mode_journal.journal', 'ab') as f:
+    f.write(b'\x80\x04\x95\x10\x00')
+journal = ModeJournal('an_mode_journal', snapshot_every=1000)
+assert journal.load() == an_mode
+an_mode['displacement_energies'].append(1.)
+an_mode['displacements'].append(5.)
+journal.record(an_mode)
+assert ModeJournal('an_mode_journal').load() == an_mode
+
+# Snapshots compact the journal
+journal = ModeJournal('an_mode_snapshot', snapshot_every=3)
+for i in range(7):
+    an_mode['displacement_energies'].append(float(i))
+    an_mode['displacements'].append(float(i))
+    journal.record(an_mode)
+assert os.path.exists('an_mode_snapshot.pckl')
+assert len(journal.read_records()) == 1
+assert ModeJournal('an_mode_snapshot').load() == an_mode
+
+# A finished run is restored without calculations
+slab = fcc111('Au', size=(2, 2, 2), vacuum=4.0)
+H = molecule('H')
+add_adsorbate(slab, H, 3.0, 'ontop')
+
+constraint = FixAtoms(mask=[a.symbol == 'Au' for a in slab])
+slab.set_constraint(constraint)
+
+slab.set_calculator(EMT())
+
+QuasiNewton(slab, logfile='/dev/null').run(fmax=0.05)
+
+vib = Vibrations(slab, indices=[8])
+vib.run()
+vib.summary(log='/dev/null')
+vib.clean()
+
+AM = AnharmonicModes(vibrations_object=vib,
+                     settings={'journal_snapshot_every': 4})
+AM.define_vibration(mode_number=-1)
+AM.define_translation(from_atom_to_atom=[4, 6])
+AM.run()
+
+slab.set_calculator(None)
+
+AM_restored = AnharmonicModes(vibrations_object=vib)
+AM_restored.define_vibration(mode_number=-1)
+AM_restored.define_translation(from_atom_to_atom=[4, 6])
+AM_restored.run()
+
+for an_mode, an_mode_restored in zip(AM.an_modes, AM_restored.an_modes):
+    assert an_mode['displacements'] == an_mode_restored['displacements']
+    assert an_mode['n_calls'] == an_mode_restored['n_calls']
+assert AM.get_ZPE() == AM_restored.get_ZPE()
+assert AM.get_entropic_energy() == AM_restored.get_entropic_energy()
+
+AM.clean()
@@ -0,0 +1,84 @@
+import os
+import sys
+
+from ase.build import molecule, fcc111, add_adsorbate
+from ase.optimize import QuasiNewton
+from ase.constraints import FixAtoms
+from ase.calculators.emt import EMT
+from ase.vibrations import Vibrations
+
+sys.path.append("..")
+
+from __init__ import AnharmonicModes
+from an_journal import read_backup_index
+
+slab = fcc111('Au', size=(2, 2, 2), vacuum=4.0)
+H = molecule('H')
+add_adsorbate(slab, H, 3.0, 'ontop')
+
+constraint = FixAtoms(mask=[a.symbol == 'Au' for a in slab])
+slab.set_constraint(constraint)
+
+slab.set_calculator(EMT())
+
+QuasiNewton(slab, logfile='/dev/null').run(fmax=0.05)
+
+vib = Vibrations(slab, indices=[8])
+vib.run()
+vib.summary(log='/dev/null')
+vib.clean()
+
+AM = AnharmonicModes(vibrations_object=vib)
+AM.define_vibration(mode_number=-1)
+AM.define_translation(from_atom_to_atom=[4, 6])
+AM.run()
+
+hashes = [an_mode['mode_hash'] for an_mode in AM.an_modes]
+assert hashes[0] != hashes[1]
+
+# Defining the modes in the other order finds the backups of the modes
+# without any calculations
+slab.set_calculator(None)
+
+AM_reordered = AnharmonicModes(vibrations_object=vib)
+AM_reordered.define_translation(from_atom_to_atom=[4, 6])
+AM_reordered.define_vibration(mode_number=-1)
+AM_reordered.run()
+
+assert [an_mode['mode_hash'] for an_mode in AM_reordered.an_modes] == [
+    hashes[1], hashes[0]]
+assert abs(AM.get_ZPE() - AM_reordered.get_ZPE()) < 1e-12
+
+# A mode defined in another way does not use the backup in its files,
+# and does not overwrite it
+AM_other = AnharmonicModes(vibrations_object=vib)
+AM_other.define_translation(from_atom_to_atom=[4, 5])
+AMA = AM_other.get_analysis_object(0)
+assert AMA.restore_backup() == 0
+assert AMA.an_mode['mode_hash'] not in hashes
+mode_hash = AMA.an_mode['mode_hash']
+index = read_backup_index('an_mode_backups.index')
+assert AMA.get_journal().filename == 'an_mode_0_' + mode_hash[:8]
+assert index[mode_hash] == 'an_mode_0_' + mode_hash[:8]
+
+# Neither does the same mode with another calculator label
+AM_label = AnharmonicModes(vibrations_object=vib,
+                           settings={'calculator_label': 'PBE'})
+AM_label.define_vibration(mode_number=-1)
+assert AM_label.get_analysis_object(0).restore_backup() == 0
+
+# The backups are found by the hash in the index, and the backup of
+# another mode that is read on the way is not cut
+assert index[hashes[1]] == 'an_mode_1'
+with open('an_mode_0.journal', 'ab') as f:
+    f.write(b'torn')
+size = os.path.getsize('an_mode_0.journal')
+
+AM_index = AnharmonicModes(vibrations_object=vib)
+AM_index.define_translation(from_atom_to_atom=[4, 6])
+AMA = AM_index.get_analysis_object(0)
+assert AMA.get_journal().filename == 'an_mode_1'
+assert os.path.getsize('an_mode_0.journal') == size
+
+assert os.path.exists('an_mode_0.pckl')
+AM.clean()
@@ -0,0 +1,66 @@
+import sys
+
+from ase.build import molecule, fcc111, add_adsorbate
+from ase.optimize import QuasiNewton
+from ase.constraints import FixAtoms
+from ase.calculators.emt import EMT
+from ase.vibrations import Vibrations
+
+sys.path.append("..")
+
+from __init__ import AnharmonicModes
+from fit_delta import DeltaFit
+
+
+class CountingEMT(EMT):
+    """EMT calculator that counts the number of calculations"""
+    ncalls = 0
+
+    def calculate(self, *args, **kwargs):
+        self.ncalls += 1
+        EMT.calculate(self, *args, **kwargs)
+
+
+slab = fcc111('Au', size=(2, 2, 2), vacuum=4.0)
+H = molecule('H')
+add_adsorbate(slab, H, 3.0, 'ontop')
+
+constraint = FixAtoms(mask=[a.symbol == 'Au' for a in slab])
+slab.set_constraint(constraint)
+
+calc = CountingEMT()
+slab.set_calculator(calc)
+
+QuasiNewton(slab, logfile='/dev/null').run(fmax=0.05)
+
+vib = Vibrations(slab, indices=[8])
+vib.run()
+vib.summary(log='/dev/null')
+vib.clean()
+
+# EMT with the asap cutoff is the cheap calculator
+AM = AnharmonicModes(vibrations_object=vib,
+                     cheap_calculator=EMT(asap_cutoff=True),
+                     settings={'cheap_npoints': 30})
+AM.define_translation(from_atom_to_atom=[4, 6])
+
+calc.ncalls = 0
+AM.run()
+AM.summary(log='/dev/null')
+AM.clean()
+
+an_mode = AM.an_modes[0]
+assert len(an_mode['baseline_energies']) == 30
+# Only the difference is sampled with the expensive calculator
+assert calc.ncalls <= len(an_mode['displacement_energies']) < 10
+
+# The potential is the cheap fit plus the fitted difference
+AMA = AM.get_analysis_object(0)
+fitobj = AMA.get_fit()
+assert isinstance(fitobj, DeltaFit)
+for d, e in zip(an_mode['displacements'],
+                an_mode['displacement_energies']):
+    assert abs(fitobj.fval(d) - e) < 5e-3
+
+assert abs(AM.get_entropic_energy() - 0.0294) < 1e-3, (
+    AM.get_entropic_energy())
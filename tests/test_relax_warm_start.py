@@ -0,0 +1,63 @@
+import sys
+
+import numpy as np
+
+from ase import Atoms
+from ase.build import fcc111, add_adsorbate
+from ase.optimize import QuasiNewton
+from ase.constraints import FixAtoms
+from ase.calculators.emt import EMT
+from ase.vibrations import Vibrations
+
+sys.path.append("..")
+
+from __init__ import AnharmonicModes
+
+slab = fcc111('Pt', size=(2, 2, 2), vacuum=4.0)
+add_adsorbate(slab, Atoms('O'), 1.5, 'fcc')
+
+constraint = FixAtoms(mask=[a.symbol == 'Pt' for a in slab])
+slab.set_constraint(constraint)
+
+slab.set_calculator(EMT())
+
+QuasiNewton(slab, logfile='/dev/null').run(fmax=0.01)
+
+vib = Vibrations(slab, indices=[8])
+vib.run()
+vib.summary(log='/dev/null')
+vib.clean()
+
+relax_steps = []
+heights = []
+for warm_start in [False, True]:
+    AM = AnharmonicModes(
+        vibrations_object=vib,
+        settings={'relax_warm_start': warm_start, 'fmax': 0.01})
+    AM.define_translation(from_atom_to_atom=[4, 6], relax_axis=[0, 0, 1])
+
+    AMA = AM.get_analysis_object(0)
+    L = AMA.an_mode['transition_path_length']
+    for displacement in L * np.array([4, 2, 6, 1, 3, 5, 7]) / 8.:
+        AMA.calculate_displacement(displacement)
+
+    an_mode = AMA.an_mode
+    assert len(an_mode['relaxed_offsets']) == 7
+    # A force call to start with and one for each step
+    assert (an_mode['relax_force_calls'] ==
+            an_mode['relax_steps'] + len(an_mode['relaxed_offsets']))
+    relax_steps.append(an_mode['relax_steps'])
+    heights.append([offsets[0][2] for offsets in an_mode['relaxed_offsets']])
+
+    AM.clean()
+
+# The same relaxed path with fewer steps, on average at most two
+assert np.max(np.abs(np.subtract(*heights))) < 0.01
+assert relax_steps[1] < 0.7 * relax_steps[0], relax_steps
+assert relax_steps[1] <= 2 * 7, relax_steps
+
+# The starting point is interpolated between the relaxed neighbours
+start = AMA.get_relax_start_positions(L * 1.5 / 8.)
+unrelaxed = AMA.get_translation_positions(L * 1.5 / 8.)
+assert abs(start[8, 2] - unrelaxed[8, 2] -
+           0.5 * (heights[1][3] + heights[1][1])) < 1e-10
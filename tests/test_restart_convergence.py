@@ -0,0 +1,72 @@
+import sys
+
+import numpy as np
+
+from ase.build import molecule, fcc111, add_adsorbate
+from ase.optimize import QuasiNewton
+from ase.constraints import FixAtoms
+from ase.calculators.emt import EMT
+from ase.vibrations import Vibrations
+
+sys.path.append("..")
+
+from __init__ import AnharmonicModes
+
+slab = fcc111('Au', size=(2, 2, 2), vacuum=4.0)
+H = molecule('H')
+add_adsorbate(slab, H, 3.0, 'ontop')
+
+constraint = FixAtoms(mask=[a.symbol == 'Au' for a in slab])
+slab.set_constraint(constraint)
+
+slab.set_calculator(EMT())
+
+QuasiNewton(slab, logfile='/dev/null').run(fmax=0.05)
+
+vib = Vibrations(slab, indices=[8])
+vib.run()
+vib.summary(log='/dev/null')
+vib.clean()
+
+
+def run(settings):
+    AM = AnharmonicModes(vibrations_object=vib, settings=settings,
+                         pre_names='an_mode_restart_')
+    AM.define_translation(from_atom_to_atom=[4, 6])
+    AM.run()
+    return AM
+
+
+# Reference without restarts
+AM_ref = run({})
+an_mode_ref = AM_ref.an_modes[0]
+AM_ref.clean()
+
+# Stopped by a budget and resumed, the mode continues from its history
+# and samples exactly what the uninterrupted run did
+AM = run({'max_calls': an_mode_ref['n_calls'] - 1})
+assert AM.an_modes[0]['n_calls'] == an_mode_ref['n_calls'] - 1
+
+AM = run({})
+an_mode = AM.an_modes[0]
+assert an_mode['n_calls'] == an_mode_ref['n_calls']
+assert an_mode['ZPE_hist'] == an_mode_ref['ZPE_hist']
+assert np.allclose(an_mode['displacements'], an_mode_ref['displacements'])
+assert abs(an_mode['ZPE'] - an_mode_ref['ZPE']) < 1e-12
+
+# A converged mode is not sampled again
+slab.set_calculator(None)
+AM = run({})
+assert AM.an_modes[0]['n_calls'] == an_mode_ref['n_calls']
+
+# A tighter tolerance continues the sampling of the converged mode
+slab.set_calculator(EMT())
+AM = run({'rel_Z_mode_tol': 1e-5})
+an_mode_tight = AM.an_modes[0]
+assert an_mode_tight['n_calls'] > an_mode_ref['n_calls']
+assert (an_mode_tight['ZPE_hist'][:len(an_mode_ref['ZPE_hist'])]
+        == an_mode_ref['ZPE_hist'])
+assert an_mode_tight['hist_n_points'][-1] == len(
+    an_mode_tight['displacement_energies'])
+
+AM.clean()
@@ -0,0 +1,95 @@
+import sys
+
+import numpy as np
+
+from ase.build import molecule, fcc111, add_adsorbate
+from ase.optimize import QuasiNewton
+from ase.constraints import FixAtoms
+from ase.calculators.emt import EMT
+from ase.vibrations import Vibrations
+
+sys.path.append("..")
+
+from __init__ import AnharmonicModes
+from an_samples import SampleStore
+
+# The calculated points are kept sorted by displacement
+rng = np.random.RandomState(0)
+x = rng.uniform(-1., 1., 40)
+
+samples = SampleStore()
+for i, xi in enumerate(x):
+    samples.add_displacement(xi)
+    samples.add_energy(xi**2, force=-2*xi)
+samples.add_displacement(0.5)
+
+assert len(samples) == 40
+assert np.allclose(samples.pending, [0.5])
+assert np.all(samples.order == np.argsort(x))
+x_sorted, energies_sorted = samples.get_sorted()
+assert np.allclose(x_sorted, np.sort(x))
+assert np.allclose(energies_sorted, np.sort(x)**2)
+assert samples.has_forces()
+
+# Forces that are not known for every energy are not used
+samples = SampleStore()
+for xi in [0., 1., 2.]:
+    samples.add_displacement(xi)
+samples.add_energy(0., force=0.)
+samples.add_energy(1.)
+assert len(samples) == 2
+assert np.allclose(samples.pending, [2.])
+assert not samples.has_forces()
+
+slab = fcc111('Au', size=(2, 2, 2), vacuum=4.0)
+H = molecule('H')
+add_adsorbate(slab, H, 3.0, 'ontop')
+
+constraint = FixAtoms(mask=[a.symbol == 'Au' for a in slab])
+slab.set_constraint(constraint)
+
+slab.set_calculator(EMT())
+
+QuasiNewton(slab, logfile='/dev/null').run(fmax=0.05)
+
+vib = Vibrations(slab, indices=[8])
+vib.run()
+vib.summary(log='/dev/null')
+vib.clean()
+
+# The store of an analysis follows the lists of the mode object
+AM = AnharmonicModes(vibrations_object=vib, settings={'fit_forces': True})
+AM.define_vibration(mode_number=-1)
+AM.define_surface_translation(from_atom_to_atoms=[4, 5, 6], symnumber=3)
+
+for i in range(2):
+    AMA = AM.get_analysis_object(i)
+    AMA.start()
+    AMA.step()
+    AMA.step()
+
+    an_mode = AMA.an_mode
+    samples = AMA.get_samples()
+    assert samples is AMA.get_samples()
+    assert len(samples) == len(an_mode['displacement_energies'])
+    assert np.allclose(samples.displacements, an_mode['displacements'])
+    assert np.allclose(samples.energies, an_mode['displacement_energies'])
+    if 'displacement_forces' in an_mode:
+        assert np.allclose(samples.forces, an_mode['displacement_forces'])
+    else:
+        assert not samples.has_forces()
+
+    # Lists that are replaced give a new store
+    an_mode['displacements'] = list(an_mode['displacements'])[:-1]
+    an_mode['displacement_energies'] = list(
+        an_mode['displacement_energies'])[:-1]
+    assert len(AMA.get_samples()) == len(samples) - 1
+
+    # As do lists whose last point was changed in place
+    samples = AMA.get_samples()
+    an_mode['displacements'][-1] = np.add(an_mode['displacements'][-1], 0.1)
+    assert AMA.get_samples() is not samples
+    assert np.allclose(AMA.get_samples().displacements,
+                       an_mode['displacements'])
+
+AM.clean()
@@ -0,0 +1,54 @@
+import sys
+
+import numpy as np
+
+from ase.build import molecule, fcc111, add_adsorbate
+from ase.optimize import QuasiNewton
+from ase.constraints import FixAtoms
+from ase.calculators.emt import EMT
+from ase.vibrations import Vibrations
+
+sys.path.append("..")
+
+from __init__ import AnharmonicModes
+from an_journal import ModeJournal
+
+slab = fcc111('Au', size=(2, 2, 2), vacuum=4.0)
+H = molecule('H')
+add_adsorbate(slab, H, 3.0, 'ontop')
+
+constraint = FixAtoms(mask=[a.symbol == 'Au' for a in slab])
+slab.set_constraint(constraint)
+
+slab.set_calculator(EMT())
+
+QuasiNewton(slab, logfile='/dev/null').run(fmax=0.05)
+
+vib = Vibrations(slab, indices=[8])
+vib.run()
+vib.summary(log='/dev/null')
+vib.clean()
+
+# The fit stored by a mode is not changed by the fits of later modes
+for settings, define_second_mode, kernel in [
+        ({'fit_method': 'gaussian_process'},
+         lambda AM: AM.define_vibration(mode_number=-1), 'periodic'),
+        ({}, lambda AM: AM.define_translation(from_atom_to_atom=[4, 6]),
+         None)]:
+    AM = AnharmonicModes(vibrations_object=vib, settings=settings)
+    an_mode = AM.define_rotation(basepos=slab[4].position, branch=[8],
+                                 rot_axis=[1., 1., 0.])
+    an_mode['symnumber'] = 2
+    define_second_mode(AM)
+    AM.run()
+
+    an_mode = AM.an_modes[0]
+    backup = ModeJournal('an_mode_0').load()
+    if kernel is not None:
+        assert an_mode['fit'].settings['kernel'] == kernel
+    assert an_mode['fit'].settings['symnumber'] == 2
+
+    x = np.array(an_mode['displacements'])
+    assert np.allclose(an_mode['fit'].fval(x), backup['fit'].fval(x))
+
+    AM.clean()
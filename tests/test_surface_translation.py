@@ -0,0 +1,113 @@
+import sys
+
+import numpy as np
+
+import ase.units as units
+from ase.build import molecule, fcc111, add_adsorbate
+from ase.optimize import QuasiNewton
+from ase.constraints import FixAtoms
+from ase.calculators.emt import EMT
+from ase.vibrations import Vibrations
+
+sys.path.append("..")
+
+from __init__ import AnharmonicModes
+from energy_spectrum_solver import energy_spectrum_2d
+
+# The groundstate of a separable potential is the sum of the groundstates
+# along u and v, and the first excitation is degenerate
+cell_vectors = np.array([[3., 0., 0.], [0., 3., 0.]])
+Hcoeff = units._hbar**2/(2*units._amu * units._e * 1e-20)
+
+V0 = 0.3
+cos_u = {(1, 0): -V0/2, (-1, 0): -V0/2}
+cos_uv = {(1, 0): -V0/2, (-1, 0): -V0/2, (0, 1): -V0/2, (0, -1): -V0/2}
+
+energies_u = energy_spectrum_2d(cos_u, cell_vectors, Hcoeff, 0.2)
+energies_uv = energy_spectrum_2d(cos_uv, cell_vectors, Hcoeff, 0.2)
+assert abs(energies_uv[0] - 2*energies_u[0]) < 1e-8
+assert abs(energies_uv[1] - energies_uv[2]) < 1e-8
+
+# Below the first excitation the lowest levels are still returned
+assert len(energy_spectrum_2d(cos_uv, cell_vectors, Hcoeff, 1e-6)) == 3
+
+# A deep well has close to the harmonic zero point energy
+k = V0*(2*np.pi/3.)**2
+hnu = units._hbar*np.sqrt(k*units._e/1e-20/units._amu)/units._e
+assert abs((energies_uv[0] + 2*V0) - hnu) < 0.05*hnu
+
+# H moving on the top sites of Au(111)
+slab = fcc111('Au', size=(2, 2, 2), vacuum=4.0)
+H = molecule('H')
+add_adsorbate(slab, H, 3.0, 'ontop')
+
+constraint = FixAtoms(mask=[a.symbol == 'Au' for a in slab])
+slab.set_constraint(constraint)
+
+slab.set_calculator(EMT())
+
+QuasiNewton(slab, logfile='/dev/null').run(fmax=0.05)
+
+vib = Vibrations(slab, indices=[8])
+vib.run()
+vib.summary(log='/dev/null')
+vib.clean()
+
+AM = AnharmonicModes(vibrations_object=vib,
+                     settings={'rel_Z_mode_tol': 1e-3})
+an_mode = AM.define_surface_translation(
+    from_atom_to_atoms=[4, 5, 6], symnumber=3)
+
+# A cheap calculator cannot map the potential of the cell
+AM_cheap = AnharmonicModes(vibrations_object=vib, cheap_calculator=EMT())
+try:
+    AM_cheap.define_surface_translation(from_atom_to_atoms=[4, 5, 6])
+except ValueError:
+    pass
+else:
+    raise AssertionError('A surface translation with a cheap calculator')
+
+# Only the vibration perpendicular to the surface is left harmonic
+assert len(AM.reduced_h_modes) == 1
+
+# The points of the initial grid are unique by symmetry
+AMA = AM.get_analysis_object(0)
+displacements = AMA.get_initial_points(3)
+for i, displacement in enumerate(displacements):
+    assert not AMA.is_sampled(displacement, displacements[:i])
+assert len(displacements) < 9
+
+AM.run()
+AM.summary(log='/dev/null')
+
+# The levels stored for 300 K do not reach high enough for 600 K, so
+# the spectrum is solved again from the stored fit
+slab.set_calculator(None)
+thermo_hot = AM.thermo_at(600)
+assert thermo_hot['entropic_energy'] > AM.get_entropic_energy()
+assert abs(thermo_hot['ZPE'] - AM.get_ZPE()) < 1e-6
+
+AM.clean()
+
+# At a low temperature only the groundstate is below the cut off of the
+# spectrum
+slab.set_calculator(EMT())
+AM_cold = AnharmonicModes(vibrations_object=vib,
+                          settings={'rel_Z_mode_tol': 1e-3,
+                                    'temperature': 10},
+                          pre_names='an_mode_cold_')
+AM_cold.define_surface_translation(from_atom_to_atoms=[4, 5, 6],
+                                   symnumber=3)
+AM_cold.run()
+AM_cold.summary(log='/dev/null')
+assert len(AM_cold.an_modes[0]['energy_levels']) >= 3
+AM_cold.clean()
+
+an_mode = AM.an_modes[0]
+assert abs(an_mode['ZPE'] - 0.0242) < 1e-3, an_mode['ZPE']
+assert abs(AM.get_entropic_energy() - 0.0371) < 1e-3, (
+    AM.get_entropic_energy())
+
+# The first excitation is degenerate by the symmetry of the site
+levels = an_mode['energy_levels']
+assert abs(levels[1] - levels[2]) < 1e-3
@@ -0,0 +1,66 @@
+import sys
+
+import numpy as np
+
+from ase.build import molecule, fcc111, add_adsorbate
+from ase.optimize import QuasiNewton
+from ase.constraints import FixAtoms
+from ase.calculators.emt import EMT
+from ase.vibrations import Vibrations
+
+sys.path.append("..")
+
+from __init__ import AnharmonicModes
+
+slab = fcc111('Au', size=(2, 2, 2), vacuum=4.0)
+H = molecule('H')
+add_adsorbate(slab, H, 3.0, 'ontop')
+
+constraint = FixAtoms(mask=[a.symbol == 'Au' for a in slab])
+slab.set_constraint(constraint)
+
+slab.set_calculator(EMT())
+
+QuasiNewton(slab, logfile='/dev/null').run(fmax=0.05)
+
+vib = Vibrations(slab, indices=[8])
+vib.run()
+vib.summary(log='/dev/null')
+vib.clean()
+
+AM = AnharmonicModes(vibrations_object=vib)
+AM.define_vibration(mode_number=-1)
+AM.define_translation(from_atom_to_atom=[4, 6])
+AM.run()
+
+# No calculations are needed for the thermodynamics at any temperature
+slab.set_calculator(None)
+
+thermo = AM.thermo_at(300)
+assert abs(thermo['ZPE'] - AM.get_ZPE()) < 1e-12
+assert abs(thermo['entropic_energy'] - AM.get_entropic_energy()) < 1e-12
+assert np.allclose(thermo['Z_modes'], AM.Z_modes)
+
+thermo_hot = AM.thermo_at(600)
+assert abs(thermo_hot['ZPE'] - AM.get_ZPE()) < 1e-12
+assert thermo_hot['entropic_energy'] > thermo['entropic_energy']
+for Z_hot, Z in zip(thermo_hot['Z_modes'], thermo['Z_modes']):
+    assert Z_hot >= Z
+
+# The stored spectrum gives the same levels as solving the stored fit
+# again at the new temperature
+AMA = AM.get_analysis_object(1, settings={'temperature': 600})
+ZPE, Z_mode, energies = AMA.get_stored_thermo()
+ZPE_solved, Z_mode_solved, energies_solved = AMA.get_thermo(
+    AMA.an_mode['fit'])
+assert abs(Z_mode - Z_mode_solved) < 1e-10
+assert np.allclose(energies, energies_solved)
+
+# A new analysis of the same modes finds the fits in the backups
+AM_restored = AnharmonicModes(vibrations_object=vib)
+AM_restored.define_vibration(mode_number=-1)
+AM_restored.define_translation(from_atom_to_atom=[4, 6])
+assert abs(AM_restored.thermo_at(600)['entropic_energy']
+           - thermo_hot['entropic_energy']) < 1e-12
+
+AM.clean()
@@ -0,0 +1,88 @@
+import os
+import sys
+
+import numpy as np
+
+from ase.build import molecule, fcc111, add_adsorbate
+from ase.optimize import QuasiNewton
+from ase.constraints import FixAtoms
+from ase.calculators.emt import EMT
+from ase.io.trajectory import Trajectory
+from ase.vibrations import Vibrations
+
+sys.path.append("..")
+
+from __init__ import AnharmonicModes
+
+slab = fcc111('Au', size=(2, 2, 2), vacuum=4.0)
+H = molecule('H')
+add_adsorbate(slab, H, 3.0, 'ontop')
+
+constraint = FixAtoms(mask=[a.symbol == 'Au' for a in slab])
+slab.set_constraint(constraint)
+
+slab.set_calculator(EMT())
+
+QuasiNewton(slab, logfile='/dev/null').run(fmax=0.05)
+
+vib = Vibrations(slab, indices=[8])
+vib.run()
+vib.summary(log='/dev/null')
+vib.clean()
+
+filename = 'an_mode_calculations.traj'
+
+# The calculations are buffered until the next iteration
+AM = AnharmonicModes(vibrations_object=vib, settings={'fit_forces': True})
+AM.define_vibration(mode_number=-1)
+AM.define_translation(from_atom_to_atom=[4, 6])
+
+AMA = AM.get_analysis_object(0)
+AMA.start()
+assert AMA.an_mode['n_calls'] > 0
+assert not os.path.exists(filename)
+AMA.step()
+assert len(Trajectory(filename)) == AMA.an_mode['n_calls']
+AM.clean()
+
+# All modes of a run share one trajectory with the metadata of each
+# calculation
+AM = AnharmonicModes(vibrations_object=vib, settings={'fit_forces': True})
+AM.define_vibration(mode_number=-1)
+AM.define_translation(from_atom_to_atom=[4, 6])
+AM.run()
+
+assert sorted(fn for fn in os.listdir('.') if fn.endswith('.traj')) == [
+    filename]
+
+images = list(Trajectory(filename))
+assert len(images) == sum(an_mode['n_calls'] for an_mode in AM.an_modes)
+for an_mode in AM.an_modes:
+    mode_images = [atoms for atoms in images
+                   if atoms.info['mode_hash'] == an_mode['mode_hash']]
+    assert len(mode_images) == an_mode['n_calls']
+    assert np.allclose([atoms.info['displacement'] for atoms in mode_images],
+                       an_mode['displacements'])
+    assert np.allclose([atoms.get_potential_energy()
+                        for atoms in mode_images],
+                       an_mode['displacement_energies'])
+    assert 'forces' in mode_images[0].calc.results
+AM.clean()
+
+# Only the energies
+AM = AnharmonicModes(vibrations_object=vib,
+                     settings={'fit_forces': True, 'trajectory': 'energies'})
+AM.define_vibration(mode_number=-1)
+AM.run()
+images = list(Trajectory(filename))
+assert len(images) == AM.an_modes[0]['n_calls']
+assert 'forces' not in images[0].calc.results
+AM.clean()
+
+# No trajectory
+AM = AnharmonicModes(vibrations_object=vib, settings={'trajectory': 'off'})
+AM.define_vibration(mode_number=-1)
+AM.run()
+assert not [fn for fn in os.listdir('.') if fn.endswith('.traj')]
+assert os.path.exists('an_mode_0.pckl')
+AM.clean()